@@ -1,7 +1,10 @@
-from flask import Flask, jsonify
+import click
+from flask import Flask, jsonify, g
 from flask_cors import CORS
+from sqlalchemy import inspect, text
 from config import Config
 from models import db
+from middleware.auth import token_required
 
 # 导入控制器
 from controllers.auth_controller import auth_bp
@@ -10,6 +13,11 @@ from controllers.activity_controller import activity_bp
 from controllers.registration_controller import registration_bp
 from controllers.club_controller import club_bp
 from controllers.extractor_controller import extract_bp
+from controllers.search_controller import search_bp
+from controllers.batch_controller import batch_bp
+from controllers.calendar_controller import calendar_bp
+from utils import search_index, tag_index, response_cache, compression, feed, recommendations, club_similarity, reminders, \
+    extraction_cache
 
 
 def create_app():
@@ -19,6 +27,12 @@ def create_app():
     # 初始化数据库
     db.init_app(app)
 
+    # 公开接口响应缓存
+    response_cache.init_app(app)
+
+    # 响应压缩
+    compression.init_app(app)
+
     # 启用CORS
     CORS(app, resources={r"/v1/*": {"origins": "*"}})
 
@@ -29,13 +43,134 @@ def create_app():
     app.register_blueprint(registration_bp, url_prefix='/v1')
     app.register_blueprint(club_bp, url_prefix='/v1')
     app.register_blueprint(extract_bp, url_prefix='/v1')
+    app.register_blueprint(search_bp, url_prefix='/v1')
+    app.register_blueprint(batch_bp, url_prefix='/v1')
+    app.register_blueprint(calendar_bp, url_prefix='/v1')
 
     # 创建数据库表（如果不存在）
     with app.app_context():
         db.create_all()
+        # 为旧数据库补齐新增列
+        upgrade_schema()
         # 初始化默认数据
         init_default_data()
 
+    # 全文索引（SQLite FTS5）
+    search_index.init_app(app)
+
+    # 标签关联表与分面计数
+    tag_index.init_app(app)
+
+    # 关注动态时间线
+    feed.init_app(app)
+
+    # 相似社团（共同关注矩阵）
+    club_similarity.init_app(app)
+
+    # 命令行工具
+    @app.cli.command('recount-registrations')
+    @click.option('--activity-id', type=int, default=None, help='只修复指定活动')
+    def recount_registrations_command(activity_id):
+        """根据报名表重新计算活动的报名计数"""
+        from models import Activity
+        updated = Activity.recount_registrations(activity_id)
+        print(f"✅ 已重新计算 {updated} 个活动的报名计数")
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """根据活动与社团表重建全文索引"""
+        total = search_index.rebuild()
+        print(f"✅ 已重建全文索引，共 {total} 条记录")
+
+    @app.cli.command('rebuild-tag-index')
+    def rebuild_tag_index_command():
+        """根据 Activity.tags 重建标签关联表与分面计数"""
+        total = tag_index.rebuild()
+        print(f"✅ 已重建标签索引，共 {total} 个活动")
+
+    @app.cli.command('rebuild-feed')
+    def rebuild_feed_command():
+        """按当前关注关系重建用户动态时间线"""
+        total = feed.rebuild()
+        print(f"✅ 已重建动态时间线，共 {total} 条")
+
+    @app.cli.command('rebuild-club-similarity')
+    def rebuild_club_similarity_command():
+        """根据关注表重建共同关注矩阵与相似社团列表（需要 numpy）"""
+        total = club_similarity.rebuild()
+        print(f"✅ 已重建 {total} 个社团的相似社团列表")
+
+    @app.cli.command('compute-recommendations')
+    @click.option('--top-k', type=int, default=None, help='每个用户保存的推荐数，默认取 RECOMMENDATION_TOP_K')
+    @click.option('--chunk-size', type=int, default=2000, help='每批打分的用户数')
+    def compute_recommendations_command(top_k, chunk_size):
+        """离线计算所有用户的活动推荐（需要 numpy）"""
+        stats = recommendations.compute(top_k or app.config.get('RECOMMENDATION_TOP_K', 20), chunk_size)
+        print(f"✅ 已为 {stats['users']} 个用户计算推荐：候选活动 {stats['candidates']} 个，"
+              f"标签 {stats['tags']} 个，写入 {stats['rows']} 条，耗时 {stats['seconds']} 秒")
+
+    @app.cli.command('run-reminders')
+    @click.option('--once', is_flag=True, help='只处理一轮已到期的提醒后退出')
+    def run_reminders_command(once):
+        """运行活动提醒调度器，可启动多个实例"""
+        dispatcher = reminders.ReminderDispatcher.from_app(app)
+        if once:
+            print(f"✅ 已发送 {dispatcher.run_once()} 条提醒")
+            return
+        print(f"⏰ 提醒调度器已启动: {dispatcher.owner}")
+        dispatcher.run_forever()
+
+    @app.cli.command('clear-extraction-cache')
+    def clear_extraction_cache_command():
+        """清空文章正文与活动信息提取缓存"""
+        print(f"✅ 已清除 {extraction_cache.clear()} 条提取缓存")
+
+    @app.cli.command('benchmark-compression')
+    @click.option('--path', 'paths', multiple=True, help='要测量的接口路径，可重复指定')
+    @click.option('--repeat', type=int, default=20, help='每个编码重复压缩的次数')
+    @click.option('--level', type=int, default=None, help='压缩级别，默认取 COMPRESS_LEVEL')
+    def benchmark_compression_command(paths, repeat, level):
+        """测量各接口压缩前后的字节数与压缩耗时"""
+        from models import Activity, User
+        from middleware.auth import generate_token
+        admin = User.query.filter_by(role='admin').first()
+        activity = Activity.query.order_by(Activity.approved_count.desc()).first()
+        if not paths:
+            paths = ['/v1/activities?limit=50', '/v1/users/registrations']
+            if activity:
+                paths.append(f'/v1/activities/{activity.id}/participants')
+        headers = {'Authorization': f'Bearer {generate_token(admin.id, admin.role)}'} if admin else {}
+
+        rows = compression.benchmark(app.test_client(), paths, headers, repeat,
+                                     level or app.config.get('COMPRESS_LEVEL', 6))
+        print(f"{'接口':<45}{'编码':<6}{'原始字节':>10}{'传输字节':>10}{'压缩比':>8}{'CPU(ms)':>10}")
+        for row in rows:
+            print(f"{row['path']:<45}{row['encoding']:<6}{row['raw_bytes']:>10}{row['wire_bytes']:>10}"
+                  f"{row['ratio']:>8}{row['cpu_ms']:>10}")
+
+    @app.cli.command('benchmark-llm')
+    @click.option('--requests', 'total', type=int, default=100, help='调用次数')
+    @click.option('--concurrency', type=int, default=10, help='并发线程数')
+    @click.option('--fake', is_flag=True, help='在本进程启动模拟大模型接口，不访问 LLM_BASE_URL')
+    @click.option('--fake-latency', type=float, default=0.2, help='模拟接口的处理时间（秒）')
+    @click.option('--fake-max-inflight', type=int, default=None, help='模拟接口超过该并发返回 429')
+    def benchmark_llm_command(total, concurrency, fake, fake_latency, fake_max_inflight):
+        """压测共享的大模型客户端：并发上限、重试与连接复用"""
+        from extractor import pipeline, llm_client, fake_llm_server
+        if fake:
+            server = fake_llm_server.start(latency=fake_latency, max_inflight=fake_max_inflight, retry_after=0)
+            manager = llm_client.LLMClientManager.from_config(dict(app.config, LLM_BASE_URL=server.base_url), 'fake')
+        else:
+            manager = pipeline.llm_client()
+
+        stats = llm_client.benchmark(manager, total, concurrency)
+        print(f"✅ {stats['succeeded']}/{stats['requests']} 成功，耗时 {stats['seconds']} 秒，"
+              f"{stats['throughput']} 次/秒；p50 {stats['p50_ms']}ms，p95 {stats['p95_ms']}ms，最长 {stats['max_ms']}ms")
+        print(f"   客户端: {stats['client']}")
+        if fake:
+            print(f"   模拟接口: {server.stats}")
+            server.shutdown()
+
     # 统一错误处理
     @app.errorhandler(404)
     def not_found(error):
@@ -50,6 +185,15 @@ def create_app():
     def health_check():
         return jsonify({"status": "healthy", "service": "club-activities-api"})
 
+    # 认证用户缓存命中统计（仅管理员）
+    @app.route('/health/auth-cache')
+    @token_required
+    def auth_cache_stats():
+        from middleware.principal_cache import principal_cache
+        if g.user_role != 'admin':
+            return jsonify({"code": 403, "message": "权限不足，只有管理员可以查看"}), 403
+        return jsonify(dict(principal_cache.stats(), mode=app.config.get('AUTH_PRINCIPAL_CHECK')))
+
     # 打印可用路由
     with app.app_context():
         print('可用的路由:')
@@ -60,6 +204,51 @@ def create_app():
     return app
 
 
+# 新增列：(表名, 列名, 列定义)，create_all 不会修改已存在的表
+SCHEMA_UPGRADES = [
+    ('activities', 'approved_count', 'INTEGER NOT NULL DEFAULT 0'),
+    ('activities', 'pending_count', 'INTEGER NOT NULL DEFAULT 0'),
+    ('activities', 'waitlisted_count', 'INTEGER NOT NULL DEFAULT 0'),
+    ('registrations', 'waitlist_position', 'INTEGER'),
+    ('clubs', 'fanout_on_read', 'BOOLEAN NOT NULL DEFAULT 0'),
+    ('registrations', 'reminder_sent_at', 'DATETIME'),
+    ('registrations', 'reminder_lease_owner', 'VARCHAR(100)'),
+    ('registrations', 'reminder_lease_until', 'DATETIME'),
+    ('users', 'calendar_token', 'VARCHAR(64)'),
+    ('extraction_jobs', 'force_refresh', 'BOOLEAN NOT NULL DEFAULT 0'),
+    ('registrations', 'approved_at', 'DATETIME'),
+]
+
+
+def upgrade_schema():
+    """为旧数据库补齐新增列与索引，并回填冗余数据"""
+    from models import Activity
+
+    inspector = inspect(db.engine)
+    added = set()
+    for table, column, ddl in SCHEMA_UPGRADES:
+        columns = {c['name'] for c in inspector.get_columns(table)}
+        if column not in columns:
+            db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+            added.add((table, column))
+    db.session.commit()
+
+    # 补齐模型中新增的索引
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+    if added & {('activities', f'{status}_count') for status in Activity.COUNTED_STATUSES}:
+        Activity.recount_registrations()
+        print("✅ 已回填活动报名计数")
+
+    if ('registrations', 'approved_at') in added:
+        db.session.execute(text(
+            "UPDATE registrations SET approved_at = COALESCE(updated_at, registration_time) WHERE status = 'approved'"
+        ))
+        db.session.commit()
+
+
 def init_default_data():
     """初始化默认数据"""
     from models import User, Club, Activity, Follow, Registration
@@ -153,11 +342,13 @@ def init_default_data():
             registration = Registration(
                 user_id=2,
                 activity_id=1,
-                status='approved'
+                status='approved',
+                approved_at=datetime.datetime.utcnow()
             )
             db.session.add(registration)
 
             db.session.commit()
+            Activity.recount_registrations(activity.id)
 
             print("✅ 默认数据初始化完成")
     else:
@@ -10,11 +10,86 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-change-this')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     
+    # 认证用户校验：cached 使用进程内缓存，strict 每次请求查库
+    AUTH_PRINCIPAL_CHECK = os.getenv('AUTH_PRINCIPAL_CHECK', 'cached')
+    AUTH_PRINCIPAL_CACHE_SIZE = 10000
+    AUTH_PRINCIPAL_CACHE_TTL = 60  # 秒
+    
     # 数据库配置
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', f'sqlite:///{os.path.join(BASE_DIR, "club_activities.db")}')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False  # 设置为True可以查看SQL语句
+    # SQLite写锁等待时间（秒），报名高峰时并发写入排队而不是直接报错
+    SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}} if SQLALCHEMY_DATABASE_URI.startswith('sqlite') else {}
+    
+    # 公开接口响应缓存：memory（进程内LRU）、redis 或 none
+    RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_REDIS_URL = os.getenv('RESPONSE_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    RESPONSE_CACHE_SIZE = 1000
+    RESPONSE_CACHE_DEFAULT_TTL = 30  # 秒，标签失效之外的兜底过期时间
+    
+    # 响应压缩：按 Accept-Encoding 协商 gzip（安装 brotli 后优先 br），小于阈值的响应不压缩
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', '1') == '1'
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))  # gzip 1-9，brotli 取 min(level, 11)
+    COMPRESS_MIN_SIZE = 1024  # 字节
+    
+    # 批量请求：单次最多子请求数与并行执行的线程数
+    BATCH_MAX_REQUESTS = 20
+    BATCH_MAX_WORKERS = 4
+    
+    # 关注动态：关注人数不超过阈值的社团发布活动时写入关注者时间线，超过后改为读取时查询
+    FEED_FANOUT_LIMIT = 5000
+    FEED_BACKFILL_LIMIT = 50  # 新关注社团时回填的最近活动数
+    
+    # 个性化推荐：离线任务 flask compute-recommendations 为每个用户保存的推荐数
+    RECOMMENDATION_TOP_K = 20
+    
+    # 相似社团：按共同关注计算的余弦相似度，每个社团保存的相似社团数
+    SIMILAR_CLUBS_TOP_N = 10
+    
+    # 活动提醒调度：预加载窗口、认领租约、增量同步间隔、过期不再补发的时长（秒）
+    REMINDER_WINDOW = 600
+    REMINDER_LEASE = 120
+    REMINDER_SYNC_INTERVAL = 5
+    REMINDER_GRACE = 3600
+    # 提醒发送器：'log' 写入 REMINDER_LOG_PATH（未设置时写日志），或 'module:Class'
+    REMINDER_NOTIFIER = os.getenv('REMINDER_NOTIFIER', 'log')
+    REMINDER_LOG_PATH = os.getenv('REMINDER_LOG_PATH')
+    
+    # 文章提取任务：工作线程数、未完成任务上限、执行超时（秒，超时视为进程已退出）、最多执行次数
+    EXTRACT_MAX_WORKERS = int(os.getenv('EXTRACT_MAX_WORKERS', 2))
+    EXTRACT_QUEUE_LIMIT = 50
+    EXTRACT_JOB_TIMEOUT = 300
+    EXTRACT_MAX_ATTEMPTS = 3
+    EXTRACT_RECOVER_INTERVAL = 30  # 检查执行超时任务的最短间隔（秒）
+    # 正文抓取后端：http（直接解析 HTML）、selenium（浏览器渲染）、auto（HTTP 取不到正文时回退到浏览器）
+    EXTRACT_FETCHER = os.getenv('EXTRACT_FETCHER', 'auto')
+    EXTRACT_FETCH_TIMEOUT = 10  # 单次 HTTP 请求超时（秒）
+    EXTRACT_HTTP_POOL_SIZE = 10
+    # 浏览器后端：chrome/firefox（无头）或 safari；会话池大小（并行渲染的页面数，不宜超过 EXTRACT_MAX_WORKERS）、
+    # 每个会话处理多少页面后重建、页面加载超时与等待正文渲染的超时（秒）
+    EXTRACT_BROWSER = os.getenv('EXTRACT_BROWSER', 'chrome')
+    EXTRACT_BROWSER_POOL_SIZE = int(os.getenv('EXTRACT_BROWSER_POOL_SIZE', 2))
+    EXTRACT_BROWSER_MAX_PAGES = 50
+    EXTRACT_BROWSER_PAGE_TIMEOUT = 15
+    EXTRACT_BROWSER_WAIT = 10
+    # 任务进度推送（SSE）的轮询间隔与最长连接时间（秒）
+    EXTRACT_EVENTS_INTERVAL = 0.5
+    EXTRACT_EVENTS_TIMEOUT = 120
+    # 提取缓存：文章正文（一级）与大模型结果（二级）的有效期（秒）及各自最多保留的条数（超出时淘汰最久未访问的）
+    EXTRACT_CACHE_ARTICLE_TTL = int(os.getenv('EXTRACT_CACHE_ARTICLE_TTL', 7 * 24 * 3600))
+    EXTRACT_CACHE_RESULT_TTL = int(os.getenv('EXTRACT_CACHE_RESULT_TTL', 30 * 24 * 3600))
+    EXTRACT_CACHE_MAX_ENTRIES = int(os.getenv('EXTRACT_CACHE_MAX_ENTRIES', 1000))
+    # 大模型接口（OpenAI 兼容）：本地压测时指向 python -m extractor.fake_llm_server
+    LLM_BASE_URL = os.getenv('LLM_BASE_URL', 'https://dashscope.aliyuncs.com/compatible-mode/v1')
+    # 同时进行的调用数上限、429/5xx 最多重试次数、退避基数与上限（秒）、单次请求超时与整次调用的时间预算（秒）
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 4))
+    LLM_MAX_RETRIES = 3
+    LLM_BACKOFF = 0.5
+    LLM_MAX_BACKOFF = 8
+    LLM_REQUEST_TIMEOUT = 30
+    LLM_TIMEOUT_BUDGET = 60
     
     # 错误码
     ERROR_CODES = {
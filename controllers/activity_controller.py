@@ -1,15 +1,60 @@
 from flask import Blueprint, request, jsonify, g
-from flask_sqlalchemy import SQLAlchemy
-from middleware.auth import token_required
-from models import db, Activity, Club, Registration
+from middleware.auth import token_required, optional_user_id
+from models import db, Activity, Club, Registration, UserRecommendation
+from utils.pagination import paginate_keyset, cursor_page, InvalidCursorError, InvalidLimitError
+from utils import search_index, tag_index, response_cache, feed
+from utils.conditional import conditional_response
+from utils.fieldsets import FieldSet
 from datetime import datetime
 import time
 
-db = SQLAlchemy()
 activity_bp = Blueprint('activity', __name__)
 
 
+def _activity_list_version():
+    """活动列表的版本：活动与社团的最新更新时间、行数，以及已开始/已结束的活动数（状态筛选随时间变化）"""
+    now = datetime.utcnow()
+    club_version = db.select(db.func.max(Club.updated_at)).scalar_subquery()
+    club_count = db.select(db.func.count(Club.id)).scalar_subquery()
+    row = db.session.query(
+        db.func.max(Activity.updated_at),
+        db.func.count(Activity.id),
+        db.func.sum(db.case((Activity.start_time <= now, 1), else_=0)),
+        db.func.sum(db.case((Activity.end_time < now, 1), else_=0)),
+        club_version,
+        club_count
+    ).one()
+    return None, (*row, optional_user_id())
+
+
+def _activity_detail_version(activity_id):
+    """活动详情的版本：活动、所属社团及调用者报名记录的更新时间"""
+    act_id = Activity.parse_id(activity_id)
+    if act_id is None:
+        return None
+
+    user_id = optional_user_id()
+    columns = [Activity.updated_at, Club.updated_at]
+    if user_id:
+        columns.append(
+            db.select(Registration.updated_at)
+            .where(Registration.activity_id == Activity.id, Registration.user_id == user_id)
+            .scalar_subquery()
+        )
+    row = db.session.query(*columns) \
+        .outerjoin(Club, Club.id == Activity.club_id) \
+        .filter(Activity.id == act_id) \
+        .first()
+    if row is None:
+        return None
+
+    # 报名记录可能被删除，登录用户只用 ETag 校验
+    last_modified = None if user_id else max(value for value in row if value)
+    return last_modified, (act_id, *row, user_id)
+
+
 @activity_bp.route('/activities/latest', methods=['GET'])
+@response_cache.cached_response(tags=['activities'])
 def get_latest_activities():
     """获取最新活动"""
     try:
@@ -21,17 +66,19 @@ def get_latest_activities():
             .order_by(Activity.created_at.desc()) \
             .limit(limit) \
             .all()
+        clubs = Activity.prefetch_clubs(activities)
 
         # 格式化返回数据
         formatted_activities = []
         for activity in activities:
+            club = clubs.get(activity.club_id)
             formatted_activities.append({
                 'activity_id': activity.id,
                 'title': activity.title,
                 'start_time': activity.start_time,
-                'club_name': activity.club.name if activity.club else '',
-                'tag': activity.tags.split(',')[0] if activity.tags else '',
-                'participant_count': Registration.query.filter_by(activity_id=activity.id, status='approved').count(),
+                'club_name': club.name if club else '',
+                'tag': next(iter(tag_index.split_tags(activity.tags)), ''),
+                'participant_count': activity.approved_count,
                 'max_participants': activity.max_participants
             })
 
@@ -50,16 +97,21 @@ def get_latest_activities():
 
 
 @activity_bp.route('/activities', methods=['GET'])
+@conditional_response(_activity_list_version)
+@response_cache.cached_response(tags=['activities'])
 def get_activities():
     """获取活动列表"""
     try:
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 10))
         status = request.args.get('status')  # upcoming, ongoing, ended
-        tag = request.args.get('tag', '')
+        tag = request.args.get('tag', '')  # 多个标签用逗号分隔
+        tag_mode = request.args.get('tag_mode', 'or')  # and: 包含全部标签, or: 包含任一标签
         club_id = request.args.get('club_id', '')
         keyword = request.args.get('keyword', '')
         max_participants = request.args.get('num', '')
+        cursor = request.args.get('cursor')  # 传入cursor参数即使用游标分页
+        fields = FieldSet.from_request()  # fields=/exclude= 稀疏字段集
 
         # 构建查询
         query = Activity.query.filter_by(status='published')
@@ -73,22 +125,17 @@ def get_activities():
         elif status == 'ended':
             query = query.filter(Activity.end_time < current_time)
 
-        # 标签筛选
-        if tag:
-            query = query.filter(Activity.tags.like(f'%{tag}%'))
+        # 标签筛选（精确匹配）
+        tags = tag_index.split_tags(tag)
+        if tags:
+            query = query.filter(tag_index.filter_clause(tags, match_all=(tag_mode == 'and')))
 
         # 社团筛选
         if club_id:
             query = query.filter_by(club_id=club_id)
 
         if keyword:
-            query = query.filter(
-                db.or_(
-                    Activity.title.ilike(f'%{keyword}%'),
-                    Activity.description.ilike(f'%{keyword}%'),
-                    Activity.tags.ilike(f'%{keyword}%')
-                )
-            )
+            query = query.filter(search_index.match_clause('activity', keyword))
 
         if max_participants and max_participants != 'all':
             if max_participants == '20':
@@ -100,18 +147,32 @@ def get_activities():
             elif max_participants == '100+':
                 query = query.filter(Activity.max_participants > 100)
 
+        user_id = int(g.user_id) if hasattr(g, 'user_id') else None
+
+        # 游标分页：按 (start_time, id) 定位，总数仅在 include_total=1 时计算
+        if cursor is not None:
+            total = query.count() if request.args.get('include_total') == '1' else None
+            activities, next_cursor = paginate_keyset(Activity.defer_unrequested(query, fields),
+                                                      [Activity.start_time, Activity.id], cursor, limit)
+            activities_data = Activity.to_dict_list(activities, user_id=user_id, fields=fields)
+
+            return jsonify({
+                "code": 200,
+                "data": cursor_page("activities", activities_data, next_cursor, limit, total)
+            })
+
         # 获取总数
         total = query.count()
 
         # 分页
-        activities = query.order_by(Activity.start_time.asc()) \
+        activities = Activity.defer_unrequested(query, fields) \
+            .order_by(Activity.start_time.asc()) \
             .offset((page - 1) * limit) \
             .limit(limit) \
             .all()
 
         # 转换为字典
-        user_id = int(g.user_id) if hasattr(g, 'user_id') else None
-        activities_data = [activity.to_dict(user_id=user_id) for activity in activities]
+        activities_data = Activity.to_dict_list(activities, user_id=user_id, fields=fields)
 
         return jsonify({
             "code": 200,
@@ -123,6 +184,16 @@ def get_activities():
             }
         })
 
+    except InvalidCursorError:
+        return jsonify({
+            "code": 400,
+            "message": "无效的分页游标"
+        }), 400
+    except InvalidLimitError as e:
+        return jsonify({
+            "code": 400,
+            "message": str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -130,6 +201,29 @@ def get_activities():
         }), 500
 
 
+@activity_bp.route('/tags', methods=['GET'])
+@response_cache.cached_response(tags=['activities'], ttl=60)
+def get_tag_facets():
+    """获取标签及其未开始活动数"""
+    try:
+        limit = int(request.args.get('limit', 50))
+
+        facets = tag_index.upcoming_facets()[:limit]
+
+        return jsonify({
+            "code": 200,
+            "data": {
+                "tags": [{'tag': tag, 'count': count} for tag, count in facets]
+            }
+        })
+
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "message": f"获取标签失败: {str(e)}"
+        }), 500
+
+
 @activity_bp.route('/activities', methods=['POST'])
 @token_required
 def create_activity():
@@ -153,8 +247,8 @@ def create_activity():
 
     try:
         # 解析时间
-        start_time = datetime.fromisoformat(data['start_time'].replace('Z', '+00:00'))
-        end_time = datetime.fromisoformat(data['end_time'].replace('Z', '+00:00')) if data.get('endTime') else None
+        start_time = datetime.fromisoformat(data['startTime'].replace('Z', '+00:00'))
+        end_time = datetime.fromisoformat(data['endTime'].replace('Z', '+00:00')) if data.get('endTime') else None
         registration_end_time = datetime.fromisoformat(
             data['registration_end_time'].replace('Z', '+00:00')) if data.get('registration_end_time') else None
 
@@ -175,6 +269,7 @@ def create_activity():
 
         db.session.add(activity)
         db.session.commit()
+        response_cache.invalidate('activities', 'clubs')
 
         return jsonify({
             "code": 200,
@@ -194,6 +289,9 @@ def create_activity():
 
 
 @activity_bp.route('/activities/<activity_id>', methods=['GET'])
+@conditional_response(_activity_detail_version)
+@response_cache.cached_response(tags=lambda activity_id: [f'activity:{Activity.parse_id(activity_id)}'],
+                                 vary_on_auth=True)
 def get_activity_detail(activity_id):
     """获取活动详情"""
     try:
@@ -215,19 +313,9 @@ def get_activity_detail(activity_id):
             }), 404
 
         # 获取用户ID（如果有认证）
-        user_id = None
-        token = request.headers.get('Authorization')
-        if token and token.startswith('Bearer '):
-            try:
-                token = token[7:]
-                from middleware.auth import Config
-                import jwt
-                data = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
-                user_id = int(data['user_id'])
-            except:
-                pass
-
-        activity_detail = activity.to_dict(user_id=user_id)
+        user_id = optional_user_id()
+
+        activity_detail = activity.to_dict(user_id=user_id, fields=FieldSet.from_request())
 
         return jsonify({
             "code": 200,
@@ -241,6 +329,77 @@ def get_activity_detail(activity_id):
         }), 500
 
 
+@activity_bp.route('/user/feed', methods=['GET'])
+@token_required
+def get_user_feed():
+    """获取关注社团发布的活动动态（按发布时间倒序，游标分页）"""
+    try:
+        user_id = int(g.user_id)
+        limit = int(request.args.get('limit', 10))
+        cursor = request.args.get('cursor')
+
+        activities, next_cursor = feed.page(user_id, cursor, limit)
+        activities_data = Activity.to_dict_list(activities, user_id=user_id, fields=FieldSet.from_request())
+
+        return jsonify({
+            "code": 200,
+            "data": cursor_page("activities", activities_data, next_cursor, limit)
+        })
+
+    except InvalidCursorError:
+        return jsonify({
+            "code": 400,
+            "message": "无效的分页游标"
+        }), 400
+    except InvalidLimitError as e:
+        return jsonify({
+            "code": 400,
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "message": f"获取关注动态失败: {str(e)}"
+        }), 500
+
+
+@activity_bp.route('/user/recommendations', methods=['GET'])
+@token_required
+def get_user_recommendations():
+    """获取为用户离线计算的推荐活动（只返回仍未开始的活动）"""
+    try:
+        user_id = int(g.user_id)
+        limit = int(request.args.get('limit', 10))
+
+        rows = db.session.query(Activity, UserRecommendation.score, UserRecommendation.computed_at) \
+            .join(UserRecommendation, UserRecommendation.activity_id == Activity.id) \
+            .filter(UserRecommendation.user_id == user_id,
+                    Activity.status == 'published',
+                    Activity.start_time > datetime.utcnow()) \
+            .order_by(UserRecommendation.rank) \
+            .limit(limit) \
+            .all()
+
+        activities_data = Activity.to_dict_list([row[0] for row in rows], user_id=user_id,
+                                                fields=FieldSet.from_request())
+        for item, row in zip(activities_data, rows):
+            item['score'] = round(row.score, 4)
+
+        return jsonify({
+            "code": 200,
+            "data": {
+                "activities": activities_data,
+                "computed_at": rows[0].computed_at.isoformat() + 'Z' if rows else None
+            }
+        })
+
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "message": f"获取推荐活动失败: {str(e)}"
+        }), 500
+
+
 @activity_bp.route('/user/registered-activities', methods=['GET'])
 @token_required
 def get_registered_activities():
@@ -248,26 +407,29 @@ def get_registered_activities():
     try:
         user_id = int(g.user_id)
 
-        # 获取用户已批准报名的活动
-        registrations = Registration.query.filter_by(user_id=user_id, status='approved').all()
+        # 获取用户已批准报名的活动（按报名顺序）
+        activities = Activity.query \
+            .join(Registration, Registration.activity_id == Activity.id) \
+            .filter(Registration.user_id == user_id, Registration.status == 'approved') \
+            .order_by(Registration.id) \
+            .all()
+        clubs = Activity.prefetch_clubs(activities)
 
         registered_activities = []
-        for registration in registrations:
-            activity = registration.activity
-            if activity:
-                registered_activities.append({
-                    'activity_id': activity.id,
-                    'title': activity.title,
-                    'start_time': activity.start_time.isoformat() + 'Z' if activity.start_time else None,
-                    'end_time': activity.end_time.isoformat() + 'Z' if activity.end_time else None,
-                    'location': activity.location,
-                    'club_name': activity.club.name if activity.club else '',
-                    'participant_count': Registration.query.filter_by(activity_id=activity.id,
-                                                                      status='approved').count(),
-                    'max_participants': activity.max_participants,
-                    'status': activity.status,
-                    'is_registered': True
-                })
+        for activity in activities:
+            club = clubs.get(activity.club_id)
+            registered_activities.append({
+                'activity_id': activity.id,
+                'title': activity.title,
+                'start_time': activity.start_time.isoformat() + 'Z' if activity.start_time else None,
+                'end_time': activity.end_time.isoformat() + 'Z' if activity.end_time else None,
+                'location': activity.location,
+                'club_name': club.name if club else '',
+                'participant_count': activity.approved_count,
+                'max_participants': activity.max_participants,
+                'status': activity.status,
+                'is_registered': True
+            })
 
         return jsonify({
             "code": 200,
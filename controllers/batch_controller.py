@@ -0,0 +1,116 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, request, jsonify, g, current_app
+from middleware.auth import token_required
+
+batch_bp = Blueprint('batch', __name__)
+
+ALLOWED_METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+
+
+@batch_bp.route('/batch', methods=['POST'])
+@token_required
+def batch():
+    """批量请求：一次认证，在进程内执行多个子请求
+
+    请求体 {"requests": [{"id": "profile", "method": "GET", "path": "/v1/user/profile", "body": {...}}]}，
+    连续的 GET 子请求并行执行，写请求按顺序串行执行；结果按提交顺序返回。
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        sub_requests = data.get('requests')
+
+        if not isinstance(sub_requests, list) or not sub_requests:
+            return jsonify({
+                "code": 400,
+                "message": "requests必须为非空数组"
+            }), 400
+
+        max_requests = current_app.config.get('BATCH_MAX_REQUESTS', 20)
+        if len(sub_requests) > max_requests:
+            return jsonify({
+                "code": 400,
+                "message": f"子请求数量不能超过{max_requests}个"
+            }), 400
+
+        principal = {
+            'token': request.headers.get('Authorization'),
+            'user_id': g.user_id,
+            'user_role': g.user_role
+        }
+        app = current_app._get_current_object()
+        workers = current_app.config.get('BATCH_MAX_WORKERS', 4)
+
+        responses = [None] * len(sub_requests)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # 按顺序切分：连续的只读请求为一组并行执行，写请求单独成组
+            index = 0
+            while index < len(sub_requests):
+                group = [index]
+                if _method(sub_requests[index]) == 'GET':
+                    while group[-1] + 1 < len(sub_requests) and _method(sub_requests[group[-1] + 1]) == 'GET':
+                        group.append(group[-1] + 1)
+                futures = {
+                    i: executor.submit(_dispatch, app, principal, sub_requests[i]) for i in group
+                }
+                for i, future in futures.items():
+                    responses[i] = dict(future.result(), id=_request_id(sub_requests[i], i))
+                index = group[-1] + 1
+
+        return jsonify({
+            "code": 200,
+            "data": {
+                "responses": responses
+            }
+        })
+
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "message": f"批量请求失败: {str(e)}"
+        }), 500
+
+
+def _method(sub_request):
+    return str(sub_request.get('method', 'GET')).upper() if isinstance(sub_request, dict) else 'GET'
+
+
+def _request_id(sub_request, index):
+    return sub_request.get('id', index) if isinstance(sub_request, dict) else index
+
+
+def _error(status, message):
+    return {'status': status, 'body': {"code": status, "message": message}}
+
+
+def _dispatch(app, principal, sub_request):
+    """在独立的应用上下文中执行一个子请求，复用外层请求的认证结果"""
+    if not isinstance(sub_request, dict):
+        return _error(400, "子请求格式错误")
+
+    method = _method(sub_request)
+    path = sub_request.get('path', '')
+    if method not in ALLOWED_METHODS:
+        return _error(400, f"不支持的请求方法: {method}")
+    if not isinstance(path, str) or not path.startswith('/v1/') or path.split('?')[0].rstrip('/') == '/v1/batch':
+        return _error(400, "path必须为/v1/开头的接口路径，且不能嵌套批量请求")
+
+    with app.app_context():
+        g.user_id = principal['user_id']
+        g.user_role = principal['user_role']
+        g.authenticated_token = principal['token']
+
+        headers = {'Authorization': principal['token']}
+        body = sub_request.get('body')
+        try:
+            with app.test_request_context(path, method=method, headers=headers, json=body):
+                response = app.full_dispatch_request()
+        except Exception as e:
+            return _error(500, f"子请求执行失败: {str(e)}")
+
+        raw = response.get_data(as_text=True)
+        try:
+            payload = json.loads(raw) if response.is_json else raw
+        except ValueError:
+            payload = raw
+        return {'status': response.status_code, 'body': payload}
@@ -0,0 +1,194 @@
+import re
+import secrets
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, g, url_for, current_app, stream_with_context
+from middleware.auth import token_required
+from models import db, User, Activity, Registration
+from utils import ical
+from utils.conditional import conditional_response
+
+calendar_bp = Blueprint('calendar', __name__)
+
+# 增量同步回看的时长，容忍事务提交晚于 updated_at 的情况
+SYNC_OVERLAP = timedelta(seconds=30)
+EPOCH = datetime(1970, 1, 1)
+# encode_sync_token 只会生成非负的十六进制数，不接受符号、空白与下划线
+_SYNC_TOKEN_RE = re.compile(r'[0-9a-f]+')
+
+
+def encode_sync_token(value):
+    """同步令牌：updated_at 距纪元的微秒数（十六进制）"""
+    delta = value - EPOCH
+    return format((delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds, 'x')
+
+
+def decode_sync_token(token):
+    """解析同步令牌，格式错误或为负数时抛出 ValueError，超出时间范围时抛出 OverflowError"""
+    if not _SYNC_TOKEN_RE.fullmatch(token):
+        raise ValueError(f'invalid sync token: {token!r}')
+    return EPOCH + timedelta(microseconds=int(token, 16))
+
+
+def _calendar_owner(token):
+    """按订阅令牌查找用户 ID，结果缓存在请求上下文中"""
+    if 'calendar_owner' not in g:
+        g.calendar_owner = db.session.query(User.id).filter(User.calendar_token == token).scalar()
+    return g.calendar_owner
+
+
+def _calendar_scope(user_id):
+    """加入日历的报名记录（不限状态，全量输出时再筛选已通过的）"""
+    return db.session.query(Registration) \
+        .join(Activity, Activity.id == Registration.activity_id) \
+        .filter(Registration.user_id == user_id, Registration.add_to_calendar.is_(True))
+
+
+def _calendar_version(token):
+    """日历的版本：报名记录与活动的最新更新时间、记录数，以及请求的同步令牌"""
+    user_id = _calendar_owner(token)
+    if user_id is None:
+        return None
+
+    registrations_at, activities_at, count = _calendar_scope(user_id).with_entities(
+        db.func.max(Registration.updated_at),
+        db.func.max(Activity.updated_at),
+        db.func.count(Registration.id)
+    ).one()
+    last_modified = max((value for value in (registrations_at, activities_at) if value), default=None)
+    g.calendar_last_modified = last_modified
+    return last_modified, (user_id, registrations_at, activities_at, count, request.args.get('sync_token'))
+
+
+@calendar_bp.route('/calendar/<token>.ics', methods=['GET'])
+@conditional_response(_calendar_version)
+def calendar_feed(token):
+    """日历订阅（iCalendar），以链接中的令牌认证，供日历应用定期拉取
+
+    默认输出全部已通过的报名；带 sync_token 时只输出此后变化的日程，
+    曾经通过（approved_at 非空）后被拒绝或活动取消的日程以 STATUS:CANCELLED 输出，客户端据 UID 移除；
+    从未通过的待审核、候补报名客户端不可能有，不输出。
+    新的同步令牌在 X-SYNC-TOKEN 属性和 X-Sync-Token 响应头中返回。
+    用户取消报名只允许在通过之前；但删除活动、社团或用户会级联删除报名记录，
+    这类删除不会出现在增量结果中，客户端需要定期不带 sync_token 全量同步。
+    """
+    try:
+        user_id = _calendar_owner(token)
+        if user_id is None:
+            return jsonify({
+                "code": 404,
+                "message": "日历不存在"
+            }), 404
+
+        since = None
+        if request.args.get('sync_token'):
+            try:
+                since = decode_sync_token(request.args['sync_token'])
+            except (ValueError, OverflowError):
+                return jsonify({
+                    "code": 400,
+                    "message": "sync_token无效"
+                }), 400
+
+        last_modified = g.get('calendar_last_modified')
+        sync_token = encode_sync_token(max(
+            (value for value in (last_modified, since) if value), default=datetime.utcnow()
+        ))
+
+        query = _calendar_scope(user_id).with_entities(
+            Activity.id, Activity.title, Activity.description, Activity.location, Activity.start_time,
+            Activity.end_time, Activity.status, Activity.updated_at,
+            Registration.status, Registration.updated_at, Registration.reminder_time
+        )
+        if since is None:
+            query = query.filter(Registration.status == 'approved')
+        else:
+            query = query.filter(db.or_(Registration.status == 'approved', Registration.approved_at.isnot(None)),
+                                 db.or_(Registration.updated_at > since - SYNC_OVERLAP,
+                                        Activity.updated_at > since - SYNC_OVERLAP))
+        query = query.order_by(Activity.start_time, Activity.id).yield_per(200)
+        host = request.host.split(':')[0]
+
+        def generate():
+            yield ical.calendar_header('我的活动', sync_token)
+            for (activity_id, title, description, location, start_time, end_time, activity_status,
+                 activity_updated_at, registration_status, registration_updated_at, reminder_time) in query:
+                confirmed = registration_status == 'approved' and activity_status == 'published'
+                yield ical.event(
+                    uid=f'act_{activity_id:03d}@{host}',
+                    summary=title,
+                    start=start_time,
+                    end=end_time,
+                    description=description,
+                    location=location,
+                    status='CONFIRMED' if confirmed else 'CANCELLED',
+                    last_modified=max(value for value in (activity_updated_at, registration_updated_at) if value),
+                    alarm=reminder_time
+                )
+            yield ical.calendar_footer()
+
+        response = current_app.response_class(stream_with_context(generate()), mimetype='text/calendar')
+        response.headers['Content-Disposition'] = 'inline; filename="activities.ics"'
+        response.headers['X-Sync-Token'] = sync_token
+        return response
+
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "message": f"生成日历失败: {str(e)}"
+        }), 500
+
+
+@calendar_bp.route('/user/calendar', methods=['GET'])
+@token_required
+def get_calendar_subscription():
+    """获取日历订阅链接，首次调用时生成令牌"""
+    try:
+        user_id = int(g.user_id)
+        # 只在尚无令牌时写入，并发请求拿到同一个令牌
+        User.query.filter(User.id == user_id, User.calendar_token.is_(None)) \
+            .update({User.calendar_token: secrets.token_urlsafe(32)}, synchronize_session=False)
+        db.session.commit()
+        return _subscription_response(user_id)
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            "code": 500,
+            "message": f"获取日历订阅失败: {str(e)}"
+        }), 500
+
+
+@calendar_bp.route('/user/calendar/reset', methods=['POST'])
+@token_required
+def reset_calendar_subscription():
+    """重置日历订阅链接，旧链接立即失效"""
+    try:
+        user_id = int(g.user_id)
+        User.query.filter(User.id == user_id) \
+            .update({User.calendar_token: secrets.token_urlsafe(32)}, synchronize_session=False)
+        db.session.commit()
+        return _subscription_response(user_id)
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            "code": 500,
+            "message": f"重置日历订阅失败: {str(e)}"
+        }), 500
+
+
+def _subscription_response(user_id):
+    token = db.session.query(User.calendar_token).filter(User.id == user_id).scalar()
+    if token is None:
+        return jsonify({
+            "code": 404,
+            "message": "用户不存在"
+        }), 404
+
+    return jsonify({
+        "code": 200,
+        "data": {
+            "token": token,
+            "url": url_for('calendar.calendar_feed', token=token, _external=True)
+        }
+    })
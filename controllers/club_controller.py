@@ -1,11 +1,44 @@
 from flask import Blueprint, request, jsonify, g
-from middleware.auth import token_required
-from models import db, Club, Follow, Activity, Registration
-from sqlalchemy import or_
+from middleware.auth import token_required, optional_user_id
+from models import db, Club, Follow, Activity, Registration, ClubSimilarity
+from utils.pagination import paginate_keyset, cursor_page, InvalidCursorError, InvalidLimitError
+from utils import search_index, response_cache
+from utils.conditional import conditional_response
+from utils.fieldsets import FieldSet
 
 club_bp = Blueprint('club', __name__)
 
+
+def _club_list_version():
+    """社团列表的版本：社团与活动的最新更新时间和行数，关注表的行数和最大ID（取消关注只会减少行数）"""
+    row = db.session.query(
+        db.func.max(Club.updated_at),
+        db.func.count(Club.id),
+        db.select(db.func.max(Activity.updated_at)).scalar_subquery(),
+        db.select(db.func.count(Activity.id)).scalar_subquery(),
+        db.select(db.func.max(Follow.id)).scalar_subquery(),
+        db.select(db.func.count(Follow.id)).scalar_subquery()
+    ).one()
+    return None, (*row, optional_user_id())
+
+
+def _club_detail_version(club_id):
+    """社团详情的版本：社团本身、旗下活动与关注记录的变化，以及调用者是否关注"""
+    row = db.session.query(
+        Club.updated_at,
+        db.select(db.func.max(Activity.updated_at)).where(Activity.club_id == Club.id).scalar_subquery(),
+        db.select(db.func.count(Activity.id)).where(Activity.club_id == Club.id).scalar_subquery(),
+        db.select(db.func.max(Follow.id)).where(Follow.club_id == Club.id).scalar_subquery(),
+        db.select(db.func.count(Follow.id)).where(Follow.club_id == Club.id).scalar_subquery()
+    ).filter(Club.id == club_id).first()
+    if row is None:
+        return None
+    return None, (club_id, *row, int(g.user_id))
+
+
 @club_bp.route('/clubs', methods=['GET'])
+@conditional_response(_club_list_version)
+@response_cache.cached_response(tags=['clubs'])
 def get_clubs():
     """获取社团列表"""
     try:
@@ -13,21 +46,30 @@ def get_clubs():
         limit = int(request.args.get('limit', 10))
         search = request.args.get('search', '')
         club_type = request.args.get('type', '')
+        cursor = request.args.get('cursor')  # 传入cursor参数即使用游标分页
         
         # 构建查询
         query = Club.query
         
         # 搜索筛选
         if search:
-            query = query.filter(or_(
-                Club.name.ilike(f'%{search}%'),
-                Club.description.ilike(f'%{search}%')
-            ))
+            query = query.filter(search_index.match_clause('club', search))
         
         # 类型筛选
         if club_type:
             query = query.filter(Club.type == club_type)
         
+        user_id = int(g.user_id) if hasattr(g, 'user_id') else None
+        
+        # 游标分页：按 (created_at, id) 倒序定位，总数仅在 include_total=1 时计算
+        if cursor is not None:
+            total = query.count() if request.args.get('include_total') == '1' else None
+            clubs, next_cursor = paginate_keyset(query, [Club.created_at, Club.id], cursor, limit, descending=True)
+            return jsonify({
+                "code": 200,
+                "data": cursor_page("clubs", Club.to_dict_list(clubs, user_id=user_id, fields=FieldSet.from_request()), next_cursor, limit, total)
+            })
+        
         # 获取总数
         total = query.count()
         
@@ -38,8 +80,7 @@ def get_clubs():
                     .all()
         
         # 转换为字典
-        user_id = int(g.user_id) if hasattr(g, 'user_id') else None
-        clubs_data = [club.to_dict(user_id=user_id) for club in clubs]
+        clubs_data = Club.to_dict_list(clubs, user_id=user_id, fields=FieldSet.from_request())
         
         return jsonify({
             "code": 200,
@@ -51,6 +92,16 @@ def get_clubs():
             }
         })
         
+    except InvalidCursorError:
+        return jsonify({
+            "code": 400,
+            "message": "无效的分页游标"
+        }), 400
+    except InvalidLimitError as e:
+        return jsonify({
+            "code": 400,
+            "message": str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -59,6 +110,7 @@ def get_clubs():
 
 @club_bp.route('/clubs/<int:club_id>', methods=['GET'])
 @token_required
+@conditional_response(_club_detail_version)
 def get_club_detail(club_id):
     """获取社团详情"""
     club = Club.query.get(club_id)
@@ -71,7 +123,8 @@ def get_club_detail(club_id):
     
     try:
         user_id = int(g.user_id)
-        club_detail = club.to_dict(with_recent_activities=True, user_id=user_id)
+        club_detail = club.to_dict(with_recent_activities=True, user_id=user_id,
+                                   fields=FieldSet.from_request())
         
         return jsonify({
             "code": 200,
@@ -84,6 +137,38 @@ def get_club_detail(club_id):
             "message": f"获取社团详情失败: {str(e)}"
         }), 500
 
+@club_bp.route('/clubs/<int:club_id>/similar', methods=['GET'])
+def get_similar_clubs(club_id):
+    """获取与该社团关注人群重合度最高的社团（读取预先维护的 top-N 列表）"""
+    try:
+        limit = int(request.args.get('limit', 10))
+
+        rows = db.session.query(Club, ClubSimilarity.score, ClubSimilarity.common_followers) \
+            .join(ClubSimilarity, ClubSimilarity.similar_club_id == Club.id) \
+            .filter(ClubSimilarity.club_id == club_id) \
+            .order_by(ClubSimilarity.rank) \
+            .limit(limit) \
+            .all()
+
+        clubs_data = Club.to_dict_list([row[0] for row in rows], fields=FieldSet.from_request())
+        for item, row in zip(clubs_data, rows):
+            item['similarity'] = round(row.score, 4)
+            item['common_followers'] = row.common_followers
+
+        return jsonify({
+            "code": 200,
+            "data": {
+                "clubs": clubs_data
+            }
+        })
+
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "message": f"获取相似社团失败: {str(e)}"
+        }), 500
+
+
 @club_bp.route('/clubs/<int:club_id>/follow', methods=['POST'])
 @token_required
 def follow_club(club_id):
@@ -111,6 +196,7 @@ def follow_club(club_id):
         follow = Follow(user_id=user_id, club_id=club_id)
         db.session.add(follow)
         db.session.commit()
+        response_cache.invalidate('clubs')
         
         return jsonify({
             "code": 200,
@@ -150,6 +236,7 @@ def unfollow_club(club_id):
         # 删除关注记录
         db.session.delete(follow)
         db.session.commit()
+        response_cache.invalidate('clubs')
         
         return jsonify({
             "code": 200,
@@ -170,29 +257,45 @@ def get_followed_clubs():
     try:
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 10))
+        cursor = request.args.get('cursor')  # 传入cursor参数即使用游标分页
         
         user_id = int(g.user_id)
         
+        # 游标分页：按关注记录的 (created_at, id) 倒序定位
+        if cursor is not None:
+            total = Follow.query.filter_by(user_id=user_id).count() \
+                if request.args.get('include_total') == '1' else None
+            query = db.session.query(Club, Follow.created_at, Follow.id)\
+                        .join(Follow, Follow.club_id == Club.id)\
+                        .filter(Follow.user_id == user_id)
+            rows, next_cursor = paginate_keyset(query, [Follow.created_at, Follow.id], cursor, limit,
+                                                descending=True, key=lambda row: row[1:])
+            clubs_data = Club.to_dict_list([row[0] for row in rows], fields=FieldSet.from_request())
+            for club_dict in clubs_data:
+                club_dict['is_followed'] = True
+            return jsonify({
+                "code": 200,
+                "data": cursor_page("clubs", clubs_data, next_cursor, limit, total)
+            })
+        
         # 查询用户关注的社团
         follows = Follow.query.filter_by(user_id=user_id)
         
         # 获取总数
         total = follows.count()
         
-        # 分页
-        follows = follows.order_by(Follow.created_at.desc())\
-                        .offset((page - 1) * limit)\
-                        .limit(limit)\
-                        .all()
+        # 分页（关注记录与社团一次联表取出）
+        clubs = Club.query.join(Follow, Follow.club_id == Club.id)\
+                    .filter(Follow.user_id == user_id)\
+                    .order_by(Follow.created_at.desc())\
+                    .offset((page - 1) * limit)\
+                    .limit(limit)\
+                    .all()
         
         # 获取社团详情
-        clubs_data = []
-        for follow in follows:
-            club = Club.query.get(follow.club_id)
-            if club:
-                club_dict = club.to_dict()
-                club_dict['is_followed'] = True
-                clubs_data.append(club_dict)
+        clubs_data = Club.to_dict_list(clubs, fields=FieldSet.from_request())
+        for club_dict in clubs_data:
+            club_dict['is_followed'] = True
         
         return jsonify({
             "code": 200,
@@ -204,6 +307,16 @@ def get_followed_clubs():
             }
         })
         
+    except InvalidCursorError:
+        return jsonify({
+            "code": 400,
+            "message": "无效的分页游标"
+        }), 400
+    except InvalidLimitError as e:
+        return jsonify({
+            "code": 400,
+            "message": str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
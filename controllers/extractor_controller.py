@@ -1,11 +1,10 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, stream_with_context, url_for
 import json
 import time
-from openai import OpenAI
-import os
-from dotenv import load_dotenv
-from extractor.activity_info_extractor import Activity_info_extractor
-from extractor.wechat_article_extractor import Wechat_article_extractor
+from middleware.auth import optional_user_id
+from models import db, ExtractionJob
+from extractor import pipeline
+from utils import extraction_jobs
 
 # 修正Blueprint名称，使其与变量名一致
 extract_bp = Blueprint('extract', __name__)
@@ -13,9 +12,15 @@ extract_bp = Blueprint('extract', __name__)
 
 @extract_bp.route('/extract/wechat', methods=['POST'])
 def extract_wechat():
+    """提取公众号文章中的活动信息
+
+    默认在请求内同步执行；请求体带 "async": true（或 ?async=1）时创建后台任务并立即返回 202，
+    之后通过 GET /v1/extract/jobs/<job_id> 轮询或 /events 订阅进度与结果。
+    同一文章的正文与提取结果会被缓存；"force_refresh": true（或 ?force_refresh=1）时忽略缓存重新抓取与提取。
+    """
     try:
         # 从请求中获取文章URL（而不是硬编码）
-        data = request.get_json()
+        data = request.get_json(silent=True)
         if not data or 'article_url' not in data:
             return jsonify({
                 'code': 400,
@@ -25,38 +30,37 @@ def extract_wechat():
 
         article_url = data['article_url']
         print(article_url)
-        load_dotenv()
-
-        # 从环境变量获取API密钥
-        api_key = os.getenv('ALIYUN_API_KEY')
-
-        # 初始化客户端
-        client = OpenAI(
-            api_key=api_key,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-        )
-
-        # 提取文章内容
-        extractor = Wechat_article_extractor()
-        article_content = extractor.extract_article_content(article_url)
-        print(article_content)
-        if not article_content:
+        force_refresh = bool(data.get('force_refresh')) or request.args.get('force_refresh') == '1'
+
+        if data.get('async') or request.args.get('async') == '1':
+            try:
+                job = extraction_jobs.create(article_url, optional_user_id(), force_refresh)
+            except extraction_jobs.QueueFullError:
+                return jsonify({
+                    'code': 503,
+                    'message': '提取任务过多，请稍后再试',
+                    'data': None
+                }), 503
+
             return jsonify({
-                'code': 500,
-                'message': '文章内容提取失败',
-                'data': None
-            }), 500
+                'code': 202,
+                'message': '任务已创建',
+                'data': dict(job.to_dict(),
+                             status_url=url_for('extract.get_extraction_job', job_id=job.id),
+                             events_url=url_for('extract.extraction_job_events', job_id=job.id))
+            }), 202
 
-        # 提取活动信息
-        activity_extractor = Activity_info_extractor(client)
-        activity_info = activity_extractor.extract_activity_info(article_content)
-        print(article_content)
-        if not activity_info:
+        try:
+            # 提取文章内容，再提取活动信息
+            article_content = pipeline.fetch_article(article_url, force_refresh)
+            activity_info = pipeline.extract_activity_info(article_content, force_refresh)
+        except pipeline.ExtractionError as e:
             return jsonify({
                 'code': 500,
-                'message': '活动信息提取失败',
+                'message': str(e),
                 'data': None
             }), 500
+
         # 返回成功响应
         return jsonify({
             'code': 200,
@@ -72,4 +76,73 @@ def extract_wechat():
             'code': 500,
             'message': f'服务器内部错误: {str(e)}',
             'data': None
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+@extract_bp.route('/extract/jobs/<job_id>', methods=['GET'])
+def get_extraction_job(job_id):
+    """查询提取任务的状态、进度与结果"""
+    try:
+        extraction_jobs.ensure_started()
+        job = db.session.get(ExtractionJob, job_id)
+        if not job:
+            return jsonify({
+                'code': 404,
+                'message': '任务不存在',
+                'data': None
+            }), 404
+
+        return jsonify({
+            'code': 200,
+            'message': '查询成功',
+            'data': job.to_dict()
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'code': 500,
+            'message': f'服务器内部错误: {str(e)}',
+            'data': None
+        }), 500
+
+
+@extract_bp.route('/extract/jobs/<job_id>/events', methods=['GET'])
+def extraction_job_events(job_id):
+    """以 Server-Sent Events 推送任务进度，任务结束或超时后关闭连接"""
+    try:
+        extraction_jobs.ensure_started()
+        if not db.session.get(ExtractionJob, job_id):
+            return jsonify({
+                'code': 404,
+                'message': '任务不存在',
+                'data': None
+            }), 404
+
+        interval = current_app.config.get('EXTRACT_EVENTS_INTERVAL', 0.5)
+        deadline = time.monotonic() + current_app.config.get('EXTRACT_EVENTS_TIMEOUT', 120)
+
+        def generate():
+            yield 'retry: 2000\n\n'
+            last = None
+            while True:
+                # 结束只读事务，下一轮读取到工作线程提交的最新状态
+                db.session.commit()
+                state = db.session.get(ExtractionJob, job_id).to_dict()
+                if state != last:
+                    yield f"event: {state['status']}\ndata: {json.dumps(state, ensure_ascii=False)}\n\n"
+                    last = state
+                if state['status'] in ExtractionJob.FINISHED_STATUSES or time.monotonic() >= deadline:
+                    return
+                time.sleep(interval)
+
+        response = current_app.response_class(stream_with_context(generate()), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    except Exception as e:
+        return jsonify({
+            'code': 500,
+            'message': f'服务器内部错误: {str(e)}',
+            'data': None
+        }), 500
@@ -1,6 +1,10 @@
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, request, jsonify, g, current_app, stream_with_context
 from middleware.auth import token_required
 from models import db, Activity, Registration, User
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from utils import response_cache, export
+from utils.pagination import paginate_keyset, cursor_page, InvalidCursorError, InvalidLimitError
 from datetime import datetime
 
 registration_bp = Blueprint('registration', __name__)
@@ -9,68 +13,138 @@ registration_bp = Blueprint('registration', __name__)
 @registration_bp.route('/activities/<activity_id>/register', methods=['POST'])
 @token_required
 def register_activity(activity_id):
-    """报名活动"""
+    """报名活动
+
+    名额通过一条带条件的 UPDATE 原子占用，再插入报名记录，
+    并发请求下最多只有 max_participants 人报名成功；
+    名额已满时默认加入候补（joinWaitlist=false 可关闭）。
+    """
     data = request.get_json() or {}
 
     try:
         user_id = int(g.user_id)
+        act_id = Activity.parse_id(activity_id)
+        fields = {
+            'add_to_calendar': data.get('addToCalendar', True),
+            'reminder_time': datetime.fromisoformat(data['reminderTime'].replace('Z', '+00:00')) if data.get(
+                'reminderTime') else None
+        }
+        current_time = datetime.utcnow()
 
-        # 检查活动是否存在
-        if activity_id.isdigit():
-            activity = Activity.query.get(int(activity_id))
-        else:
-            if activity_id.startswith('act_'):
-                act_id = int(activity_id.split('_')[1])
-                activity = Activity.query.get(act_id)
-            else:
-                activity = None
+        # 占用名额：活动存在、名额未满且未过报名截止时间时计数加一
+        claimed = Activity.query.filter(
+            Activity.id == act_id,
+            Activity.has_open_seat(),
+            or_(Activity.registration_end_time.is_(None),
+                Activity.registration_end_time >= current_time)
+        ).update({Activity.approved_count: Activity.approved_count + 1}, synchronize_session=False)
 
-        if not activity:
-            return jsonify({
-                "code": 404,
-                "message": "活动不存在"
-            }), 404
+        if not claimed:
+            db.session.rollback()
+            return _registration_rejected(act_id, user_id, current_time, fields, data.get('joinWaitlist', True))
+
+        # 创建报名记录（唯一约束保证同一用户不会重复报名）
+        registration = Registration(
+            user_id=user_id,
+            activity_id=act_id,
+            status='approved',  # 默认待审核
+            approved_at=current_time,
+            **fields
+        )
 
-        # 检查是否已报名
-        existing_registration = Registration.query.filter_by(user_id=user_id, activity_id=activity.id).first()
-        if existing_registration:
+        db.session.add(registration)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # 重复报名：回滚会一并撤销名额占用
+            db.session.rollback()
             return jsonify({
                 "code": 400,
                 "message": "您已报名该活动"
             }), 400
+        response_cache.invalidate('activities', f'activity:{act_id}')
 
-        # 检查名额
-        approved_count = Registration.query.filter_by(activity_id=activity.id, status='approved').count()
-        if activity.max_participants > 0 and approved_count >= activity.max_participants:
-            return jsonify({
-                "code": 400,
-                "message": "活动名额已满"
-            }), 400
+        return jsonify({
+            "code": 200,
+            "message": "报名成功，等待审核",
+            "data": {
+                'registrationId': f"reg_{registration.id:03d}",
+                'status': 'pending'
+            }
+        })
 
-        # 检查报名截止时间
-        current_time = datetime.utcnow()
-        if activity.registration_end_time and current_time > activity.registration_end_time:
-            return jsonify({
-                "code": 400,
-                "message": "报名时间已截止"
-            }), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            "code": 500,
+            "message": f"报名失败: {str(e)}"
+        }), 500
 
-        # 获取用户信息
-        user = User.query.get(user_id)
 
-        # 创建报名记录
-        registration = Registration(
-            user_id=user_id,
-            activity_id=activity.id,
-            status='approved',  # 默认待审核
-            add_to_calendar=data.get('addToCalendar', True),
-            reminder_time=datetime.fromisoformat(data['reminderTime'].replace('Z', '+00:00')) if data.get(
-                'reminderTime') else None
-        )
+def _registration_rejected(act_id, user_id, current_time, fields, join_waitlist):
+    """名额占用失败时，按原有顺序给出具体原因；名额已满时加入候补"""
+    activity = db.session.get(Activity, act_id) if act_id is not None else None
+    if not activity:
+        return jsonify({
+            "code": 404,
+            "message": "活动不存在"
+        }), 404
 
-        db.session.add(registration)
+    if Registration.query.filter_by(user_id=user_id, activity_id=activity.id).first():
+        return jsonify({
+            "code": 400,
+            "message": "您已报名该活动"
+        }), 400
+
+    deadline_passed = activity.registration_end_time and current_time > activity.registration_end_time
+
+    if activity.max_participants and activity.max_participants > 0 \
+            and activity.approved_count >= activity.max_participants:
+        if join_waitlist and not deadline_passed:
+            return _join_waitlist(activity, user_id, fields)
+        return jsonify({
+            "code": 400,
+            "message": "活动名额已满"
+        }), 400
+
+    if deadline_passed:
+        return jsonify({
+            "code": 400,
+            "message": "报名时间已截止"
+        }), 400
+
+    # 名额在占用与查询之间发生了变化
+    return jsonify({
+        "code": 409,
+        "message": "报名人数较多，请稍后重试"
+    }), 409
+
+
+def _join_waitlist(activity, user_id, fields):
+    """加入候补队列；若此时恰好有名额空出，会立即按顺序递补"""
+    registration = Registration(
+        user_id=user_id,
+        activity_id=activity.id,
+        status='waitlisted',
+        waitlist_position=Registration.next_waitlist_position(activity.id),
+        **fields
+    )
+
+    db.session.add(registration)
+    try:
+        db.session.flush()
+        Activity.adjust_registration_counts(activity.id, new_status='waitlisted')
+        Activity.promote_waitlist(activity.id)
         db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({
+            "code": 400,
+            "message": "您已报名该活动"
+        }), 400
+    response_cache.invalidate('activities', f'activity:{activity.id}')
 
+    if registration.status == 'approved':
         return jsonify({
             "code": 200,
             "message": "报名成功，等待审核",
@@ -80,11 +154,49 @@ def register_activity(activity_id):
             }
         })
 
+    return jsonify({
+        "code": 200,
+        "message": "活动名额已满，已加入候补",
+        "data": {
+            'registrationId': f"reg_{registration.id:03d}",
+            'status': 'waitlisted',
+            'waitlistPosition': registration.waitlist_rank()
+        }
+    })
+
+
+@registration_bp.route('/activities/<activity_id>/waitlist', methods=['GET'])
+@token_required
+def get_waitlist_position(activity_id):
+    """查看自己的候补位置"""
+    try:
+        user_id = int(g.user_id)
+        act_id = Activity.parse_id(activity_id)
+
+        registration = Registration.query.filter_by(user_id=user_id, activity_id=act_id).first() \
+            if act_id is not None else None
+        if not registration:
+            return jsonify({
+                "code": 404,
+                "message": "未找到报名记录"
+            }), 404
+
+        activity = db.session.get(Activity, registration.activity_id)
+
+        return jsonify({
+            "code": 200,
+            "data": {
+                'registrationId': f"reg_{registration.id:03d}",
+                'status': registration.status,
+                'waitlistPosition': registration.waitlist_rank(),
+                'waitlistTotal': activity.waitlisted_count
+            }
+        })
+
     except Exception as e:
-        db.session.rollback()
         return jsonify({
             "code": 500,
-            "message": f"报名失败: {str(e)}"
+            "message": f"获取候补位置失败: {str(e)}"
         }), 500
 
 
@@ -130,7 +242,10 @@ def cancel_registration(activity_id):
         try:
             # 删除报名记录
             db.session.delete(registration)
+            Activity.adjust_registration_counts(activity.id, old_status=registration.status)
+            Activity.promote_waitlist(activity.id)
             db.session.commit()
+            response_cache.invalidate('activities', f'activity:{activity.id}')
 
             return jsonify({
                 "code": 200,
@@ -151,59 +266,110 @@ def cancel_registration(activity_id):
         }), 500
 
 
+PARTICIPANT_STATUSES = ('pending', 'approved', 'rejected', 'waitlisted')
+PARTICIPANT_STATUS_LABELS = {'pending': '待审核', 'approved': '已通过', 'rejected': '已拒绝', 'waitlisted': '候补'}
+PARTICIPANT_EXPORT_HEADER = ['用户ID', '姓名', '学号', '手机', '学院', '专业', '报名时间', '状态', '候补位置']
+
+
+def _managed_activity(activity_id):
+    """查找当前用户管理的活动，返回 (activity, 错误响应)"""
+    act_id = Activity.parse_id(activity_id)
+    activity = Activity.query.get(act_id) if act_id is not None else None
+    if not activity:
+        return None, (jsonify({
+            "code": 404,
+            "message": "活动不存在"
+        }), 404)
+
+    # 权限检查：检查用户是否为该社团的管理员
+    if activity.club.manager_id != int(g.user_id):
+        return None, (jsonify({
+            "code": 403,
+            "message": "权限不足，只有社团管理员可以查看报名人员"
+        }), 403)
+
+    return activity, None
+
+
+def _participant_statuses():
+    """解析 status 参数（逗号分隔），包含未知状态时返回 None"""
+    statuses = [status.strip() for status in request.args.get('status', '').split(',') if status.strip()]
+    if any(status not in PARTICIPANT_STATUSES for status in statuses):
+        return None
+    return statuses
+
+
+def _participants_query(activity_id, statuses):
+    """报名记录与用户一次连接查询，只取名单需要的列"""
+    query = db.session.query(
+        Registration.id, Registration.registration_time, Registration.status, Registration.waitlist_position,
+        User.id.label('user_id'), User.username, User.student_id, User.phone, User.college, User.major
+    ).join(User, User.id == Registration.user_id).filter(Registration.activity_id == activity_id)
+    if statuses:
+        query = query.filter(Registration.status.in_(statuses))
+    return query
+
+
+def _invalid_status_response():
+    return jsonify({
+        "code": 400,
+        "message": f"status参数只能为{', '.join(PARTICIPANT_STATUSES)}"
+    }), 400
+
+
 @registration_bp.route('/activities/<activity_id>/participants', methods=['GET'])
 @token_required
 def get_activity_participants(activity_id):
-    """查看报名人员名单（社团管理员）"""
-    try:
-        # 查找活动
-        if activity_id.isdigit():
-            activity = Activity.query.get(int(activity_id))
-        else:
-            if activity_id.startswith('act_'):
-                act_id = int(activity_id.split('_')[1])
-                activity = Activity.query.get(act_id)
-            else:
-                activity = None
-
-        if not activity:
-            return jsonify({
-                "code": 404,
-                "message": "活动不存在"
-            }), 404
+    """查看报名人员名单（社团管理员）
 
-        # 权限检查：检查用户是否为该社团的管理员
-        user_id = int(g.user_id)
-        if activity.club.manager_id != user_id:
+    支持 status 筛选（逗号分隔多个状态）、page/limit 分页，传入 cursor 时按 (报名时间, id) 游标分页。
+    """
+    try:
+        activity, error = _managed_activity(activity_id)
+        if error:
+            return error
+
+        statuses = _participant_statuses()
+        if statuses is None:
+            return _invalid_status_response()
+
+        page = int(request.args.get('page', 1))
+        limit = int(request.args.get('limit', 50))
+        cursor = request.args.get('cursor')
+        query = _participants_query(activity.id, statuses)
+        columns = [Registration.registration_time, Registration.id]
+
+        if cursor is not None:
+            total = query.count() if request.args.get('include_total') == '1' else None
+            rows, next_cursor = paginate_keyset(query, columns, cursor, limit)
             return jsonify({
-                "code": 403,
-                "message": "权限不足，只有社团管理员可以查看报名人员"
-            }), 403
-
-        # 获取该活动的所有报名记录
-        registrations = Registration.query.filter_by(activity_id=activity.id).all()
-
-        participants = []
-        for registration in registrations:
-            user = registration.user
-            participants.append({
-                'user_id': user.id,
-                'real_name': user.username,
-                'phone': user.phone or '',
-                'college': user.college or '',
-                'major': user.major or '',
-                'registration_time': registration.registration_time.isoformat() + 'Z' if registration.registration_time else None,
-                'status': registration.status
+                "code": 200,
+                "data": cursor_page("participants", [_participant_dict(row) for row in rows], next_cursor, limit, total)
             })
 
+        total = query.count()
+        rows = query.order_by(*columns).offset((page - 1) * limit).limit(limit).all()
+
         return jsonify({
             "code": 200,
             "data": {
-                "participants": participants,
-                "total": len(participants)
+                "participants": [_participant_dict(row) for row in rows],
+                "total": total,
+                "page": page,
+                "limit": limit
             }
         })
 
+    except InvalidCursorError:
+        return jsonify({
+            "code": 400,
+            "message": "无效的分页游标"
+        }), 400
+    except InvalidLimitError as e:
+        return jsonify({
+            "code": 400,
+            "message": str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -211,6 +377,69 @@ def get_activity_participants(activity_id):
         }), 500
 
 
+def _participant_dict(row):
+    return {
+        'user_id': row.user_id,
+        'real_name': row.username,
+        'phone': row.phone or '',
+        'college': row.college or '',
+        'major': row.major or '',
+        'registration_time': row.registration_time.isoformat() + 'Z' if row.registration_time else None,
+        'status': row.status
+    }
+
+
+@registration_bp.route('/activities/<activity_id>/participants/export', methods=['GET'])
+@token_required
+def export_activity_participants(activity_id):
+    """导出报名人员名单（社团管理员），format=csv（默认）或 xlsx
+
+    名单边查询边输出，服务端游标分批读取，内存占用与报名人数无关；支持与名单接口相同的 status 筛选。
+    """
+    try:
+        activity, error = _managed_activity(activity_id)
+        if error:
+            return error
+
+        statuses = _participant_statuses()
+        if statuses is None:
+            return _invalid_status_response()
+
+        export_format = request.args.get('format', 'csv')
+        if export_format not in ('csv', 'xlsx'):
+            return jsonify({
+                "code": 400,
+                "message": "format参数只能为csv或xlsx"
+            }), 400
+
+        rows = _participants_query(activity.id, statuses) \
+            .order_by(Registration.registration_time, Registration.id) \
+            .yield_per(500)
+        values = (
+            [row.user_id, row.username, row.student_id, row.phone, row.college, row.major,
+             row.registration_time, PARTICIPANT_STATUS_LABELS.get(row.status, row.status), row.waitlist_position]
+            for row in rows
+        )
+
+        if export_format == 'xlsx':
+            body = export.stream_xlsx(PARTICIPANT_EXPORT_HEADER, values, sheet_name='报名名单')
+            mimetype = export.XLSX_MIMETYPE
+        else:
+            body = export.stream_csv(PARTICIPANT_EXPORT_HEADER, values)
+            mimetype = 'text/csv'
+
+        response = current_app.response_class(stream_with_context(body), mimetype=mimetype)
+        response.headers['Content-Disposition'] = \
+            f'attachment; filename="participants_act_{activity.id:03d}.{export_format}"'
+        return response
+
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "message": f"导出报名人员失败: {str(e)}"
+        }), 500
+
+
 @registration_bp.route('/activities/<activity_id>/participants/<int:participant_id>', methods=['PUT'])
 @token_required
 def review_registration(activity_id, participant_id):
@@ -257,11 +486,26 @@ def review_registration(activity_id, participant_id):
                 "message": "未找到报名记录"
             }), 404
 
-        # 更新审核状态
+        # 更新审核状态：改为通过时与报名一样需要占到名额，不能超过人数上限
         old_status = registration.status
+        if data['status'] == 'approved' and old_status != 'approved':
+            if not Activity.claim_seat(activity.id, old_status):
+                db.session.rollback()
+                return jsonify({
+                    "code": 400,
+                    "message": "名额已满"
+                }), 400
+        else:
+            Activity.adjust_registration_counts(activity.id, old_status, data['status'])
         registration.status = data['status']
+        if data['status'] == 'approved' and registration.approved_at is None:
+            registration.approved_at = datetime.utcnow()
+
+        # 拒绝已通过的报名会空出名额，由候补按顺序递补
+        Activity.promote_waitlist(activity.id)
 
         db.session.commit()
+        response_cache.invalidate('activities', f'activity:{activity.id}')
 
         return jsonify({
             "code": 200,
@@ -0,0 +1,81 @@
+from flask import Blueprint, request, jsonify, g
+from models import Activity, Club
+from utils import search_index
+from utils.fieldsets import FieldSet
+
+search_bp = Blueprint('search', __name__)
+
+
+@search_bp.route('/search', methods=['GET'])
+def search():
+    """全文搜索活动或社团（BM25排序，返回高亮片段）"""
+    try:
+        keyword = request.args.get('q', '').strip()
+        kind = request.args.get('type', 'activity')
+        page = int(request.args.get('page', 1))
+        limit = int(request.args.get('limit', 10))
+
+        if not keyword:
+            return jsonify({
+                "code": 400,
+                "message": "缺少搜索关键词q"
+            }), 400
+
+        if kind not in search_index.INDEXES:
+            return jsonify({
+                "code": 400,
+                "message": "type参数必须为'activity'或'club'"
+            }), 400
+
+        if not search_index.is_enabled():
+            return jsonify({
+                "code": 500,
+                "message": "全文搜索未启用"
+            }), 500
+
+        user_id = int(g.user_id) if hasattr(g, 'user_id') else None
+        offset = (page - 1) * limit
+        fields = FieldSet.from_request()
+
+        if kind == 'activity':
+            hits = search_index.search('activity', keyword, limit, offset,
+                                       where="AND activities.status = 'published'")
+            rows = {activity.id: activity for activity in
+                    Activity.query.filter(Activity.id.in_([hit_id for hit_id, _ in hits]))}
+            ordered = [rows[hit_id] for hit_id, _ in hits if hit_id in rows]
+            items = Activity.to_dict_list(ordered, user_id=user_id, fields=fields)
+            for item, activity in zip(items, ordered):
+                item['highlight'] = {
+                    'title': search_index.highlight(activity.title, keyword),
+                    'description': search_index.highlight(activity.description, keyword)
+                }
+        else:
+            hits = search_index.search('club', keyword, limit, offset)
+            rows = {club.id: club for club in Club.query.filter(Club.id.in_([hit_id for hit_id, _ in hits]))}
+            ordered = [rows[hit_id] for hit_id, _ in hits if hit_id in rows]
+            items = Club.to_dict_list(ordered, user_id=user_id, fields=fields)
+            for item, club in zip(items, ordered):
+                item['highlight'] = {
+                    'name': search_index.highlight(club.name, keyword),
+                    'description': search_index.highlight(club.description, keyword)
+                }
+
+        scores = dict(hits)
+        for item, row in zip(items, ordered):
+            item['score'] = round(-scores[row.id], 4)
+
+        return jsonify({
+            "code": 200,
+            "data": {
+                "results": items,
+                "type": kind,
+                "page": page,
+                "limit": limit
+            }
+        })
+
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "message": f"搜索失败: {str(e)}"
+        }), 500
@@ -1,11 +1,21 @@
 from flask import Blueprint, request, jsonify, g
 from middleware.auth import token_required
 from models import db, User
+from utils.conditional import conditional_response
 
 user_bp = Blueprint('user', __name__)
 
+
+def _profile_version():
+    """个人信息只取决于用户记录本身"""
+    updated_at = db.session.query(User.updated_at).filter(User.id == int(g.user_id)).scalar()
+    if updated_at is None:
+        return None
+    return updated_at, (int(g.user_id), updated_at)
+
 @user_bp.route('/user/profile', methods=['GET'])
 @token_required
+@conditional_response(_profile_version)
 def get_user_profile():
     """获取用户信息"""
     user = User.query.get(int(g.user_id))
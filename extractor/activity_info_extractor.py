@@ -2,6 +2,10 @@ import json
 import re
 import requests
 class ActivityInfoExtractor:
+    MODEL = "qwen-plus"
+    # 修改提示词或返回格式时递增，旧版本的缓存结果随之失效
+    PROMPT_VERSION = "1"
+
     def __init__(self, bailian_client):
         self.client = bailian_client
 
@@ -37,7 +41,7 @@ class ActivityInfoExtractor:
         try:
             # 调用百炼API
             completion = self.client.chat.completions.create(
-                model="qwen-plus",
+                model=self.MODEL,
                 messages=[
                     {"role": "user", "content": prompt},
                 ]
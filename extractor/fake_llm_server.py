@@ -0,0 +1,156 @@
+"""本地模拟的 OpenAI 兼容接口，用于离线压测大模型客户端
+
+    python -m extractor.fake_llm_server --port 8008 --latency 0.3 --error-rate 0.05 --max-inflight 8
+    LLM_BASE_URL=http://127.0.0.1:8008/v1 flask benchmark-llm --requests 200 --concurrency 20
+
+POST /v1/chat/completions 在 latency 秒（±jitter）后返回一条固定的活动信息；
+同时处理中的请求超过 max-inflight 时返回 429（带 Retry-After），按 error-rate 的概率返回 500/503。
+GET /stats 返回请求数、TCP 连接数（用于确认 keep-alive 复用）与观测到的最大并发。
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ACTIVITY_INFO = {
+    "activity_name": "模拟活动",
+    "start_time": "2025-01-01 19:00",
+    "end_time": "2025-01-01 21:00",
+    "location": "未知",
+    "description": "由本地模拟大模型接口返回",
+    "tags": "模拟,压测,离线"
+}
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.2, jitter=0.0, error_rate=0.0, max_inflight=None, retry_after=1):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_inflight = max_inflight
+        self.retry_after = retry_after
+        self.inflight = 0
+        self.lock = threading.Lock()
+        self.stats = {'connections': 0, 'requests': 0, 'succeeded': 0, 'rate_limited': 0, 'errors': 0,
+                      'max_inflight': 0}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 才能保持连接，客户端的连接池复用才有意义
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip('/') != '/stats':
+            return self._send(404, {'error': {'message': 'not found'}})
+        with self.server.lock:
+            stats = dict(self.server.stats)
+        self._send(200, stats)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self._send(404, {'error': {'message': 'not found'}})
+        server = self.server
+        server.count('requests')
+
+        with server.lock:
+            if server.max_inflight is not None and server.inflight >= server.max_inflight:
+                limited = True
+            else:
+                limited = False
+                server.inflight += 1
+                server.stats['max_inflight'] = max(server.stats['max_inflight'], server.inflight)
+        if limited:
+            server.count('rate_limited')
+            return self._send(429, {'error': {'message': 'Too many requests', 'type': 'rate_limit_error'}},
+                              {'Retry-After': str(server.retry_after)})
+
+        try:
+            time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+            if random.random() < server.error_rate:
+                server.count('errors')
+                return self._send(random.choice((500, 503)), {'error': {'message': 'Simulated upstream error'}})
+
+            request = json.loads(body or b'{}')
+            server.count('succeeded')
+            self._send(200, {
+                'id': f'chatcmpl-{uuid.uuid4().hex}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'qwen-plus'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': json.dumps(ACTIVITY_INFO, ensure_ascii=False)},
+                    'finish_reason': 'stop'
+                }],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+            })
+        finally:
+            with server.lock:
+                server.inflight -= 1
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start(host='127.0.0.1', port=0, **options):
+    """在后台线程中启动，port=0 时使用随机端口；返回 server，用完调用 server.shutdown()"""
+    server = FakeLLMServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, name='fake-llm', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟的 OpenAI 兼容接口')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8008)
+    parser.add_argument('--latency', type=float, default=0.2, help='每个请求的处理时间（秒）')
+    parser.add_argument('--jitter', type=float, default=0.05, help='处理时间的随机波动（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 500/503 的概率')
+    parser.add_argument('--max-inflight', type=int, default=None, help='超过该并发返回 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='429 响应的 Retry-After（秒）')
+    args = parser.parse_args()
+
+    server = FakeLLMServer((args.host, args.port), latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, max_inflight=args.max_inflight,
+                           retry_after=args.retry_after)
+    print(f"🤖 模拟大模型接口已启动: {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import openai
+
+
+class LLMTimeoutError(Exception):
+    """等待调用名额或重试超出了单次调用的时间预算"""
+
+
+class LLMClientManager:
+    """进程内共享的大模型客户端
+
+    底层 OpenAI 客户端只创建一次，HTTP 连接（keep-alive、TLS 会话）在请求间复用；
+    同时进行的调用数由信号量限制，429/5xx 与连接错误按指数退避加随机抖动重试，
+    等待名额、每次请求与重试间隔都计入同一个时间预算，超出预算不再重试。
+    提供与 OpenAI 客户端相同的 chat.completions.create 入口，可直接交给 ActivityInfoExtractor。
+    """
+
+    def __init__(self, client, max_concurrency=4, max_retries=3, backoff=0.5, max_backoff=8,
+                 request_timeout=30, budget=60, sleep=time.sleep):
+        self.client = client
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.request_timeout = request_timeout
+        self.budget = budget
+        self._sleep = sleep
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'attempts': 0, 'retries': 0, 'failures': 0}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create_chat_completion))
+
+    @classmethod
+    def from_config(cls, config, api_key):
+        """按 LLM_* 配置创建；重试由本类负责，底层客户端不再自动重试"""
+        client = openai.OpenAI(api_key=api_key, base_url=config.get('LLM_BASE_URL'), max_retries=0,
+                               timeout=config.get('LLM_REQUEST_TIMEOUT', 30))
+        return cls(client,
+                   max_concurrency=config.get('LLM_MAX_CONCURRENCY', 4),
+                   max_retries=config.get('LLM_MAX_RETRIES', 3),
+                   backoff=config.get('LLM_BACKOFF', 0.5),
+                   max_backoff=config.get('LLM_MAX_BACKOFF', 8),
+                   request_timeout=config.get('LLM_REQUEST_TIMEOUT', 30),
+                   budget=config.get('LLM_TIMEOUT_BUDGET', 60))
+
+    def create_chat_completion(self, **kwargs):
+        """调用 chat.completions.create；不可重试的错误与最后一次失败原样抛出"""
+        deadline = time.monotonic() + self.budget
+        self._count('calls')
+        if not self._slots.acquire(timeout=self.budget):
+            self._count('failures')
+            raise LLMTimeoutError(f'等待大模型调用名额超过{self.budget}秒')
+        # 退避期间继续占用名额：服务端限流时不让排队的调用接着打上去
+        try:
+            attempt = 0
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMTimeoutError(f'大模型调用超过{self.budget}秒')
+                self._count('attempts')
+                try:
+                    return self.client.chat.completions.create(
+                        timeout=min(self.request_timeout, remaining), **kwargs)
+                except (openai.APIConnectionError, openai.APIStatusError) as e:
+                    if not self._retryable(e) or attempt >= self.max_retries:
+                        raise
+                    delay = self._delay(attempt, e)
+                    if time.monotonic() + delay >= deadline:
+                        raise
+                    attempt += 1
+                    self._count('retries')
+                    self._sleep(delay)
+        except Exception:
+            self._count('failures')
+            raise
+        finally:
+            self._slots.release()
+
+    def close(self):
+        self.client.close()
+
+    @staticmethod
+    def _retryable(error):
+        # APITimeoutError 是 APIConnectionError 的子类
+        if isinstance(error, openai.APIConnectionError):
+            return True
+        return error.status_code == 429 or error.status_code >= 500
+
+    def _delay(self, attempt, error):
+        """full jitter：在 [0, min(max_backoff, backoff * 2^attempt)] 内随机；服务端给出 Retry-After 时至少等这么久"""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        response = getattr(error, 'response', None)
+        try:
+            retry_after = float(response.headers.get('retry-after')) if response is not None else None
+        except (TypeError, ValueError):
+            retry_after = None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+
+def benchmark(manager, requests=100, concurrency=10, model='qwen-plus'):
+    """用 concurrency 个线程发出 requests 次调用，返回耗时分位数、成功/失败数与客户端统计"""
+
+    def call(i):
+        started = time.perf_counter()
+        try:
+            manager.create_chat_completion(model=model, messages=[{'role': 'user', 'content': f'压测请求 {i}'}])
+            ok = True
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds for _, seconds in results)
+    succeeded = sum(1 for ok, _ in results if ok)
+
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1) if latencies else 0
+
+    return {
+        'requests': requests,
+        'succeeded': succeeded,
+        'failed': requests - succeeded,
+        'seconds': round(elapsed, 2),
+        'throughput': round(requests / elapsed, 1) if elapsed else 0,
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95),
+        'max_ms': round(latencies[-1] * 1000, 1) if latencies else 0,
+        'client': dict(manager.stats),
+    }
@@ -0,0 +1,99 @@
+import atexit
+import os
+import threading
+import requests
+from dotenv import load_dotenv
+from flask import current_app
+from extractor.activity_info_extractor import ActivityInfoExtractor
+from extractor.wechat_article_extractor import (
+    HttpArticleExtractor, WeChatArticleExtractor, FallbackArticleExtractor, BrowserError
+)
+from extractor.llm_client import LLMClientManager
+from extractor.webdriver_pool import WebDriverPool, PoolTimeoutError, headless_driver_factory
+from utils import extraction_cache
+
+_article_extractor = None
+_llm_client = None
+_lock = threading.Lock()
+
+
+class ExtractionError(Exception):
+    """提取失败，错误信息可直接返回给客户端"""
+
+
+def llm_client():
+    """百炼（OpenAI 兼容接口）客户端，进程内共享：连接复用、并发上限、重试与超时预算见 LLM_* 配置
+
+    API 密钥取自环境变量 ALIYUN_API_KEY
+    """
+    global _llm_client
+    with _lock:
+        if _llm_client is None:
+            load_dotenv()
+            _llm_client = LLMClientManager.from_config(current_app.config, os.getenv('ALIYUN_API_KEY'))
+            atexit.register(_llm_client.close)
+        return _llm_client
+
+
+def article_extractor():
+    """按 EXTRACT_FETCHER 创建正文抓取后端（进程内共享，HTTP 连接池与浏览器会话池随之复用）
+
+    http: 只请求 HTML 解析；selenium: 只用浏览器；auto: HTTP 取不到正文时回退到浏览器
+    """
+    global _article_extractor
+    with _lock:
+        if _article_extractor is None:
+            config = current_app.config
+            backend = config.get('EXTRACT_FETCHER', 'auto')
+            if backend == 'selenium':
+                _article_extractor = _browser_extractor(config)
+            else:
+                http = HttpArticleExtractor(timeout=config.get('EXTRACT_FETCH_TIMEOUT', 10),
+                                            pool_size=config.get('EXTRACT_HTTP_POOL_SIZE', 10))
+                _article_extractor = http if backend == 'http' \
+                    else FallbackArticleExtractor(http, _browser_extractor(config))
+        return _article_extractor
+
+
+def _browser_extractor(config):
+    """浏览器后端：会话在首次需要时创建，之后常驻复用，进程退出时关闭"""
+    pool = WebDriverPool(
+        headless_driver_factory(config.get('EXTRACT_BROWSER', 'chrome'),
+                                config.get('EXTRACT_BROWSER_PAGE_TIMEOUT', 15)),
+        size=config.get('EXTRACT_BROWSER_POOL_SIZE', 2),
+        max_pages=config.get('EXTRACT_BROWSER_MAX_PAGES', 50)
+    )
+    atexit.register(pool.close)
+    return WeChatArticleExtractor(pool, timeout=config.get('EXTRACT_BROWSER_WAIT', 10))
+
+
+def fetch_article(article_url, force_refresh=False):
+    """抓取公众号文章正文，优先读取一级缓存；force_refresh 时重新抓取并覆盖缓存"""
+    if not force_refresh:
+        content = extraction_cache.get_article(article_url)
+        if content:
+            return content
+    try:
+        content = article_extractor().extract_article_content(article_url)
+    except requests.RequestException as e:
+        raise ExtractionError(f'文章抓取失败: {str(e)}')
+    except (PoolTimeoutError, BrowserError) as e:
+        raise ExtractionError(str(e))
+    if not content:
+        raise ExtractionError('文章内容提取失败')
+    extraction_cache.put_article(article_url, content)
+    return content
+
+
+def extract_activity_info(article_content, force_refresh=False):
+    """调用大模型从正文中提取活动信息，相同正文与提示词版本的结果从二级缓存读取"""
+    prompt_version = f'{ActivityInfoExtractor.PROMPT_VERSION}:{ActivityInfoExtractor.MODEL}'
+    if not force_refresh:
+        activity_info = extraction_cache.get_result(article_content, prompt_version)
+        if activity_info:
+            return activity_info
+    activity_info = ActivityInfoExtractor(llm_client()).extract_activity_info(article_content)
+    if not activity_info:
+        raise ExtractionError('活动信息提取失败')
+    extraction_cache.put_result(article_content, prompt_version, activity_info)
+    return activity_info
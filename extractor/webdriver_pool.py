@@ -0,0 +1,154 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """等待空闲浏览器会话超时"""
+
+
+class _PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+
+class WebDriverPool:
+    """长期存活的浏览器会话池
+
+    checkout 时优先复用空闲会话（先做健康检查），没有空闲会话且未达上限时新建；
+    使用中抛出异常的会话视为已崩溃，直接丢弃；处理满 max_pages 个页面后回收重建，避免浏览器内存持续增长。
+    """
+
+    def __init__(self, factory, size=2, max_pages=50, checkout_timeout=30):
+        self.factory = factory
+        self.size = size
+        self.max_pages = max_pages
+        self.checkout_timeout = checkout_timeout
+        self._idle = []  # 后进先出，最近用过的会话最“热”
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {'created': 0, 'reused': 0, 'recycled': 0, 'discarded': 0}
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """借出一个会话，用完自动归还：with pool.driver() as driver: ..."""
+        pooled = self._checkout(self.checkout_timeout if timeout is None else timeout)
+        try:
+            yield pooled.driver
+        except BaseException:
+            self._discard(pooled, 'discarded')
+            raise
+        else:
+            self._return(pooled)
+
+    def warm(self, count=None):
+        """预先创建会话，避免第一批请求承担浏览器启动时间"""
+        borrowed = []
+        try:
+            for _ in range(min(count or self.size, self.size)):
+                borrowed.append(self._checkout(self.checkout_timeout))
+        finally:
+            for pooled in borrowed:
+                self._return(pooled, count_page=False)
+
+    def close(self):
+        """关闭所有空闲会话，之后归还的会话也会直接关闭"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._quit(pooled)
+
+    def _checkout(self, timeout):
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeoutError(f'等待浏览器会话超过{timeout}秒')
+        try:
+            while True:
+                with self._lock:
+                    pooled = self._idle.pop() if self._idle else None
+                if pooled is None:
+                    pooled = _PooledDriver(self.factory())
+                    self._count('created')
+                    return pooled
+                if self._healthy(pooled):
+                    self._count('reused')
+                    return pooled
+                logger.warning("浏览器会话健康检查失败，重新创建")
+                self._quit(pooled)
+                self._count('discarded')
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _return(self, pooled, count_page=True):
+        if count_page:
+            pooled.pages += 1
+        try:
+            if pooled.pages >= self.max_pages:
+                self._quit(pooled)
+                self._count('recycled')
+                return
+            with self._lock:
+                if not self._closed:
+                    self._idle.append(pooled)
+                    return
+            self._quit(pooled)
+        finally:
+            self._slots.release()
+
+    def _discard(self, pooled, reason):
+        try:
+            self._quit(pooled)
+            self._count(reason)
+        finally:
+            self._slots.release()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def _healthy(pooled):
+        try:
+            return pooled.driver.execute_script('return 1') == 1
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(pooled):
+        try:
+            pooled.driver.quit()
+        except Exception:
+            logger.debug("关闭浏览器会话失败", exc_info=True)
+
+
+def headless_driver_factory(browser='chrome', page_load_timeout=15):
+    """返回创建无头浏览器会话的函数；Safari 不支持无头模式，只用于本地开发"""
+
+    def create():
+        # selenium 为可选依赖，仅浏览器后端需要
+        from selenium import webdriver
+
+        if browser == 'safari':
+            driver = webdriver.Safari(options=webdriver.SafariOptions())
+        elif browser == 'firefox':
+            options = webdriver.FirefoxOptions()
+            options.add_argument('-headless')
+            options.page_load_strategy = 'eager'
+            driver = webdriver.Firefox(options=options)
+        else:
+            options = webdriver.ChromeOptions()
+            for argument in ('--headless=new', '--disable-gpu', '--no-sandbox', '--disable-dev-shm-usage',
+                             '--blink-settings=imagesEnabled=false'):
+                options.add_argument(argument)
+            # 不等图片等资源加载完，DOM 就绪即返回，正文由条件等待判断
+            options.page_load_strategy = 'eager'
+            driver = webdriver.Chrome(options=options)
+        driver.set_page_load_timeout(page_load_timeout)
+        return driver
+
+    return create
@@ -1,33 +1,170 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import time
+import re
+from abc import ABC, abstractmethod
+from html.parser import HTMLParser
 
-class WeChatArticleExtractor:
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from extractor.webdriver_pool import WebDriverPool, headless_driver_factory
 
+# 移动端 UA，公众号对桌面浏览器偶尔返回跳转页
+USER_AGENT = ('Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 '
+              '(KHTML, like Gecko) Mobile/15E148 MicroMessenger/8.0.47')
+
+
+class ArticleExtractor(ABC):
+    """文章正文抓取接口：返回 #js_content 的纯文本，页面中没有正文时返回 None"""
+
+    @abstractmethod
     def extract_article_content(self, article_url):
-        """提取公众号文章内容"""
+        ...
+
+
+class BrowserError(Exception):
+    """浏览器后端不可用或出错：未安装 selenium、找不到浏览器、会话崩溃等"""
+
+
+class JsContentParser(HTMLParser):
+    """从公众号页面 HTML 中取出 #js_content 的文本，块级元素之间换行（与浏览器中 element.text 一致）"""
+
+    BLOCK_TAGS = {'p', 'div', 'section', 'br', 'li', 'ul', 'ol', 'blockquote', 'table', 'tr',
+                  'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'pre', 'figure', 'figcaption'}
+    SKIP_TAGS = {'script', 'style', 'noscript', 'template'}
+    VOID_TAGS = {'br', 'hr', 'img', 'input', 'meta', 'link', 'source', 'col', 'area', 'wbr', 'embed', 'param'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found = False
+        self._depth = 0  # 在 #js_content 内部的嵌套层数，0 表示不在正文中
+        self._skip = 0
+        self._parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if not self._depth:
+            if dict(attrs).get('id') == 'js_content':
+                self.found = True
+                self._depth = 1
+            return
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+        if tag in self.BLOCK_TAGS:
+            self._parts.append('\n')
+        if tag not in self.VOID_TAGS:
+            self._depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if self._depth and tag in self.BLOCK_TAGS:
+            self._parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if not self._depth or tag in self.VOID_TAGS:
+            return
+        if tag in self.SKIP_TAGS and self._skip:
+            self._skip -= 1
+        if tag in self.BLOCK_TAGS:
+            self._parts.append('\n')
+        self._depth -= 1
+
+    def handle_data(self, data):
+        if self._depth and not self._skip:
+            self._parts.append(data)
+
+    def text(self):
+        lines = (re.sub(r'\s+', ' ', line.replace('\xa0', ' ')).strip() for line in ''.join(self._parts).split('\n'))
+        return '\n'.join(line for line in lines if line)
+
+
+class HttpArticleExtractor(ArticleExtractor):
+    """直接请求文章 HTML 并解析正文，不启动浏览器；连接池在实例内复用"""
 
-        options = webdriver.SafariOptions()
+    def __init__(self, timeout=10, pool_size=10, retries=2, session=None):
+        self.timeout = timeout
+        self.session = session or self._create_session(pool_size, retries)
 
-        driver = webdriver.Safari(options=options)
+    @staticmethod
+    def _create_session(pool_size, retries):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(total=retries, backoff_factor=0.3, status_forcelist=(502, 503, 504),
+                              allowed_methods=('GET',))
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'User-Agent': USER_AGENT, 'Accept-Language': 'zh-CN,zh;q=0.9'})
+        return session
 
+    def extract_article_content(self, article_url):
+        """抓取并解析正文；网络错误或非 2xx 状态抛出 requests 异常"""
+        response = self.session.get(article_url, timeout=self.timeout)
+        response.raise_for_status()
+        if response.encoding is None or response.encoding.lower() == 'iso-8859-1':
+            response.encoding = 'utf-8'
+        return self.parse(response.text)
+
+    @staticmethod
+    def parse(html):
+        """解析页面 HTML，返回正文文本；没有 #js_content 或正文为空（需要执行 JS 的页面）时返回 None"""
+        parser = JsContentParser()
+        parser.feed(html)
+        parser.close()
+        return parser.text() or None
+
+
+class WeChatArticleExtractor(ArticleExtractor):
+    """用浏览器渲染页面后读取正文，只用于需要执行 JS 的页面；浏览器会话从会话池借用，不再每篇文章启动一次"""
+
+    def __init__(self, pool=None, timeout=10):
+        self.pool = pool or WebDriverPool(headless_driver_factory(), size=1)
+        self.timeout = timeout
+
+    def extract_article_content(self, article_url):
+        """提取公众号文章内容，等待超时（页面没有正文）时返回 None；浏览器不可用或出错时抛出 BrowserError"""
+        # selenium 为可选依赖，仅浏览器后端需要
         try:
-            driver.get(article_url)
-            # 等待页面加载完成
-            time.sleep(3)
-
-            # 等待特定元素出现
-            wait = WebDriverWait(driver, 10)
-            article = wait.until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "#js_content"))
+            from selenium.common.exceptions import (
+                TimeoutException, StaleElementReferenceException, WebDriverException
             )
+            from selenium.webdriver.support.ui import WebDriverWait
+        except ImportError as e:
+            raise BrowserError('未安装selenium，无法使用浏览器抓取文章') from e
 
-            # 获取文章内容
-            content = article.text
+        try:
+            with self.pool.driver() as driver:
+                try:
+                    driver.get(article_url)
+                except TimeoutException:
+                    # 页面加载超时不代表正文没有渲染出来，交给下面的条件等待判断
+                    pass
 
-            return content
+                # 正文在脚本执行前是隐藏的（visibility: hidden），等到可见且有文本时立即读取
+                wait = WebDriverWait(driver, self.timeout, poll_frequency=0.2,
+                                     ignored_exceptions=(StaleElementReferenceException,))
+                try:
+                    return wait.until(_rendered_article_text)
+                except TimeoutException:
+                    return None
+        except WebDriverException as e:
+            raise BrowserError(f'浏览器抓取失败: {e.msg or type(e).__name__}') from e
 
-        finally:
-            driver.quit()
\ No newline at end of file
+
+def _rendered_article_text(driver):
+    from selenium.webdriver.common.by import By
+
+    elements = driver.find_elements(By.CSS_SELECTOR, '#js_content')
+    if elements and elements[0].is_displayed():
+        return elements[0].text.strip() or False
+    return False
+
+
+class FallbackArticleExtractor(ArticleExtractor):
+    """先用 primary 抓取，页面中取不到正文时再交给 fallback（网络错误不回退）"""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+
+    def extract_article_content(self, article_url):
+        return self.primary.extract_article_content(article_url) \
+            or self.fallback.extract_article_content(article_url)
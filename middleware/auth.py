@@ -1,17 +1,26 @@
 from functools import wraps
-from flask import request, jsonify, g
+from flask import request, jsonify, g, current_app
 import jwt
 from config import Config
 from datetime import datetime, timedelta
-from models import User
+from middleware.principal_cache import principal_cache, load_principal
 
 def token_required(f):
+    """校验 Token 并确认用户仍然存在，设置 g.user_id 与 g.user_role
+
+    g.user_role 取数据库中的当前角色，而不是 Token 签发时的角色：角色变更后无需重新登录即生效。
+    AUTH_PRINCIPAL_CHECK 为 'strict' 时每次查库，默认 'cached' 走进程内缓存（用户删除、角色变更时失效）。
+    """
     @wraps(f)
     def decorated(*args, **kwargs):
         token = request.headers.get('Authorization')
         
         if not token:
             return jsonify({"code": 401, "message": "Token缺失"}), 401
+        
+        # 批量请求的子请求复用外层请求已完成的认证
+        if g.get('authenticated_token') == token:
+            return f(*args, **kwargs)
             
         # 移除 Bearer 前缀
         if token.startswith('Bearer '):
@@ -21,13 +30,16 @@ def token_required(f):
             data = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
             user_id = data['user_id']
             
-            # 验证用户是否存在
-            user = User.query.get(int(user_id))
-            if not user:
+            # 验证用户是否存在（默认走进程内缓存，strict 模式每次查库）
+            if current_app.config.get('AUTH_PRINCIPAL_CHECK') == 'strict':
+                exists, role = load_principal(int(user_id))
+            else:
+                exists, role = principal_cache.get(int(user_id))
+            if not exists:
                 return jsonify({"code": 401, "message": "用户不存在"}), 401
             
             g.user_id = user_id
-            g.user_role = data.get('role', 'student')
+            g.user_role = role or data.get('role', 'student')
         except jwt.ExpiredSignatureError:
             return jsonify({"code": 401, "message": "Token已过期"}), 401
         except jwt.InvalidTokenError:
@@ -36,6 +48,19 @@ def token_required(f):
         return f(*args, **kwargs)
     return decorated
 
+def optional_user_id():
+    """公开接口读取调用者身份：已通过 token_required 时取 g.user_id，否则尝试解析 Token，失败返回 None"""
+    if hasattr(g, 'user_id'):
+        return int(g.user_id)
+    token = request.headers.get('Authorization')
+    if not token or not token.startswith('Bearer '):
+        return None
+    try:
+        data = jwt.decode(token[7:], Config.SECRET_KEY, algorithms=["HS256"])
+        return int(data['user_id'])
+    except (jwt.InvalidTokenError, KeyError, ValueError):
+        return None
+
 def generate_token(user_id, role='student'):
     """生成JWT Token"""
     payload = {
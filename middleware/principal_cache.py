@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from config import Config
+from models import db, User
+
+
+class PrincipalCache:
+    """进程内的已验证用户缓存（LRU + TTL）
+
+    缓存 user_id -> (是否存在, 角色)，用户被删除或角色变更时由模型事件失效；
+    多进程部署时其他进程依赖 TTL 过期。
+    """
+
+    def __init__(self, maxsize=10000, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """返回 (exists, role)，未命中时查库并写入缓存"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        principal = load_principal(user_id)
+
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, principal)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+def load_principal(user_id):
+    """查库得到 (exists, role)"""
+    row = db.session.query(User.role).filter(User.id == user_id).first()
+    return (True, row.role) if row else (False, None)
+
+
+principal_cache = PrincipalCache(
+    maxsize=Config.AUTH_PRINCIPAL_CACHE_SIZE,
+    ttl=Config.AUTH_PRINCIPAL_CACHE_TTL
+)
+
+
+def _invalidate(target):
+    """立即失效，并在事务提交后再失效一次，避免提交前被并发请求以旧数据回填"""
+    principal_cache.invalidate(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('principal_invalidations', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    for user_id in session.info.pop('principal_invalidations', ()):
+        principal_cache.invalidate(user_id)
+
+
+@event.listens_for(User, 'after_insert')
+def _user_inserted(mapper, connection, target):
+    # 清掉可能存在的"用户不存在"缓存
+    _invalidate(target)
+
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    if inspect(target).attrs.role.history.has_changes():
+        _invalidate(target)
+
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    _invalidate(target)
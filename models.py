@@ -1,6 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 import hashlib
+from utils.fieldsets import ALL_FIELDS
+from utils.tags import split_tags
 
 db = SQLAlchemy()
 
@@ -19,6 +21,7 @@ class User(db.Model):
     grade = db.Column(db.String(20))
     avatar = db.Column(db.String(200), default='')
     role = db.Column(db.String(20), default='student')  # student, admin, club_admin
+    calendar_token = db.Column(db.String(64), unique=True, index=True)  # 日历订阅链接令牌，可重置
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -61,48 +64,126 @@ class Club(db.Model):
     contact = db.Column(db.String(100))
     logo = db.Column(db.String(200))
     manager_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # 关注人数超过阈值后不再写扩散，关注者读取动态时直接查询该社团的活动
+    fanout_on_read = db.Column(db.Boolean, nullable=False, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # 游标分页索引：按 (created_at, id) 排序
+    __table_args__ = (db.Index('ix_clubs_created_at_id', 'created_at', 'id'),)
+    
     # 关系
     activities = db.relationship('Activity', backref='club', lazy='dynamic', cascade='all, delete-orphan')
     follows = db.relationship('Follow', backref='club', lazy='dynamic', cascade='all, delete-orphan')
     
-    def to_dict(self, with_recent_activities=False, user_id=None):
-        """转换为字典"""
-        data = {
-            'club_id': self.id,
-            'name': self.name,
-            'description': self.description or '',
-            'type': self.type,
-            'contact': self.contact or '',
-            'logo': self.logo or '',
-            'manager_id': self.manager_id,
-            'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
-            'member_count': self.get_member_count(),
-            'activity_count': self.activities.count()
-        }
+    def to_dict(self, with_recent_activities=False, user_id=None, fields=ALL_FIELDS):
+        """转换为字典，fields 为稀疏字段集"""
+        return Club.to_dict_list([self], with_recent_activities=with_recent_activities, user_id=user_id,
+                                 fields=fields)[0]
+    
+    # 基础字段：字段名 -> 取值函数，只对请求的字段求值
+    DICT_FIELDS = {
+        'club_id': lambda self: self.id,
+        'name': lambda self: self.name,
+        'description': lambda self: self.description or '',
+        'type': lambda self: self.type,
+        'contact': lambda self: self.contact or '',
+        'logo': lambda self: self.logo or '',
+        'manager_id': lambda self: self.manager_id,
+        'created_at': lambda self: self.created_at.isoformat() + 'Z' if self.created_at else None
+    }
+    
+    @staticmethod
+    def to_dict_list(clubs, with_recent_activities=False, user_id=None, fields=ALL_FIELDS):
+        """批量转换为字典，整页社团的计数与关注状态各用一次查询取出
         
-        if user_id:
-            data['is_followed'] = Follow.query.filter_by(user_id=user_id, club_id=self.id).first() is not None
-        
-        if with_recent_activities:
-            # 获取最近5个活动
-            recent_activities = self.activities.order_by(Activity.start_time.desc()).limit(5).all()
-            data['recent_activities'] = [
-                {
-                    'activity_id': activity.id,
-                    'title': activity.title,
-                    'start_time': activity.start_time.isoformat() + 'Z' if activity.start_time else None,
-                    'end_time': activity.end_time.isoformat() + 'Z' if activity.end_time else None,
-                    'tag': activity.tags.split(',')[0] if activity.tags else '',
-                    'participant_count': Registration.query.filter_by(activity_id=activity.id, status='approved').count(),
-                    'max_participants': activity.max_participants
-                }
-                for activity in recent_activities
-            ]
+        未请求的计数、关注状态与近期活动不会触发对应的查询。
+        """
+        clubs = list(clubs)
+        if not clubs:
+            return []
         
-        return data
+        club_ids = [club.id for club in clubs]
+        with_counts = fields.wants('member_count', 'activity_count')
+        counts = Club.count_stats(club_ids) if with_counts else {}
+        with_recent_activities = with_recent_activities and fields.wants('recent_activities')
+        
+        followed_ids = set()
+        if user_id and fields.wants('is_followed'):
+            followed_ids = {
+                club_id for (club_id,) in db.session.query(Follow.club_id).filter(
+                    Follow.user_id == user_id,
+                    Follow.club_id.in_(club_ids)
+                )
+            }
+        
+        recent = Club.prefetch_recent_activities(club_ids) if with_recent_activities else {}
+        
+        result = []
+        for club in clubs:
+            data = {name: getter(club) for name, getter in Club.DICT_FIELDS.items() if fields.wants(name)}
+            
+            member_count, activity_count = counts.get(club.id, (0, 0))
+            if fields.wants('member_count'):
+                data['member_count'] = member_count
+            if fields.wants('activity_count'):
+                data['activity_count'] = activity_count
+            
+            if user_id and fields.wants('is_followed'):
+                data['is_followed'] = club.id in followed_ids
+            
+            if with_recent_activities:
+                data['recent_activities'] = [
+                    {
+                        'activity_id': activity.id,
+                        'title': activity.title,
+                        'start_time': activity.start_time.isoformat() + 'Z' if activity.start_time else None,
+                        'end_time': activity.end_time.isoformat() + 'Z' if activity.end_time else None,
+                        'tag': next(iter(split_tags(activity.tags)), ''),
+                        'participant_count': activity.approved_count,
+                        'max_participants': activity.max_participants
+                    }
+                    for activity in recent.get(club.id, [])
+                ]
+            
+            result.append(data)
+        
+        return result
+    
+    @staticmethod
+    def count_stats(club_ids):
+        """一次查询取出关注人数与活动数，返回 {club_id: (member_count, activity_count)}"""
+        member_count = db.select(db.func.count(Follow.id)) \
+            .where(Follow.club_id == Club.id) \
+            .scalar_subquery()
+        activity_count = db.select(db.func.count(Activity.id)) \
+            .where(Activity.club_id == Club.id) \
+            .scalar_subquery()
+        
+        rows = db.session.query(Club.id, member_count, activity_count).filter(Club.id.in_(club_ids))
+        return {club_id: (members, activities) for club_id, members, activities in rows}
+    
+    @staticmethod
+    def prefetch_recent_activities(club_ids, limit=5):
+        """用窗口函数一次取出每个社团最近的活动，返回 {club_id: [Activity]}"""
+        row_number = db.func.row_number().over(
+            partition_by=Activity.club_id,
+            order_by=Activity.start_time.desc()
+        ).label('row_number')
+        ranked = db.session.query(Activity.id.label('activity_id'), row_number) \
+            .filter(Activity.club_id.in_(club_ids)) \
+            .subquery()
+        
+        activities = Activity.query \
+            .join(ranked, ranked.c.activity_id == Activity.id) \
+            .filter(ranked.c.row_number <= limit) \
+            .order_by(Activity.club_id, ranked.c.row_number) \
+            .all()
+        
+        recent = {}
+        for activity in activities:
+            recent.setdefault(activity.club_id, []).append(activity)
+        return recent
     
     def get_member_count(self):
         """获取关注人数"""
@@ -123,48 +204,270 @@ class Activity(db.Model):
     contact_info = db.Column(db.String(100))
     status = db.Column(db.String(20), default='published')  # published, draft, canceled
     tags = db.Column(db.String(200))  # 用逗号分隔的标签
-    club_id = db.Column(db.Integer, db.ForeignKey('clubs.id'), nullable=False)
+    approved_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 已通过报名人数（冗余计数）
+    pending_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 待审核报名人数（冗余计数）
+    waitlisted_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # 候补人数（冗余计数）
+    club_id = db.Column(db.Integer, db.ForeignKey('clubs.id'), nullable=False, index=True)
     creator_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # 游标分页索引：已发布活动按 (start_time, id) 排序
+    __table_args__ = (db.Index('ix_activities_status_start_time_id', 'status', 'start_time', 'id'),)
+    
     # 关系
     registrations = db.relationship('Registration', backref='activity', lazy='dynamic', cascade='all, delete-orphan')
     
-    def to_dict(self, with_club_info=True, user_id=None):
-        """转换为字典"""
-        data = {
-            'activity_id': self.id,
-            'activityId': f"act_{self.id:03d}",
-            'title': self.title,
-            'description': self.description or '',
-            'startTime': self.start_time.isoformat() + 'Z' if self.start_time else None,
-            'endTime': self.end_time.isoformat() + 'Z' if self.end_time else None,
-            'location': self.location,
-            'maxParticipants': self.max_participants,
-            'currentParticipants': Registration.query.filter_by(activity_id=self.id, status='approved').count(),
-            'status': self.status,
-            'registration_end_time': self.registration_end_time.isoformat() + 'Z' if self.registration_end_time else None,
-            'contact_info': self.contact_info or '',
-            'tags': self.tags.split(',') if self.tags else [],
-            'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None
-        }
+    @staticmethod
+    def parse_id(activity_id):
+        """解析路径中的活动ID（数字或act_xxx格式），无法解析时返回None"""
+        if activity_id.isdigit():
+            return int(activity_id)
+        if activity_id.startswith('act_'):
+            suffix = activity_id.split('_')[1]
+            return int(suffix) if suffix.isdigit() else None
+        return None
+    
+    def to_dict(self, with_club_info=True, user_id=None, fields=ALL_FIELDS):
+        """转换为字典，fields 为稀疏字段集"""
+        return Activity.to_dict_list([self], with_club_info=with_club_info, user_id=user_id, fields=fields)[0]
+    
+    # 基础字段：字段名 -> 取值函数，只对请求的字段求值
+    DICT_FIELDS = {
+        'activity_id': lambda self: self.id,
+        'activityId': lambda self: f"act_{self.id:03d}",
+        'title': lambda self: self.title,
+        'description': lambda self: self.description or '',
+        'startTime': lambda self: self.start_time.isoformat() + 'Z' if self.start_time else None,
+        'endTime': lambda self: self.end_time.isoformat() + 'Z' if self.end_time else None,
+        'location': lambda self: self.location,
+        'maxParticipants': lambda self: self.max_participants,
+        'currentParticipants': lambda self: self.approved_count,
+        'status': lambda self: self.status,
+        'registration_end_time': lambda self: self.registration_end_time.isoformat() + 'Z' if self.registration_end_time else None,
+        'contact_info': lambda self: self.contact_info or '',
+        'tags': lambda self: split_tags(self.tags),
+        'created_at': lambda self: self.created_at.isoformat() + 'Z' if self.created_at else None
+    }
+    
+    # 依赖当前用户报名记录的字段
+    REGISTRATION_FIELDS = ('isRegistered', 'registrationStatus', 'canRegister')
+    
+    @staticmethod
+    def to_dict_list(activities, with_club_info=True, user_id=None, fields=ALL_FIELDS):
+        """批量转换为字典，输出与逐个调用 to_dict 相同，但只需常数次查询
+        
+        未请求的 clubInfo、报名状态等字段不会触发对应的查询。
+        """
+        activities = list(activities)
+        with_club_info = with_club_info and fields.wants('clubInfo')
+        clubs = Activity.prefetch_clubs(activities) if with_club_info else {}
         
-        if with_club_info and self.club:
+        registrations = {}
+        if user_id and activities and fields.wants(*Activity.REGISTRATION_FIELDS):
+            activity_ids = [activity.id for activity in activities]
+            registrations = {
+                registration.activity_id: registration
+                for registration in Registration.query.filter(
+                    Registration.user_id == user_id,
+                    Registration.activity_id.in_(activity_ids)
+                )
+            }
+        
+        return [
+            activity._build_dict(clubs.get(activity.club_id), user_id, registrations.get(activity.id), fields)
+            for activity in activities
+        ]
+    
+    @staticmethod
+    def defer_unrequested(query, fields):
+        """未请求 description 时不从数据库读取这一大字段"""
+        if not fields.wants('description'):
+            query = query.options(db.defer(Activity.description))
+        return query
+    
+    @staticmethod
+    def prefetch_clubs(activities):
+        """一次 IN 查询取出活动所属社团，返回 {club_id: Club}"""
+        club_ids = {activity.club_id for activity in activities}
+        if not club_ids:
+            return {}
+        return {club.id: club for club in Club.query.filter(Club.id.in_(club_ids))}
+    
+    def _build_dict(self, club, user_id, registration, fields=ALL_FIELDS):
+        """根据已取出的社团与报名记录组装字典"""
+        data = {name: getter(self) for name, getter in Activity.DICT_FIELDS.items() if fields.wants(name)}
+        
+        if club:
             data['clubInfo'] = {
-                'clubId': f"club_{self.club.id:03d}",
-                'club_id': self.club.id,
-                'name': self.club.name
+                'clubId': f"club_{club.id:03d}",
+                'club_id': club.id,
+                'name': club.name
             }
         
         if user_id:
-            # 检查用户是否已报名
-            registration = Registration.query.filter_by(user_id=user_id, activity_id=self.id).first()
-            data['isRegistered'] = registration is not None
-            data['registrationStatus'] = registration.status if registration else 'none'
-            data['canRegister'] = (Registration.query.filter_by(activity_id=self.id, status='approved').count() < self.max_participants) if self.max_participants > 0 else True
+            if fields.wants('isRegistered'):
+                data['isRegistered'] = registration is not None
+            if fields.wants('registrationStatus'):
+                data['registrationStatus'] = registration.status if registration else 'none'
+            if fields.wants('canRegister'):
+                data['canRegister'] = (self.approved_count < self.max_participants) if self.max_participants > 0 else True
         
         return data
+    
+    # 报名状态与计数列的对应关系
+    COUNTED_STATUSES = ('approved', 'pending', 'waitlisted')
+    
+    @staticmethod
+    def has_open_seat():
+        """名额未满的SQL条件（max_participants 为空或不大于0表示不限人数）"""
+        return db.or_(
+            Activity.max_participants.is_(None),
+            Activity.max_participants <= 0,
+            Activity.approved_count < Activity.max_participants
+        )
+    
+    @staticmethod
+    def promote_waitlist(activity_id):
+        """有空余名额时按候补顺序递补（在调用方的事务中执行），返回递补人数
+
+        以候补记录为准而不是候补计数：计数可能因级联删除等漂移，先取出队首，没有队首就停止，
+        有队首才占位；队首已被并发事务处理时撤销这次占位再取下一位。
+        """
+        promoted = 0
+        while True:
+            # 先取出候补队首再按主键更新：UPDATE 中引用自身表的子查询在 MySQL 等数据库上不被支持
+            head = db.session.execute(
+                db.select(Registration.id)
+                .where(Registration.activity_id == activity_id, Registration.status == 'waitlisted')
+                .order_by(Registration.waitlist_position, Registration.id)
+                .limit(1)
+            ).scalar()
+            if head is None:
+                # 没有候补记录时候补计数应为0，顺带校正漂移的计数
+                Activity.query.filter(Activity.id == activity_id, Activity.waitlisted_count != 0) \
+                    .update({Activity.waitlisted_count: 0}, synchronize_session=False)
+                return promoted
+            
+            # 与报名相同的原子占位，同时候补计数减一
+            if not Activity.claim_seat(activity_id, 'waitlisted'):
+                return promoted
+            
+            updated = Registration.query.filter(Registration.id == head, Registration.status == 'waitlisted') \
+                .update({
+                    Registration.status: 'approved',
+                    Registration.approved_at: db.func.coalesce(Registration.approved_at, datetime.utcnow())
+                }, synchronize_session=False)
+            if not updated:
+                Activity.query.filter_by(id=activity_id).update({
+                    Activity.approved_count: Activity.approved_count - 1,
+                    Activity.waitlisted_count: Activity.waitlisted_count + 1
+                }, synchronize_session=False)
+                continue
+            promoted += 1
+    
+    @staticmethod
+    def claim_seat(activity_id, old_status=None):
+        """报名改为通过时原子占用名额（与报名相同的条件 UPDATE），同时从原状态的计数中减一；名额已满返回 False"""
+        values = {Activity.approved_count: Activity.approved_count + 1}
+        if old_status in Activity.COUNTED_STATUSES and old_status != 'approved':
+            column = getattr(Activity, f'{old_status}_count')
+            values[column] = column - 1
+        return Activity.query.filter(
+            Activity.id == activity_id,
+            Activity.has_open_seat()
+        ).update(values, synchronize_session=False) > 0
+    
+    @staticmethod
+    def adjust_registration_counts(activity_id, old_status=None, new_status=None):
+        """报名状态变化时维护计数列（在调用方的事务中执行，由调用方提交）"""
+        if old_status == new_status:
+            return
+        
+        values = {}
+        if old_status in Activity.COUNTED_STATUSES:
+            column = getattr(Activity, f'{old_status}_count')
+            values[column] = column - 1
+        if new_status in Activity.COUNTED_STATUSES:
+            column = getattr(Activity, f'{new_status}_count')
+            values[column] = column + 1
+        
+        if values:
+            Activity.query.filter_by(id=activity_id).update(values, synchronize_session=False)
+    
+    @staticmethod
+    def recount_registrations(activity_id=None):
+        """根据报名表重新计算计数列（修复/回填），返回更新的活动数"""
+        values = {}
+        for status in Activity.COUNTED_STATUSES:
+            values[getattr(Activity, f'{status}_count')] = db.select(db.func.count(Registration.id)) \
+                .where(Registration.activity_id == Activity.id, Registration.status == status) \
+                .scalar_subquery()
+        
+        query = Activity.query
+        if activity_id is not None:
+            query = query.filter_by(id=activity_id)
+        updated = query.update(values, synchronize_session=False)
+        db.session.commit()
+        return updated
+
+class ActivityTag(db.Model):
+    """活动标签关联表（由 Activity.tags 同步维护）"""
+    __tablename__ = 'activity_tags'
+    
+    activity_id = db.Column(db.Integer, db.ForeignKey('activities.id'), primary_key=True)
+    tag = db.Column(db.String(50), primary_key=True)
+    
+    # 按标签筛选活动
+    __table_args__ = (db.Index('ix_activity_tags_tag_activity_id', 'tag', 'activity_id'),)
+
+class TagDayCount(db.Model):
+    """标签按开始日期统计的已发布活动数（增量维护，用于标签分面计数）"""
+    __tablename__ = 'tag_day_counts'
+    
+    tag = db.Column(db.String(50), primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class FeedEntry(db.Model):
+    """用户动态时间线（关注社团发布活动时写扩散）"""
+    __tablename__ = 'feed_entries'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    activity_id = db.Column(db.Integer, db.ForeignKey('activities.id'), primary_key=True)
+    club_id = db.Column(db.Integer, db.ForeignKey('clubs.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)  # 活动发布时间
+    
+    # 读取时间线：按用户做 (created_at, activity_id) 倒序范围扫描
+    __table_args__ = (db.Index('ix_feed_entries_user_created_at_activity', 'user_id', 'created_at', 'activity_id'),)
+
+class UserRecommendation(db.Model):
+    """离线计算的个性化活动推荐（每个用户保存 top-K）"""
+    __tablename__ = 'user_recommendations'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    activity_id = db.Column(db.Integer, db.ForeignKey('activities.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+class ClubCoFollow(db.Model):
+    """社团共同关注人数（对角线为社团自身的关注人数），随关注/取消关注增量维护"""
+    __tablename__ = 'club_co_follows'
+    
+    club_id = db.Column(db.Integer, db.ForeignKey('clubs.id'), primary_key=True)
+    other_club_id = db.Column(db.Integer, db.ForeignKey('clubs.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class ClubSimilarity(db.Model):
+    """每个社团按余弦相似度排序的 top-N 相似社团"""
+    __tablename__ = 'club_similarities'
+    
+    club_id = db.Column(db.Integer, db.ForeignKey('clubs.id'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    similar_club_id = db.Column(db.Integer, db.ForeignKey('clubs.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    common_followers = db.Column(db.Integer, nullable=False)
 
 class Registration(db.Model):
     """报名表"""
@@ -173,14 +476,50 @@ class Registration(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     activity_id = db.Column(db.Integer, db.ForeignKey('activities.id'), nullable=False, index=True)
-    status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
+    status = db.Column(db.String(20), default='pending')  # pending, approved, rejected, waitlisted
+    approved_at = db.Column(db.DateTime)  # 首次审核通过时间，之后被拒绝也保留（日历增量同步据此判断是否已输出过）
+    waitlist_position = db.Column(db.Integer)  # 候补序号（同一活动内递增）
     add_to_calendar = db.Column(db.Boolean, default=True)
     reminder_time = db.Column(db.DateTime)
+    reminder_sent_at = db.Column(db.DateTime)  # 提醒已送达时间
+    reminder_lease_owner = db.Column(db.String(100))  # 正在发送提醒的调度进程
+    reminder_lease_until = db.Column(db.DateTime)  # 租约到期后其他进程可重新认领
     registration_time = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # 唯一约束：一个用户只能报名一次同一个活动
-    __table_args__ = (db.UniqueConstraint('user_id', 'activity_id', name='unique_user_activity'),)
+    # 候补索引：按活动取候补队列
+    # 提醒索引：只包含待发送的提醒（部分索引）；按更新时间增量同步提醒的变化
+    # 名单索引：按活动、报名时间分页与导出报名人员
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'activity_id', name='unique_user_activity'),
+        db.Index('ix_registrations_activity_status_position', 'activity_id', 'status', 'waitlist_position'),
+        db.Index('ix_registrations_reminder_pending', 'reminder_time',
+                 sqlite_where=db.text('reminder_time IS NOT NULL AND reminder_sent_at IS NULL')),
+        db.Index('ix_registrations_updated_at', 'updated_at'),
+        db.Index('ix_registrations_activity_registration_time_id', 'activity_id', 'registration_time', 'id'),
+    )
+    
+    @staticmethod
+    def next_waitlist_position(activity_id):
+        """下一个候补序号的SQL表达式（插入时计算）"""
+        return db.select(db.func.coalesce(db.func.max(Registration.waitlist_position), 0) + 1) \
+            .where(Registration.activity_id == activity_id) \
+            .scalar_subquery()
+    
+    def waitlist_rank(self):
+        """当前候补排名（从1开始），不在候补中时返回None"""
+        if self.status != 'waitlisted':
+            return None
+        ahead = Registration.query.filter(
+            Registration.activity_id == self.activity_id,
+            Registration.status == 'waitlisted',
+            db.or_(
+                Registration.waitlist_position < self.waitlist_position,
+                db.and_(Registration.waitlist_position == self.waitlist_position, Registration.id < self.id)
+            )
+        ).count()
+        return ahead + 1
     
     def to_dict(self, with_activity_info=False):
         """转换为字典"""
@@ -213,7 +552,11 @@ class Follow(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # 唯一约束：一个用户只能关注同一个社团一次
-    __table_args__ = (db.UniqueConstraint('user_id', 'club_id', name='unique_user_club'),)
+    # 游标分页索引：用户关注列表按 (created_at, id) 排序
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'club_id', name='unique_user_club'),
+        db.Index('ix_follows_user_created_at_id', 'user_id', 'created_at', 'id'),
+    )
     
     def to_dict(self):
         """转换为字典"""
@@ -222,4 +565,65 @@ class Follow(db.Model):
             'user_id': self.user_id,
             'club_id': self.club_id,
             'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None
-        }
\ No newline at end of file
+        }
+
+class ExtractionJob(db.Model):
+    """公众号文章活动信息提取任务（异步执行，持久化以便重启后继续）"""
+    __tablename__ = 'extraction_jobs'
+    
+    STATUSES = ('queued', 'fetching', 'extracting', 'succeeded', 'failed')
+    RUNNING_STATUSES = ('fetching', 'extracting')
+    FINISHED_STATUSES = ('succeeded', 'failed')
+    
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    article_url = db.Column(db.String(1000), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    progress = db.Column(db.Integer, nullable=False, default=0)  # 0-100
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    force_refresh = db.Column(db.Boolean, nullable=False, default=False)  # 跳过提取缓存
+    result = db.Column(db.Text)  # 大模型返回的活动信息
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # 恢复索引：重启后按状态找回未完成的任务
+    __table_args__ = (db.Index('ix_extraction_jobs_status_updated_at', 'status', 'updated_at'),)
+    
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            'job_id': self.id,
+            'article_url': self.article_url,
+            'status': self.status,
+            'progress': self.progress,
+            'activity_info': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() + 'Z' if self.created_at else None,
+            'started_at': self.started_at.isoformat() + 'Z' if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() + 'Z' if self.finished_at else None
+        }
+
+class ArticleCache(db.Model):
+    """一级提取缓存：规范化文章 URL -> 抓取到的正文"""
+    __tablename__ = 'article_cache'
+    
+    url_hash = db.Column(db.String(64), primary_key=True)  # 规范化 URL 的 SHA-256
+    url = db.Column(db.String(1000), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    accessed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)  # 按最近访问淘汰
+
+class ExtractionResultCache(db.Model):
+    """二级提取缓存：正文哈希 + 提示词版本 -> 大模型提取结果"""
+    __tablename__ = 'extraction_result_cache'
+    
+    cache_key = db.Column(db.String(64), primary_key=True)  # SHA-256(提示词版本, 模型, 正文哈希)
+    content_hash = db.Column(db.String(64), nullable=False)
+    prompt_version = db.Column(db.String(50), nullable=False)
+    result = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    accessed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)  # 按最近访问淘汰
\ No newline at end of file
@@ -1,4 +1,5 @@
 import requests
+import csv
 import json
 import unittest
 import jwt
@@ -13,6 +14,26 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 BASE_URL = "http://localhost:1234/v1"
 SECRET_KEY = "your-secret-key-change-this"
 
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extractor', 'fixtures')
+
+
+class FixtureAdapter(requests.adapters.BaseAdapter):
+    """按URL文件名返回 extractor/fixtures 中保存的页面，响应头不带charset（离线测试正文抓取）"""
+    def send(self, request, **kwargs):
+        with open(os.path.join(FIXTURES_DIR, request.url.rsplit('/', 1)[-1]), encoding='utf-8') as f:
+            page = f.read()
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'text/html'
+        response._content = page.encode('utf-8')
+        response.url = request.url
+        response.request = request
+        return response
+    
+    def close(self):
+        pass
+
+
 class TestClubAPI(unittest.TestCase):
     
     @classmethod
@@ -362,6 +383,32 @@ class TestClubAPI(unittest.TestCase):
         filter_data = response.json()
         self.assertEqual(filter_data['code'], 200)
         print("   ✅ 状态筛选功能正常")
+        
+        # 全角逗号分隔的标签在筛选与返回结果中都按单个标签处理
+        tag = f"全角{int(time.time())}"
+        response = self.session.post(f"{BASE_URL}/activities", headers=self.get_auth_headers(user_id=1, role="admin"), json={
+            "title": "全角标签测试",
+            "startTime": (datetime.utcnow() + timedelta(days=2)).isoformat() + 'Z',
+            "location": "体育馆",
+            "club_id": 1,
+            "tags": f"{tag}，户外"
+        })
+        self.assertEqual(response.status_code, 201)
+        activity_id = response.json()['data']['activity_id']
+        response = self.session.get(f"{BASE_URL}/activities", params={"tag": tag})
+        self.assertEqual([activity['tags'] for activity in response.json()['data']['activities']], [[tag, "户外"]])
+        response = self.session.get(f"{BASE_URL}/activities/{activity_id}")
+        self.assertEqual(response.json()['data']['tags'], [tag, "户外"])
+        print("   ✅ 全角逗号分隔的标签正确拆分")
+        
+        # 空的 fields 参数按未指定处理，返回全部字段
+        expected = self.session.get(f"{BASE_URL}/activities/{activity_id}").json()['data']
+        response = self.session.get(f"{BASE_URL}/activities/{activity_id}?fields=")
+        self.assertEqual(response.json()['data'], expected)
+        expected = self.session.get(f"{BASE_URL}/activities", params={"tag": tag}).json()['data']['activities']
+        response = self.session.get(f"{BASE_URL}/activities", params={"tag": tag, "fields": " , "})
+        self.assertEqual(response.json()['data']['activities'], expected)
+        print("   ✅ 空的fields参数返回全部字段")
     
     def test_09_activity_detail_and_registration(self):
         """测试9: 活动详情与报名流程"""
@@ -537,7 +584,10 @@ class TestClubAPI(unittest.TestCase):
             user_register_data = {
                 "username": f"participant_{timestamp}",
                 "password": "password123",
-                "student_id": 20280000 + (timestamp % 10000)
+                "student_id": 20280000 + (timestamp % 10000),
+                # 用户可控的字段以公式开头，导出时不能成为可执行的公式
+                "college": '=HYPERLINK("http://x")' if i == 0 else "计算机学院",
+                "major": "-2+3" if i == 0 else "软件工程"
             }
             
             register_response = self.session.post(
@@ -578,6 +628,33 @@ class TestClubAPI(unittest.TestCase):
             self.assertIn('participants', participants_data['data'])
             print(f"Response: ", participants_data)
             print(f"   ✅ 获取到 {len(participants_data['data']['participants'])} 个报名人员")
+            
+            # 状态筛选与分页
+            response = self.session.get(
+                f"{BASE_URL}/activities/{activity_id}/participants",
+                headers=auth_headers,
+                params={"status": "approved", "limit": 1}
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.json()['data']['participants']), 1)
+            self.assertTrue(all(p['status'] == 'approved' for p in response.json()['data']['participants']))
+            
+            # 导出CSV：表头加每个报名人员一行
+            response = self.session.get(
+                f"{BASE_URL}/activities/{activity_id}/participants/export",
+                headers=auth_headers
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.headers['Content-Type'].startswith('text/csv'))
+            lines = response.content.decode('utf-8-sig').splitlines()
+            self.assertEqual(len(lines), participants_data['data']['total'] + 1)
+            print(f"   ✅ 导出报名名单 {len(lines) - 1} 行")
+            
+            cells = [cell for row in csv.reader(lines) for cell in row]
+            self.assertIn('\'=HYPERLINK("http://x")', cells)
+            self.assertIn("'-2+3", cells)
+            self.assertFalse(any(cell.startswith(('=', '+', '-', '@')) for cell in cells))
+            print("   ✅ 导出CSV转义以公式字符开头的单元格")
         else:
             print("   ℹ️  没有报名人员")
         
@@ -794,6 +871,1730 @@ class TestClubAPI(unittest.TestCase):
         
         print(f"   平均响应时间: {response_time/len(requests_to_test):.2f}秒")
         print("   ✅ 性能测试通过")
+    
+    def test_14_concurrent_registration_no_overbooking(self):
+        """测试14: 高并发报名不超卖，满员后进入候补并自动递补"""
+        print("\n📊 测试14: 高并发报名")
+        from concurrent.futures import ThreadPoolExecutor
+        
+        max_participants = 50
+        user_count = 2000
+        admin_headers = self.get_auth_headers(user_id=1, role="admin")
+        
+        # 创建一个名额有限的活动
+        activity_data = {
+            "title": "高并发报名测试活动",
+            "startTime": (datetime.utcnow() + timedelta(days=5)).isoformat() + 'Z',
+            "location": "体育馆",
+            "maxParticipants": max_participants,
+            "club_id": 1
+        }
+        response = self.session.post(f"{BASE_URL}/activities", headers=admin_headers, json=activity_data)
+        self.assertEqual(response.status_code, 201)
+        activity_id = response.json()['data']['activity_id']
+        
+        # 准备大量用户
+        timestamp = int(time.time())
+        
+        def register_user(i):
+            with requests.Session() as session:
+                response = session.post(f"{BASE_URL}/auth/register", json={
+                    "username": f"crowd_{timestamp}_{i}",
+                    "password": "password123",
+                    "student_id": 30000000 + (timestamp % 100000) * 10000 + i
+                })
+                return response.json()['data']['token']
+        
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            tokens = list(executor.map(register_user, range(user_count)))
+        print(f"   已准备 {len(tokens)} 个用户")
+        
+        # 所有用户同时报名
+        def register_activity(token):
+            with requests.Session() as session:
+                response = session.post(
+                    f"{BASE_URL}/activities/{activity_id}/register",
+                    headers={"Authorization": f"Bearer {token}"},
+                    json={"addToCalendar": True},
+                    timeout=60
+                )
+                return response.status_code, response.json().get('data') or {}
+        
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=64) as executor:
+            results = list(executor.map(register_activity, tokens))
+        elapsed = time.time() - start
+        
+        succeeded = sum(1 for status, data in results if status == 200 and data.get('status') == 'pending')
+        waitlisted = [data['waitlistPosition'] for status, data in results
+                      if status == 200 and data.get('status') == 'waitlisted']
+        print(f"   成功 {succeeded}，候补 {len(waitlisted)}，其他 {len(results) - succeeded - len(waitlisted)}，"
+              f"耗时 {elapsed:.2f}秒")
+        
+        # 成功人数恰好等于名额，其余按顺序进入候补，计数与报名记录一致
+        self.assertEqual(succeeded, max_participants)
+        self.assertEqual(sorted(waitlisted), list(range(1, user_count - max_participants + 1)))
+        
+        response = self.session.get(f"{BASE_URL}/activities/{activity_id}")
+        self.assertEqual(response.json()['data']['currentParticipants'], max_participants)
+        
+        response = self.session.get(f"{BASE_URL}/activities/{activity_id}/participants", headers=admin_headers,
+                                    params={"status": "approved", "limit": 100})
+        approved = response.json()['data']['participants']
+        self.assertTrue(all(p['status'] == 'approved' for p in approved))
+        self.assertEqual(len(approved), max_participants)
+        print("   ✅ 没有超卖")
+        
+        # 管理员拒绝一名已通过的报名后，候补第一位自动递补，第二位前移
+        by_position = {data.get('waitlistPosition'): tokens[i] for i, (_, data) in enumerate(results)}
+        first, second = by_position[1], by_position[2]
+        
+        response = self.session.put(
+            f"{BASE_URL}/activities/{activity_id}/participants/{approved[0]['user_id']}",
+            headers=admin_headers,
+            json={"status": "rejected"}
+        )
+        self.assertEqual(response.status_code, 200)
+        
+        response = self.session.get(f"{BASE_URL}/activities/{activity_id}/waitlist",
+                                    headers={"Authorization": f"Bearer {first}"})
+        self.assertEqual(response.json()['data']['status'], 'approved')
+        
+        response = self.session.get(f"{BASE_URL}/activities/{activity_id}/waitlist",
+                                    headers={"Authorization": f"Bearer {second}"})
+        self.assertEqual(response.json()['data']['waitlistPosition'], 1)
+        
+        response = self.session.get(f"{BASE_URL}/activities/{activity_id}")
+        self.assertEqual(response.json()['data']['currentParticipants'], max_participants)
+        print("   ✅ 候补自动递补")
+        
+        # 满员时管理员不能把已拒绝的报名重新改为通过
+        response = self.session.put(
+            f"{BASE_URL}/activities/{activity_id}/participants/{approved[0]['user_id']}",
+            headers=admin_headers,
+            json={"status": "approved"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], '名额已满')
+        
+        response = self.session.get(f"{BASE_URL}/activities/{activity_id}")
+        self.assertEqual(response.json()['data']['currentParticipants'], max_participants)
+        print("   ✅ 审核通过同样受名额限制")
+    
+    def test_15_conditional_get(self):
+        """测试15: ETag条件请求"""
+        print("\n🏷️ 测试15: ETag条件请求")
+        
+        for path in ["/activities?page=1&limit=5", "/clubs", "/activities/1"]:
+            response = self.session.get(f"{BASE_URL}{path}")
+            self.assertEqual(response.status_code, 200)
+            etag = response.headers.get('ETag')
+            self.assertIsNotNone(etag)
+            
+            response = self.session.get(f"{BASE_URL}{path}", headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+            
+            response = self.session.get(f"{BASE_URL}{path}", headers={"If-None-Match": '"stale"'})
+            self.assertEqual(response.status_code, 200)
+        print("   ✅ 未变化时返回304")
+    
+    def test_16_batch_requests(self):
+        """测试16: 首页批量请求"""
+        print("\n📦 测试16: 批量请求")
+        
+        headers = self.get_auth_headers(user_id=1, role="admin")
+        sub_requests = [
+            {"id": "latest", "path": "/v1/activities/latest"},
+            {"id": "clubs", "path": "/v1/user/followed-clubs"},
+            {"id": "registered", "path": "/v1/user/registered-activities"},
+            {"id": "profile", "path": "/v1/user/profile"}
+        ]
+        response = self.session.post(f"{BASE_URL}/batch", headers=headers, json={"requests": sub_requests})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['data']['responses']
+        self.assertEqual([item['id'] for item in results], ["latest", "clubs", "registered", "profile"])
+        for item in results:
+            self.assertEqual(item['status'], 200)
+            self.assertEqual(item['body']['code'], 200)
+        self.assertEqual(results[3]['body']['data']['user_id'], 1)
+        print("   ✅ 子请求全部成功")
+        
+        response = self.session.post(f"{BASE_URL}/batch", headers=headers,
+                                     json={"requests": [{"path": "/v1/tags"}] * 21})
+        self.assertEqual(response.status_code, 400)
+        print("   ✅ 子请求数量上限生效")
+        
+        # 批量子请求带有调用者身份，个性化的列表不能写入匿名请求共用的缓存
+        timestamp = int(time.time())
+        tag = f"batch{timestamp}"
+        response = self.session.post(f"{BASE_URL}/activities", headers=headers, json={
+            "title": f"批量缓存测试{timestamp}",
+            "startTime": (datetime.utcnow() + timedelta(days=4)).isoformat() + 'Z',
+            "location": "图书馆",
+            "club_id": 2,
+            "tags": [tag]
+        })
+        self.assertEqual(response.status_code, 201)
+        activity_id = response.json()['data']['activity_id']
+        response = self.session.post(f"{BASE_URL}/activities/{activity_id}/register", headers=headers, json={})
+        self.assertEqual(response.status_code, 200)
+        
+        path = f"/v1/activities?tag={tag}"
+        response = self.session.post(f"{BASE_URL}/batch", headers=headers, json={"requests": [{"path": path}]})
+        activities = response.json()['data']['responses'][0]['body']['data']['activities']
+        self.assertTrue(activities[0]['isRegistered'])
+        
+        response = self.session.get(f"{BASE_URL}/activities", params={"tag": tag})
+        self.assertNotEqual(response.headers.get('X-Cache'), 'HIT')
+        self.assertNotIn('isRegistered', response.json()['data']['activities'][0])
+        
+        response = self.session.post(f"{BASE_URL}/batch", headers=headers,
+                                     json={"requests": [{"path": "/v1/clubs?limit=50"}]})
+        self.assertEqual(response.json()['data']['responses'][0]['status'], 200)
+        response = self.session.get(f"{BASE_URL}/clubs", params={"limit": 50})
+        self.assertNotEqual(response.headers.get('X-Cache'), 'HIT')
+        self.assertTrue(all('is_followed' not in club for club in response.json()['data']['clubs']))
+        print("   ✅ 批量请求的个性化结果不会写入公共缓存")
+    
+    def test_17_user_feed(self):
+        """测试17: 关注社团的活动动态"""
+        print("\n📰 测试17: 关注动态")
+        
+        timestamp = int(time.time())
+        response = self.session.post(f"{BASE_URL}/auth/register", json={
+            "username": f"feed_{timestamp}",
+            "password": "password123",
+            "student_id": 40000000 + timestamp % 1000000
+        })
+        headers = {"Authorization": f"Bearer {response.json()['data']['token']}"}
+        admin_headers = self.get_auth_headers(user_id=1, role="admin")
+        
+        response = self.session.post(f"{BASE_URL}/clubs/2/follow", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        
+        titles = [f"动态测试活动{timestamp}_{i}" for i in range(3)]
+        for title in titles:
+            response = self.session.post(f"{BASE_URL}/activities", headers=admin_headers, json={
+                "title": title,
+                "startTime": (datetime.utcnow() + timedelta(days=3)).isoformat() + 'Z',
+                "location": "教学楼",
+                "club_id": 2
+            })
+            self.assertEqual(response.status_code, 201)
+        
+        response = self.session.get(f"{BASE_URL}/user/feed?limit=2", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        page = response.json()['data']
+        self.assertEqual([item['title'] for item in page['activities']], titles[::-1][:2])
+        self.assertTrue(page['has_more'])
+        
+        response = self.session.get(f"{BASE_URL}/user/feed?limit=2&cursor={page['next_cursor']}", headers=headers)
+        self.assertEqual(response.json()['data']['activities'][0]['title'], titles[0])
+        print("   ✅ 新活动按发布时间倒序出现在动态中")
+        
+        for limit in (0, -1, 101):
+            response = self.session.get(f"{BASE_URL}/user/feed?limit={limit}&cursor={page['next_cursor']}", headers=headers)
+            self.assertEqual(response.status_code, 400)
+        print("   ✅ 超出范围的分页大小返回400")
+        
+        self.session.delete(f"{BASE_URL}/clubs/2/follow", headers=headers)
+        response = self.session.get(f"{BASE_URL}/user/feed", headers=headers)
+        self.assertEqual(response.json()['data']['activities'], [])
+        print("   ✅ 取消关注后动态清空")
+    
+    def test_18_calendar_feed(self):
+        """测试18: 日历订阅与增量同步"""
+        print("\n📅 测试18: 日历订阅")
+        
+        timestamp = int(time.time())
+        response = self.session.post(f"{BASE_URL}/auth/register", json={
+            "username": f"calendar_{timestamp}",
+            "password": "password123",
+            "student_id": 50000000 + timestamp % 1000000
+        })
+        user_id = response.json()['data']['user_id']
+        headers = {"Authorization": f"Bearer {response.json()['data']['token']}"}
+        admin_headers = self.get_auth_headers(user_id=1, role="admin")
+        
+        title = f"日历测试活动{timestamp}"
+        response = self.session.post(f"{BASE_URL}/activities", headers=admin_headers, json={
+            "title": title,
+            "startTime": (datetime.utcnow() + timedelta(days=5)).isoformat() + 'Z',
+            "location": "体育馆",
+            "club_id": 2
+        })
+        self.assertEqual(response.status_code, 201)
+        activity_id = response.json()['data']['activity_id']
+        response = self.session.post(f"{BASE_URL}/activities/{activity_id}/register", headers=headers, json={})
+        self.assertEqual(response.status_code, 200)
+        
+        response = self.session.get(f"{BASE_URL}/user/calendar", headers=headers)
+        self.assertEqual(response.status_code, 200)
+        url = response.json()['data']['url']
+        
+        response = self.session.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers['Content-Type'].startswith('text/calendar'))
+        self.assertIn('BEGIN:VCALENDAR', response.text)
+        self.assertIn(f'SUMMARY:{title}', response.text)
+        print("   ✅ 已通过的报名出现在日历中")
+        
+        response = self.session.get(url, headers={"If-None-Match": response.headers['ETag']})
+        self.assertEqual(response.status_code, 304)
+        print("   ✅ 日历未变化时返回304")
+        
+        for token in ("not-a-token", "ffffffffffffffffffffff", "-ffffffffffffff", "-1", " 1"):
+            response = self.session.get(url, params={"sync_token": token})
+            self.assertEqual(response.status_code, 400)
+        print("   ✅ 无效、超出范围或为负数的sync_token返回400")
+        
+        # 增量同步只对客户端可能已有的日程（曾经通过的报名）输出 CANCELLED，候补报名不输出
+        sync_token = self.session.get(url).headers['X-Sync-Token']
+        response = self.session.post(f"{BASE_URL}/auth/register", json={
+            "username": f"calendar_other_{timestamp}",
+            "password": "password123",
+            "student_id": 51000000 + timestamp % 1000000
+        })
+        other_headers = {"Authorization": f"Bearer {response.json()['data']['token']}"}
+        full_title = f"日历满员活动{timestamp}"
+        response = self.session.post(f"{BASE_URL}/activities", headers=admin_headers, json={
+            "title": full_title,
+            "startTime": (datetime.utcnow() + timedelta(days=6)).isoformat() + 'Z',
+            "location": "体育馆",
+            "maxParticipants": 1,
+            "club_id": 2
+        })
+        full_id = response.json()['data']['activity_id']
+        self.session.post(f"{BASE_URL}/activities/{full_id}/register", headers=other_headers, json={})
+        response = self.session.post(f"{BASE_URL}/activities/{full_id}/register", headers=headers, json={})
+        self.assertEqual(response.json()['data']['status'], 'waitlisted')
+        
+        response = self.session.put(f"{BASE_URL}/activities/{activity_id}/participants/{user_id}",
+                                    headers=admin_headers, json={"status": "rejected"})
+        self.assertEqual(response.status_code, 200)
+        response = self.session.get(url, params={"sync_token": sync_token})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(f'SUMMARY:{full_title}', response.text)
+        event = response.text.split(f'SUMMARY:{title}')[1].split('END:VEVENT')[0]
+        self.assertIn('STATUS:CANCELLED', event)
+        print("   ✅ 增量同步只取消曾经输出过的日程")
+        
+        response = self.session.post(f"{BASE_URL}/user/calendar/reset", headers=headers)
+        self.assertNotEqual(response.json()['data']['url'], url)
+        self.assertEqual(self.session.get(url).status_code, 404)
+        print("   ✅ 重置后旧订阅链接失效")
+    
+    def test_19_extraction_jobs(self):
+        """测试19: 文章提取任务接口校验与离线执行"""
+        print("\n🧾 测试19: 文章提取任务")
+        
+        response = self.session.post(f"{BASE_URL}/extract/wechat", json={"async": True})
+        self.assertEqual(response.status_code, 400)
+        
+        response = self.session.get(f"{BASE_URL}/extract/jobs/nonexistent")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['message'], '任务不存在')
+        print("   ✅ 缺少URL返回400，未知任务返回404")
+        
+        # 离线执行完整任务：正文取自保存的页面，大模型为本地模拟接口
+        import tempfile
+        from flask import Flask
+        from models import db, ExtractionJob
+        from controllers.extractor_controller import extract_bp
+        from extractor import pipeline, fake_llm_server
+        from extractor.llm_client import LLMClientManager
+        from extractor.wechat_article_extractor import HttpArticleExtractor
+        
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}', EXTRACT_JOB_TIMEOUT=60,
+                          EXTRACT_CACHE_ARTICLE_TTL=3600, EXTRACT_CACHE_RESULT_TTL=3600)
+        db.init_app(app)
+        app.register_blueprint(extract_bp, url_prefix='/v1')
+        client = app.test_client()
+        
+        session = requests.Session()
+        session.mount('https://', FixtureAdapter())
+        server = fake_llm_server.start(latency=0)
+        saved = pipeline._article_extractor, pipeline._llm_client
+        pipeline._article_extractor = HttpArticleExtractor(session=session)
+        pipeline._llm_client = LLMClientManager.from_config({'LLM_BASE_URL': server.base_url}, 'test-key')
+        
+        def wait(job_id):
+            for _ in range(100):
+                state = client.get(f"/v1/extract/jobs/{job_id}").get_json()['data']
+                if state['status'] in ('succeeded', 'failed'):
+                    return state
+                time.sleep(0.05)
+            self.fail(f"任务 {job_id} 未在5秒内结束")
+        
+        try:
+            with app.app_context():
+                db.create_all()
+            
+            response = client.post("/v1/extract/wechat", json={
+                "article_url": "https://mp.weixin.qq.com/s/wechat_article.html", "async": True
+            })
+            self.assertEqual(response.status_code, 202)
+            state = wait(response.get_json()['data']['job_id'])
+            self.assertEqual(state['status'], 'succeeded')
+            self.assertEqual(state['progress'], 100)
+            self.assertEqual(json.loads(state['activity_info'])['activity_name'], '模拟活动')
+            print("   ✅ 异步任务执行到succeeded")
+            
+            # 工作线程池启动之后才出现的中断任务（其他进程崩溃留下的），下一次创建任务时被找回
+            with app.app_context():
+                db.session.add(ExtractionJob(id='interrupted', article_url='https://mp.weixin.qq.com/s/wechat_article.html',
+                                             status='extracting', progress=50, attempts=1,
+                                             updated_at=datetime.utcnow() - timedelta(seconds=120)))
+                db.session.commit()
+            
+            response = client.post("/v1/extract/wechat", json={
+                "article_url": "https://mp.weixin.qq.com/s/wechat_verify.html", "async": True
+            })
+            state = wait(response.get_json()['data']['job_id'])
+            self.assertEqual(state['status'], 'failed')
+            self.assertEqual(state['error'], '文章内容提取失败')
+            print("   ✅ 取不到正文的任务标记为failed")
+            
+            state = wait('interrupted')
+            self.assertEqual(state['status'], 'succeeded')
+            print("   ✅ 中断的任务被重新执行")
+        finally:
+            pipeline._article_extractor, pipeline._llm_client = saved
+            server.shutdown()
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+            os.remove(path)
+    
+    def test_20_article_fetcher_offline(self):
+        """测试20: 公众号正文HTTP抓取（离线HTML样例，不启动浏览器）"""
+        print("\n📰 测试20: 正文抓取")
+        from extractor.wechat_article_extractor import (
+            HttpArticleExtractor, FallbackArticleExtractor, ArticleExtractor
+        )
+        
+        class RecordingBrowser(ArticleExtractor):
+            def __init__(self):
+                self.urls = []
+            
+            def extract_article_content(self, article_url):
+                self.urls.append(article_url)
+                return '浏览器渲染的正文'
+        
+        session = requests.Session()
+        session.mount('https://', FixtureAdapter())
+        http = HttpArticleExtractor(session=session)
+        
+        content = http.extract_article_content('https://mp.weixin.qq.com/s/wechat_article.html')
+        lines = content.split('\n')
+        self.assertEqual(lines[0], '活动名称：秋季校园定向越野赛')
+        self.assertIn('活动时间：2025年11月8日 09:00 - 12:00', lines)
+        self.assertIn('报名请扫描下方二维码 & 填写表单，名额有限<先到先得>。', lines)
+        self.assertEqual(lines[-2:], ['每队 3-5 人', '请穿运动鞋'])
+        self.assertNotIn('__noscript_track', content)
+        print("   ✅ 从#js_content解析出正文，忽略脚本与正文外的内容")
+        
+        browser = RecordingBrowser()
+        extractor = FallbackArticleExtractor(http, browser)
+        self.assertEqual(extractor.extract_article_content('https://mp.weixin.qq.com/s/wechat_article.html'), content)
+        self.assertEqual(browser.urls, [])
+        self.assertEqual(extractor.extract_article_content('https://mp.weixin.qq.com/s/wechat_verify.html'),
+                         '浏览器渲染的正文')
+        self.assertEqual(browser.urls, ['https://mp.weixin.qq.com/s/wechat_verify.html'])
+        print("   ✅ 取不到正文的页面才回退到浏览器")
+        
+        # 浏览器不可用（未安装selenium或找不到浏览器）时返回提取失败，而不是服务器内部错误
+        from extractor import pipeline
+        from extractor.wechat_article_extractor import WeChatArticleExtractor
+        from extractor.webdriver_pool import WebDriverPool
+        
+        def missing_browser():
+            from selenium.common.exceptions import WebDriverException
+            raise WebDriverException("找不到chromedriver")
+        
+        saved = pipeline._article_extractor
+        pipeline._article_extractor = FallbackArticleExtractor(
+            http, WeChatArticleExtractor(WebDriverPool(missing_browser, size=1)))
+        try:
+            with self.assertRaises(pipeline.ExtractionError):
+                pipeline.fetch_article('https://mp.weixin.qq.com/s/wechat_verify.html', force_refresh=True)
+        finally:
+            pipeline._article_extractor = saved
+        print("   ✅ 浏览器不可用时返回提取失败")
+    
+    def test_21_webdriver_pool(self):
+        """测试21: 浏览器会话池的复用、回收与崩溃处理（假浏览器，离线）"""
+        print("\n🧭 测试21: 浏览器会话池")
+        from extractor.webdriver_pool import WebDriverPool, PoolTimeoutError
+        
+        class FakeDriver:
+            def __init__(self):
+                self.alive = True
+                self.quit_called = False
+            
+            def execute_script(self, script):
+                if not self.alive:
+                    raise RuntimeError("浏览器已退出")
+                return 1
+            
+            def quit(self):
+                self.quit_called = True
+        
+        pool = WebDriverPool(FakeDriver, size=1, max_pages=2, checkout_timeout=0.1)
+        with pool.driver() as first:
+            with self.assertRaises(PoolTimeoutError):
+                with pool.driver():
+                    pass
+        with pool.driver() as second:
+            self.assertIs(second, first)
+        self.assertTrue(first.quit_called)
+        print("   ✅ 会话被复用，处理满max_pages后回收")
+        
+        with self.assertRaises(ValueError):
+            with pool.driver() as crashed:
+                raise ValueError("页面崩溃")
+        self.assertTrue(crashed.quit_called)
+        
+        with pool.driver() as third:
+            third.alive = False
+        with pool.driver() as fourth:
+            self.assertIsNot(fourth, third)
+        self.assertEqual(pool.stats['discarded'], 2)
+        pool.close()
+        print("   ✅ 崩溃或健康检查失败的会话被丢弃重建")
+    
+    def test_22_extraction_cache(self):
+        """测试22: 提取缓存的URL规范化、TTL与按最近访问淘汰（内存数据库，离线）"""
+        print("\n🗃️ 测试22: 提取缓存")
+        from flask import Flask
+        from models import db, ArticleCache
+        from utils import extraction_cache
+        
+        shared = 'https://mp.weixin.qq.com/s?__biz=MzA&mid=1&idx=1&sn=abc&chksm=z&scene=21#wechat_redirect'
+        forwarded = 'http://MP.weixin.qq.com/s?sn=abc&idx=1&mid=1&__biz=MzA&sessionid=9'
+        self.assertEqual(extraction_cache.normalize_url(shared), extraction_cache.normalize_url(forwarded))
+        self.assertEqual(extraction_cache.normalize_url('https://mp.weixin.qq.com/s/AbC?scene=1'),
+                         'https://mp.weixin.qq.com/s/AbC')
+        print("   ✅ 同一文章的不同分享链接命中同一条缓存")
+        
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', EXTRACT_CACHE_MAX_ENTRIES=3,
+                          EXTRACT_CACHE_ARTICLE_TTL=3600, EXTRACT_CACHE_RESULT_TTL=3600)
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            extraction_cache.put_article(shared, '正文')
+            self.assertEqual(extraction_cache.get_article(forwarded), '正文')
+            extraction_cache.put_result('正文', '1:qwen-plus', '{"activity_name": "讲座"}')
+            self.assertEqual(extraction_cache.get_result('正文', '1:qwen-plus'), '{"activity_name": "讲座"}')
+            self.assertIsNone(extraction_cache.get_result('正文', '2:qwen-plus'))
+            print("   ✅ 提示词版本变化后结果缓存失效")
+            
+            for i in range(2):
+                time.sleep(0.01)
+                extraction_cache.put_article(f'https://example.com/a?id={i}', f'正文{i}')
+            # 最早写入的文章刚被访问过，超出上限时淘汰的是 id=0
+            extraction_cache.get_article(shared)
+            time.sleep(0.01)
+            extraction_cache.put_article('https://example.com/a?id=9', '正文9')
+            self.assertEqual(ArticleCache.query.count(), 3)
+            self.assertEqual(extraction_cache.get_article(shared), '正文')
+            self.assertIsNone(extraction_cache.get_article('https://example.com/a?id=0'))
+            
+            app.config['EXTRACT_CACHE_ARTICLE_TTL'] = 0
+            self.assertIsNone(extraction_cache.get_article(shared))
+            print("   ✅ 超出条数上限淘汰最久未访问的条目，过期条目不再命中")
+            
+            # 写缓存失败只记录日志，不影响已经完成的提取
+            ArticleCache.__table__.drop(db.engine)
+            with self.assertLogs('utils.extraction_cache', level='WARNING'):
+                extraction_cache.put_article(shared, '正文')
+            db.session.remove()
+        print("   ✅ 写缓存失败不抛出异常")
+    
+    def test_23_llm_client_limits(self):
+        """测试23: 共享大模型客户端的并发上限、限流重试与超时预算（本地模拟接口，离线）"""
+        print("\n🤖 测试23: 大模型客户端")
+        from extractor import fake_llm_server
+        from extractor.llm_client import LLMClientManager, benchmark
+        from extractor.activity_info_extractor import ActivityInfoExtractor
+        
+        server = fake_llm_server.start(latency=0.1, max_inflight=2, retry_after=0)
+        try:
+            manager = LLMClientManager.from_config({
+                'LLM_BASE_URL': server.base_url, 'LLM_MAX_CONCURRENCY': 4, 'LLM_MAX_RETRIES': 10, 'LLM_BACKOFF': 0.05
+            }, 'test-key')
+            stats = benchmark(manager, requests=16, concurrency=8)
+            self.assertEqual(stats['succeeded'], 16)
+            self.assertGreater(stats['client']['retries'], 0)
+            self.assertLessEqual(server.stats['max_inflight'], 2)
+            # 连接被复用，而不是每次调用新建
+            self.assertLessEqual(server.stats['connections'], 4)
+            print(f"   ✅ 429 后退避重试全部成功（重试 {stats['client']['retries']} 次，"
+                  f"{server.stats['connections']} 个连接）")
+            
+            info = ActivityInfoExtractor(manager).extract_activity_info('正文')
+            self.assertEqual(json.loads(info)['activity_name'], '模拟活动')
+        finally:
+            server.shutdown()
+        
+        server = fake_llm_server.start(latency=2)
+        try:
+            manager = LLMClientManager.from_config({
+                'LLM_BASE_URL': server.base_url, 'LLM_TIMEOUT_BUDGET': 0.5
+            }, 'test-key')
+            started = time.time()
+            with self.assertRaises(Exception):
+                manager.create_chat_completion(model='qwen-plus', messages=[{'role': 'user', 'content': '正文'}])
+            self.assertLess(time.time() - started, 1.5)
+            self.assertEqual(manager.stats['failures'], 1)
+        finally:
+            server.shutdown()
+        print("   ✅ 超出时间预算立即失败")
+    
+    def test_24_reminder_dispatcher(self):
+        """测试24: 活动提醒调度器的到期发送、租约认领与失败重试（内存数据库，离线）"""
+        print("\n⏰ 测试24: 活动提醒")
+        import tempfile
+        from flask import Flask
+        from models import db, User, Club, Activity, Registration
+        from utils.reminders import ReminderDispatcher, LogNotifier, Notifier
+        
+        class FlakyNotifier(Notifier):
+            """第一次发送失败，之后记录发送的报名ID"""
+            def __init__(self):
+                self.failures = 1
+                self.sent = []
+            
+            def send(self, reminder):
+                if self.failures:
+                    self.failures -= 1
+                    raise ConnectionError("推送服务不可用")
+                self.sent.append(reminder['registration_id'])
+        
+        fd, log_path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        
+        def logged():
+            with open(log_path, encoding='utf-8') as f:
+                return [json.loads(line)['registration_id'] for line in f]
+        
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://')
+        db.init_app(app)
+        now = datetime.utcnow().replace(microsecond=0)
+        with app.app_context():
+            db.create_all()
+            user = User(username='reminder_user', student_id=50000001)
+            user.set_password('password123')
+            db.session.add(user)
+            db.session.flush()
+            club = Club(name='提醒测试社团', manager_id=user.id)
+            db.session.add(club)
+            db.session.flush()
+            activities = [Activity(title=f'提醒测试活动{i}', club_id=club.id, creator_id=user.id,
+                                   start_time=now + timedelta(hours=3), location='礼堂') for i in range(2)]
+            db.session.add_all(activities)
+            db.session.flush()
+            due = Registration(user_id=user.id, activity_id=activities[0].id, status='approved',
+                               reminder_time=now - timedelta(minutes=1))
+            later = Registration(user_id=user.id, activity_id=activities[1].id, status='approved',
+                                 reminder_time=now + timedelta(hours=2))
+            db.session.add_all([due, later])
+            db.session.commit()
+            due_id, later_id, updated_at = due.id, later.id, due.updated_at
+            
+            flaky = FlakyNotifier()
+            first = ReminderDispatcher(flaky, owner='first', lease=60)
+            second = ReminderDispatcher(LogNotifier(log_path), owner='second', lease=60)
+            
+            # 第一个实例认领后发送失败，租约期内第二个实例认领不到，不会重复发送
+            self.assertEqual(first.run_once(now), 0)
+            self.assertEqual(second.run_once(now), 0)
+            self.assertEqual(logged(), [])
+            print("   ✅ 已被其他实例租用的提醒不会被重复认领")
+            
+            # 租约到期后由原实例重试成功，另一实例检查后不再发送
+            self.assertEqual(first.run_once(now + timedelta(seconds=61)), 1)
+            self.assertEqual(flaky.sent, [due_id])
+            self.assertEqual(second.run_once(now + timedelta(seconds=62)), 0)
+            self.assertEqual(logged(), [])
+            print("   ✅ 发送失败的提醒在租约到期后重试")
+            
+            # 未到期的提醒不发送，进入时间窗并到期后发送
+            self.assertEqual(second.run_once(now + timedelta(hours=1)), 0)
+            self.assertEqual(second.run_once(now + timedelta(hours=2, seconds=1)), 1)
+            self.assertEqual(logged(), [later_id])
+            self.assertEqual(first.run_once(now + timedelta(hours=2, seconds=2)), 0)
+            print("   ✅ 提醒在到期时发送且只发送一次")
+            
+            # 提醒状态的变化不影响报名的 updated_at（详情 ETag、日历增量同步）
+            self.assertEqual(db.session.get(Registration, due_id).updated_at, updated_at)
+            db.session.remove()
+        os.remove(log_path)
+    
+    def test_25_club_similarity(self):
+        """测试25: 相似社团的增量维护与全量重建与暴力计算一致（内存数据库，离线）"""
+        print("\n🔗 测试25: 相似社团")
+        import math
+        import random
+        from flask import Flask
+        from models import db, User, Club, Follow, ClubSimilarity
+        from utils import club_similarity
+        
+        def brute_force():
+            """逐对计算余弦相似度 |A∩B| / sqrt(|A|·|B|)"""
+            members = {}
+            for follow in Follow.query:
+                members.setdefault(follow.club_id, set()).add(follow.user_id)
+            expected = {}
+            for club_id, users in members.items():
+                scores = {(other, round(len(users & others) / math.sqrt(len(users) * len(others)), 9))
+                          for other, others in members.items() if other != club_id and users & others}
+                if scores:
+                    expected[club_id] = scores
+            return expected
+        
+        def stored():
+            """按排名读取相似列表，同时检查分数随排名不增"""
+            rankings = {}
+            for row in ClubSimilarity.query.order_by(ClubSimilarity.club_id, ClubSimilarity.rank):
+                rankings.setdefault(row.club_id, []).append((row.similar_club_id, row.score))
+            for ranking in rankings.values():
+                scores = [score for _, score in ranking]
+                self.assertTrue(all(a >= b - 1e-9 for a, b in zip(scores, scores[1:])))
+            return {club_id: {(other, round(score, 9)) for other, score in ranking}
+                    for club_id, ranking in rankings.items()}
+        
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', SIMILAR_CLUBS_TOP_N=10)
+        db.init_app(app)
+        rng = random.Random(17)
+        with app.app_context():
+            db.create_all()
+            users = [User(username=f'similar_{i}', student_id=51000000 + i) for i in range(12)]
+            for user in users:
+                user.set_password('password123')
+            db.session.add_all(users)
+            db.session.flush()
+            clubs = [Club(name=f'相似测试社团{i}', manager_id=users[0].id) for i in range(6)]
+            db.session.add_all(clubs)
+            db.session.commit()
+            
+            # 随机关注与取消关注，每一步都由监听器增量维护
+            for _ in range(60):
+                user, club = rng.choice(users), rng.choice(clubs)
+                follow = Follow.query.filter_by(user_id=user.id, club_id=club.id).first()
+                if follow:
+                    db.session.delete(follow)
+                else:
+                    db.session.add(Follow(user_id=user.id, club_id=club.id))
+                db.session.commit()
+            expected = brute_force()
+            self.assertTrue(expected)
+            self.assertEqual(stored(), expected)
+            print("   ✅ 增量维护的相似列表与暴力计算一致")
+            
+            try:
+                import numpy  # noqa: F401  全量重建需要 numpy
+            except ImportError:
+                print("   ⚠️ 未安装numpy，跳过全量重建的对比")
+            else:
+                club_similarity.rebuild(chunk_size=5)
+                self.assertEqual(stored(), expected)
+                print("   ✅ 全量重建的相似列表与暴力计算一致")
+            db.session.remove()
+        
+        # 列表容量很小时，社团频繁进出 top-N：每一步都与截断后的暴力结果（分数降序、id升序）逐项一致
+        def ranked(top_n):
+            return {club_id: [other for other, _ in sorted(scores, key=lambda item: (-item[1], item[0]))[:top_n]]
+                    for club_id, scores in brute_force().items()}
+        
+        def stored_ranked():
+            rankings = {}
+            for row in ClubSimilarity.query.order_by(ClubSimilarity.club_id, ClubSimilarity.rank):
+                rankings.setdefault(row.club_id, []).append(row.similar_club_id)
+            return rankings
+        
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', SIMILAR_CLUBS_TOP_N=2)
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            users = [User(username=f'similar_top_{i}', student_id=51100000 + i) for i in range(15)]
+            for user in users:
+                user.set_password('password123')
+            db.session.add_all(users)
+            db.session.flush()
+            clubs = [Club(name=f'相似排名社团{i}', manager_id=users[0].id) for i in range(8)]
+            db.session.add_all(clubs)
+            db.session.commit()
+            
+            for _ in range(250):
+                user, club = rng.choice(users), rng.choice(clubs)
+                follow = Follow.query.filter_by(user_id=user.id, club_id=club.id).first()
+                if follow:
+                    db.session.delete(follow)
+                else:
+                    db.session.add(Follow(user_id=user.id, club_id=club.id))
+                db.session.commit()
+                self.assertEqual(stored_ranked(), ranked(2))
+            print("   ✅ top-N很小时每一步的增量结果都与暴力计算一致")
+            db.session.remove()
+    
+    def test_26_recommendations(self):
+        """测试26: 离线推荐的打分顺序与已报名活动排除（内存数据库，离线）"""
+        print("\n🎯 测试26: 活动推荐")
+        try:
+            import numpy  # noqa: F401  离线推荐需要 numpy
+        except ImportError:
+            self.skipTest("未安装numpy")
+        from flask import Flask
+        from models import db, User, Club, Activity, Registration, Follow, UserRecommendation
+        from utils import recommendations, tag_index  # noqa: F401  tag_index 负责同步活动标签
+        
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://')
+        db.init_app(app)
+        now = datetime.utcnow()
+        with app.app_context():
+            db.create_all()
+            users = [User(username=f'recommend_{i}', student_id=52000000 + i) for i in range(4)]
+            for user in users:
+                user.set_password('password123')
+            db.session.add_all(users)
+            db.session.flush()
+            sports, arts = Club(name='运动社', manager_id=users[0].id), Club(name='美术社', manager_id=users[0].id)
+            db.session.add_all([sports, arts])
+            db.session.flush()
+            
+            def activity(title, tags, club, days):
+                item = Activity(title=title, tags=tags, club_id=club.id, creator_id=users[0].id,
+                                status='published', start_time=now + timedelta(days=days), location='校园')
+                db.session.add(item)
+                db.session.flush()
+                return item.id
+            
+            registered = activity('篮球友谊赛', '篮球,运动', sports, 1)
+            basketball = activity('篮球训练营', '篮球,运动', sports, 2)
+            hiking = activity('周末徒步', '运动,户外', sports, 3)
+            coding = activity('编程马拉松', '编程,技术', sports, 4)
+            painting = activity('水彩写生', '绘画', arts, 5)
+            lecture = activity('编程讲座', '编程,讲座', sports, -3)  # 已结束，不作为候选
+            
+            db.session.add_all([
+                Registration(user_id=users[0].id, activity_id=registered, status='approved'),
+                Registration(user_id=users[1].id, activity_id=lecture, status='approved'),
+                Follow(user_id=users[2].id, club_id=arts.id)
+            ])
+            db.session.commit()
+            
+            stats = recommendations.compute(top_k=3, now=now)
+            self.assertEqual(stats['users'], 3)
+            self.assertEqual(stats['candidates'], 5)
+            
+            def recommended(user):
+                return [row.activity_id for row in UserRecommendation.query
+                        .filter_by(user_id=user.id).order_by(UserRecommendation.rank)]
+            
+            # 标签完全相同的排第一、共享一个标签的其次，无共同标签的不推荐；已报名的活动不推荐
+            self.assertEqual(recommended(users[0]), [basketball, hiking])
+            self.assertEqual(recommended(users[1]), [coding])
+            self.assertEqual(recommended(users[2]), [painting])
+            self.assertEqual(recommended(users[3]), [])
+            print("   ✅ 推荐按标签相似度排序，排除已报名活动")
+            
+            recommendations.compute(top_k=1, now=now)
+            self.assertEqual(recommended(users[0]), [basketball])
+            print("   ✅ 每个用户最多保存top-K条")
+            db.session.remove()
+    
+    def test_27_response_compression(self):
+        """测试27: 响应压缩的编码协商、大小阈值、ETag后缀与304"""
+        print("\n🗜️ 测试27: 响应压缩")
+        
+        # 准备一个足够大的活动列表（超过1KB的压缩阈值）
+        admin_headers = self.get_auth_headers(user_id=1, role="admin")
+        tag = f"compress{int(time.time())}"
+        for i in range(5):
+            response = self.session.post(f"{BASE_URL}/activities", headers=admin_headers, json={
+                "title": f"压缩测试活动{i}",
+                "description": "活动介绍。" * 60,
+                "startTime": (datetime.utcnow() + timedelta(days=6)).isoformat() + 'Z',
+                "location": "报告厅",
+                "club_id": 1,
+                "tags": [tag]
+            })
+            self.assertEqual(response.status_code, 201)
+        path = f"{BASE_URL}/activities?limit=50&tag={tag}"
+        
+        response = self.session.get(path, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(response.content), 1024)
+        self.assertEqual(response.headers.get('Content-Encoding'), 'gzip')
+        self.assertIn('Accept-Encoding', response.headers.get('Vary', ''))
+        gzip_etag = response.headers['ETag']
+        self.assertTrue(gzip_etag.endswith('-gzip"'))
+        self.assertEqual(response.json()['code'], 200)
+        print("   ✅ 接受gzip时压缩，ETag带编码后缀，Vary包含Accept-Encoding")
+        
+        response = self.session.get(path, headers={"Accept-Encoding": "br"})
+        if response.headers.get('Content-Encoding') == 'br':
+            self.assertTrue(response.headers['ETag'].endswith('-br"'))
+        else:
+            # 服务端未安装brotli时不压缩
+            self.assertNotIn('Content-Encoding', response.headers)
+        
+        response = self.session.get(path, headers={"Accept-Encoding": "identity"})
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertIn('Accept-Encoding', response.headers.get('Vary', ''))
+        identity_etag = response.headers['ETag']
+        self.assertEqual(identity_etag, gzip_etag.replace('-gzip"', '"'))
+        print("   ✅ 不接受压缩时返回原文")
+        
+        response = self.session.get(f"{BASE_URL.rsplit('/v1', 1)[0]}/health", headers={"Accept-Encoding": "gzip"})
+        self.assertLess(len(response.content), 1024)
+        self.assertNotIn('Content-Encoding', response.headers)
+        print("   ✅ 小于阈值的响应不压缩")
+        
+        response = self.session.get(path, headers={"Accept-Encoding": "gzip", "If-None-Match": gzip_etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers.get('ETag'), gzip_etag)
+        response = self.session.get(path, headers={"Accept-Encoding": "identity", "If-None-Match": identity_etag})
+        self.assertEqual(response.status_code, 304)
+        print("   ✅ 带编码后缀的ETag同样返回304")
+    
+    def test_28_waitlist_promotion(self):
+        """测试28: 候补递补以候补记录为准，计数漂移时不占用空名额（内存数据库，离线）"""
+        print("\n🪑 测试28: 候补递补")
+        from flask import Flask
+        from models import db, User, Club, Activity, Registration
+        
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://')
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            users = [User(username=f'waitlist_{i}', student_id=53000000 + i) for i in range(3)]
+            for user in users:
+                user.set_password('password123')
+            db.session.add_all(users)
+            db.session.flush()
+            club = Club(name='候补社', manager_id=users[0].id)
+            db.session.add(club)
+            db.session.flush()
+            activity = Activity(title='候补活动', club_id=club.id, creator_id=users[0].id, max_participants=2,
+                                start_time=datetime.utcnow() + timedelta(days=1), location='操场')
+            drifted = Activity(title='计数漂移活动', club_id=club.id, creator_id=users[0].id, max_participants=1,
+                               start_time=datetime.utcnow() + timedelta(days=1), location='操场')
+            db.session.add_all([activity, drifted])
+            db.session.flush()
+            db.session.add_all([
+                Registration(user_id=users[0].id, activity_id=activity.id, status='approved'),
+                Registration(user_id=users[1].id, activity_id=activity.id, status='waitlisted', waitlist_position=1),
+                Registration(user_id=users[2].id, activity_id=activity.id, status='waitlisted', waitlist_position=2)
+            ])
+            db.session.commit()
+            Activity.recount_registrations()
+            
+            self.assertEqual(Activity.promote_waitlist(activity.id), 1)
+            db.session.commit()
+            statuses = dict(db.session.query(Registration.user_id, Registration.status)
+                            .filter_by(activity_id=activity.id))
+            self.assertEqual(statuses, {users[0].id: 'approved', users[1].id: 'approved', users[2].id: 'waitlisted'})
+            db.session.refresh(activity)
+            self.assertEqual((activity.approved_count, activity.waitlisted_count), (2, 1))
+            print("   ✅ 空出名额后候补队首递补，计数同步变化")
+            
+            # 候补计数漂移（没有候补记录却大于0）时不递补，也不占掉名额
+            drifted.waitlisted_count = 1
+            db.session.commit()
+            self.assertEqual(Activity.promote_waitlist(drifted.id), 0)
+            db.session.commit()
+            db.session.refresh(drifted)
+            self.assertEqual((drifted.approved_count, drifted.waitlisted_count), (0, 0))
+            print("   ✅ 计数漂移时没有空占名额，候补计数被校正")
+            db.session.remove()
+    
+    def test_29_search_index(self):
+        """测试29: 全文索引的分词、查询构造、随业务表同步与关键词筛选（内存数据库，离线）"""
+        print("\n🔎 测试29: 全文索引")
+        from flask import Flask
+        from models import db, User, Club, Activity
+        from utils import search_index
+        
+        # 中文按二元组切分并补上末字，其他按单词小写
+        self.assertEqual(search_index.index_tokens('打篮球 Basketball赛2024'),
+                         ['打篮', '篮球', '球', 'basketball', '赛', '2024'])
+        self.assertEqual(search_index.index_tokens(None), [])
+        self.assertEqual(search_index.build_match_query('篮球赛'), '"篮球 球赛"')
+        self.assertEqual(search_index.build_match_query('球 ball'), '"球"* "ball"*')
+        # 中英混合的词与索引中的词序一致，中文段之后带上末字
+        self.assertEqual(search_index.build_match_query('Python讲座'), '"python 讲座"')
+        self.assertEqual(search_index.build_match_query('测试2024'), '"测试 试 2024"')
+        # 引号与 FTS5 运算符不会改变查询结构
+        self.assertEqual(search_index.build_match_query('say "hi"'), '"say"* "hi"*')
+        self.assertEqual(search_index.build_match_query('a"b OR c*'), '"a b" "or"* "c"*')
+        self.assertIsNone(search_index.build_match_query(' "" '))
+        print("   ✅ 分词与MATCH表达式构造正确")
+        
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://')
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+        search_index.init_app(app)
+        with app.app_context():
+            if not search_index.is_enabled():
+                self.skipTest("当前SQLite不支持FTS5")
+            user = User(username='search_owner', student_id=54000000)
+            user.set_password('password123')
+            db.session.add(user)
+            db.session.flush()
+            club = Club(name='检索社', manager_id=user.id)
+            db.session.add(club)
+            db.session.flush()
+            
+            def activity(title, description=''):
+                item = Activity(title=title, description=description, club_id=club.id, creator_id=user.id,
+                                start_time=datetime.utcnow() + timedelta(days=1), location='校园')
+                db.session.add(item)
+                db.session.commit()
+                return item
+            
+            def search(keyword):
+                return [hit_id for hit_id, _ in search_index.search('activity', keyword)]
+            
+            def matched(keyword):
+                query = Activity.query.filter(search_index.match_clause('activity', keyword))
+                return sorted(item.id for item in query)
+            
+            basketball = activity('篮球友谊赛2024', 'Basketball match')
+            lecture = activity('编程讲座', 'Python入门')
+            self.assertEqual(search('篮球'), [basketball.id])
+            self.assertEqual(search('球'), [basketball.id])
+            self.assertEqual(search('友谊赛2024'), [basketball.id])
+            self.assertEqual(search('python入门'), [lecture.id])
+            print("   ✅ 新增的记录写入索引，中文、中英混合都能命中")
+            
+            # 关键词筛选保持子串语义：英文、数字用 LIKE，/search 的英文按词前缀匹配
+            self.assertEqual(matched('ball'), [basketball.id])
+            self.assertEqual(matched('ASKET'), [basketball.id])
+            self.assertEqual(search('ball'), [])
+            self.assertEqual(search('bask'), [basketball.id])
+            self.assertEqual(matched('讲座 python'), [lecture.id])
+            self.assertEqual(matched('篮球 python'), [])
+            print("   ✅ 关键词筛选按子串匹配，多个词之间为AND")
+            
+            basketball.title = '排球友谊赛'
+            db.session.commit()
+            self.assertEqual(search('篮球'), [])
+            self.assertEqual(search('排球'), [basketball.id])
+            db.session.delete(lecture)
+            db.session.commit()
+            self.assertEqual(search('编程'), [])
+            db.session.add(Activity(title='滑雪体验', club_id=club.id, creator_id=user.id,
+                                    start_time=datetime.utcnow(), location='雪场'))
+            db.session.flush()
+            db.session.rollback()
+            self.assertEqual(search('滑雪'), [])
+            print("   ✅ 修改、删除与回滚后索引与业务表一致")
+            
+            # 标题权重高于描述
+            in_description = activity('户外活动', '周末徒步')
+            in_title = activity('周末徒步', '户外活动')
+            self.assertEqual(search('徒步'), [in_title.id, in_description.id])
+            print("   ✅ 按BM25相关度排序，标题命中优先")
+            db.session.remove()
+    
+    def test_30_search_api(self):
+        """测试30: 全文搜索接口的排序、高亮与参数校验"""
+        print("\n🔍 测试30: 全文搜索")
+        
+        timestamp = int(time.time())
+        admin_headers = self.get_auth_headers(user_id=1, role="admin")
+        title = f"全文检索测试{timestamp}"
+        response = self.session.post(f"{BASE_URL}/activities", headers=admin_headers, json={
+            "title": title,
+            "description": f"Basketball training {timestamp}",
+            "startTime": (datetime.utcnow() + timedelta(days=3)).isoformat() + 'Z',
+            "location": "体育馆",
+            "club_id": 2
+        })
+        self.assertEqual(response.status_code, 201)
+        activity_id = response.json()['data']['activity_id']
+        
+        response = self.session.get(f"{BASE_URL}/search", params={"q": title})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['data']['results']
+        self.assertEqual(results[0]['activity_id'], activity_id)
+        self.assertEqual(results[0]['highlight']['title'], f"<em>{title}</em>")
+        self.assertIn('score', results[0])
+        print("   ✅ 中英混合的标题可以检索，命中词被高亮")
+        
+        response = self.session.get(f"{BASE_URL}/search", params={"q": f"basketball {timestamp}"})
+        self.assertIn(activity_id, [item['activity_id'] for item in response.json()['data']['results']])
+        self.assertIn('<em>Basketball</em>', response.json()['data']['results'][0]['highlight']['description'])
+        # 列表接口的关键词筛选仍按子串匹配
+        response = self.session.get(f"{BASE_URL}/activities", params={"keyword": f"asketball training {timestamp}"})
+        self.assertEqual([item['activity_id'] for item in response.json()['data']['activities']], [activity_id])
+        print("   ✅ 英文按词检索，列表接口的关键词筛选按子串匹配")
+        
+        response = self.session.get(f"{BASE_URL}/search", params={"q": "算法", "type": "club"})
+        results = response.json()['data']['results']
+        self.assertTrue(results)
+        self.assertIn('<em>算法</em>', results[0]['highlight']['name'])
+        print("   ✅ 搜索社团")
+        
+        self.assertEqual(self.session.get(f"{BASE_URL}/search").status_code, 400)
+        self.assertEqual(self.session.get(f"{BASE_URL}/search", params={"q": "篮球", "type": "user"}).status_code, 400)
+        print("   ✅ 缺少关键词或类型错误返回400")
+    
+    def test_31_principal_cache(self):
+        """测试31: 认证用户缓存在用户删除、角色变更时失效，strict 模式不走缓存"""
+        print("\n🪪 测试31: 认证用户缓存")
+        from flask import Flask, g as flask_g
+        from sqlalchemy import text
+        from models import db, User
+        from middleware.auth import token_required, generate_token
+        from middleware.principal_cache import principal_cache
+        
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://')
+        db.init_app(app)
+        
+        @app.route('/whoami')
+        @token_required
+        def whoami():
+            return {'user_id': flask_g.user_id, 'role': flask_g.user_role}
+        
+        client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            for mode in ('cached', 'strict'):
+                app.config['AUTH_PRINCIPAL_CHECK'] = mode
+                principal_cache.clear()
+                user = User(username=f'principal_{mode}', student_id=55000000 + len(mode))
+                user.set_password('password123')
+                db.session.add(user)
+                db.session.commit()
+                # Token 中的角色与数据库不同：以数据库中的当前角色为准
+                headers = {'Authorization': f'Bearer {generate_token(user.id, "admin")}'}
+                
+                stats = principal_cache.stats()
+                self.assertEqual(client.get('/whoami', headers=headers).json['role'], 'student')
+                self.assertEqual(client.get('/whoami', headers=headers).json['role'], 'student')
+                after = principal_cache.stats()
+                if mode == 'cached':
+                    self.assertEqual((after['misses'] - stats['misses'], after['hits'] - stats['hits']), (1, 1))
+                else:
+                    self.assertEqual((after['misses'], after['hits'], after['size']),
+                                     (stats['misses'], stats['hits'], 0))
+                
+                # 通过 ORM 变更角色：缓存立即失效
+                user.role = 'admin'
+                db.session.commit()
+                self.assertEqual(client.get('/whoami', headers=headers).json['role'], 'admin')
+                
+                # 绕过 ORM 的修改不触发失效：cached 模式在 TTL 内仍返回缓存的角色，strict 模式每次查库
+                db.session.execute(text("UPDATE users SET role = 'student' WHERE id = :id"), {'id': user.id})
+                db.session.commit()
+                expected = 'admin' if mode == 'cached' else 'student'
+                self.assertEqual(client.get('/whoami', headers=headers).json['role'], expected)
+                
+                db.session.delete(db.session.get(User, user.id))
+                db.session.commit()
+                response = client.get('/whoami', headers=headers)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response.json['message'], '用户不存在')
+                print(f"   ✅ {mode}模式: 角色变更立即生效，删除用户后Token失效")
+            principal_cache.clear()
+            db.session.remove()
+        
+        # 缓存统计只对管理员开放
+        self.assertEqual(self.session.get(f"{BASE_URL.replace('/v1', '')}/health/auth-cache").status_code, 401)
+        response = self.session.get(f"{BASE_URL.replace('/v1', '')}/health/auth-cache", headers=self.get_auth_headers(user_id=2))
+        self.assertEqual(response.status_code, 403)
+        response = self.session.get(f"{BASE_URL.replace('/v1', '')}/health/auth-cache", headers=self.get_auth_headers(user_id=1, role="admin"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hit_rate', response.json())
+        print("   ✅ 缓存统计需要管理员身份")
+    
+    def test_32_response_cache(self):
+        """测试32: 响应缓存的命中、标签失效与TTL过期（Redis替身与内存后端，离线），以及写操作后的失效"""
+        print("\n🗄️ 测试32: 响应缓存")
+        from flask import Flask, request as flask_request
+        from utils import response_cache
+        from utils.fake_redis import FakeRedis
+        
+        now = [1000.0]
+        redis_client = FakeRedis(clock=lambda: now[0])
+        clients = {}
+        for backend in ('redis', 'memory'):
+            app = Flask(__name__)
+            app.config.update(RESPONSE_CACHE_BACKEND=backend)
+            response_cache.init_app(app, redis_client=redis_client if backend == 'redis' else None)
+            expected = response_cache.RedisBackend if backend == 'redis' else response_cache.MemoryBackend
+            self.assertIsInstance(app.extensions['response_cache'].backend, expected)
+            calls = []
+            
+            @app.route('/items')
+            @response_cache.cached_response(tags=['items'], ttl=30)
+            def items():
+                calls.append(flask_request.args.get('page'))
+                if flask_request.args.get('page') == 'missing':
+                    return {'code': 404}, 404
+                return {'page': flask_request.args.get('page'), 'call': len(calls)}
+            
+            client = clients[backend] = app.test_client()
+            first = client.get('/items?page=1&size=2')
+            self.assertEqual(first.headers['X-Cache'], 'MISS')
+            # 查询参数顺序不同视为同一个缓存键
+            second = client.get('/items?size=2&page=1')
+            self.assertEqual(second.headers['X-Cache'], 'HIT')
+            self.assertEqual(second.json, first.json)
+            self.assertEqual(len(calls), 1)
+            
+            with app.app_context():
+                response_cache.invalidate('items')
+            third = client.get('/items?page=1&size=2')
+            self.assertEqual(third.headers['X-Cache'], 'MISS')
+            self.assertEqual(third.json['call'], 2)
+            self.assertEqual(client.get('/items?page=1&size=2').headers['X-Cache'], 'HIT')
+            with app.app_context():
+                response_cache.invalidate('other')
+            self.assertEqual(client.get('/items?page=1&size=2').headers['X-Cache'], 'HIT')
+            
+            # 非200响应不缓存
+            client.get('/items?page=missing')
+            client.get('/items?page=missing')
+            self.assertEqual(calls.count('missing'), 2)
+            print(f"   ✅ {backend}后端: 命中、按标签失效、非200不缓存")
+        
+        # 标签版本与缓存项存放在 Redis 中，TTL 到期后重新计算
+        self.assertEqual(redis_client.get('response_cache:tag:items'), b'1')
+        now[0] += 31
+        self.assertEqual(clients['redis'].get('/items?page=1&size=2').headers['X-Cache'], 'MISS')
+        print("   ✅ Redis后端: TTL到期后重新计算")
+        
+        # 在线：写操作提交后相关接口的缓存失效
+        admin_headers = self.get_auth_headers(user_id=1, role="admin")
+        self.session.get(f"{BASE_URL}/activities/latest")
+        self.assertEqual(self.session.get(f"{BASE_URL}/activities/latest").headers.get('X-Cache'), 'HIT')
+        title = f"缓存失效测试{int(time.time())}"
+        response = self.session.post(f"{BASE_URL}/activities", headers=admin_headers, json={
+            "title": title,
+            "startTime": (datetime.utcnow() + timedelta(days=2)).isoformat() + 'Z',
+            "location": "礼堂",
+            "club_id": 3
+        })
+        self.assertEqual(response.status_code, 201)
+        activity_id = response.json()['data']['activity_id']
+        response = self.session.get(f"{BASE_URL}/activities/latest")
+        self.assertEqual(response.headers.get('X-Cache'), 'MISS')
+        self.assertEqual(response.json()['data']['activities'][0]['title'], title)
+        print("   ✅ 创建活动后最新活动列表的缓存失效")
+        
+        self.session.get(f"{BASE_URL}/activities/{activity_id}")
+        response = self.session.get(f"{BASE_URL}/activities/{activity_id}")
+        self.assertEqual(response.headers.get('X-Cache'), 'HIT')
+        before = response.json()['data']['currentParticipants']
+        self.session.post(f"{BASE_URL}/activities/{activity_id}/register",
+                          headers=self.get_auth_headers(user_id=2), json={})
+        response = self.session.get(f"{BASE_URL}/activities/{activity_id}")
+        self.assertEqual(response.headers.get('X-Cache'), 'MISS')
+        self.assertEqual(response.json()['data']['currentParticipants'], before + 1)
+        print("   ✅ 报名后活动详情的缓存失效")
+        
+        def member_count():
+            response = self.session.get(f"{BASE_URL}/clubs", params={"limit": 50})
+            return response, {club['club_id']: club['member_count'] for club in response.json()['data']['clubs']}[3]
+        
+        user_headers = self.get_auth_headers(user_id=2)
+        self.session.delete(f"{BASE_URL}/clubs/3/follow", headers=user_headers)
+        member_count()
+        response, before = member_count()
+        self.assertEqual(response.headers.get('X-Cache'), 'HIT')
+        self.assertEqual(self.session.post(f"{BASE_URL}/clubs/3/follow", headers=user_headers).status_code, 200)
+        response, after = member_count()
+        self.assertEqual(response.headers.get('X-Cache'), 'MISS')
+        self.assertEqual(after, before + 1)
+        self.session.delete(f"{BASE_URL}/clubs/3/follow", headers=user_headers)
+        print("   ✅ 关注后社团列表的缓存失效")
+    
+    def test_33_cursor_pagination(self):
+        """测试33: 活动、社团与关注社团列表的游标分页往返（无重复、无遗漏）与参数校验"""
+        print("\n📑 测试33: 游标分页")
+        import base64
+        
+        timestamp = int(time.time())
+        admin_headers = self.get_auth_headers(user_id=1, role="admin")
+        
+        def walk(path, name, limit, headers=None, **params):
+            """从第一页沿 next_cursor 翻到最后一页，返回每页的条目"""
+            pages, cursor = [], ''
+            while True:
+                response = self.session.get(f"{BASE_URL}{path}", headers=headers,
+                                            params=dict(params, cursor=cursor, limit=limit))
+                self.assertEqual(response.status_code, 200)
+                data = response.json()['data']
+                self.assertLessEqual(len(data[name]), limit)
+                pages.append(data[name])
+                self.assertEqual(data['has_more'], data['next_cursor'] is not None)
+                if not data['has_more']:
+                    return pages
+                cursor = data['next_cursor']
+        
+        # 活动：按 (开始时间, id) 升序，开始时间相同的按 id 区分
+        tag = f"cursor{timestamp}"
+        start = datetime.utcnow().replace(microsecond=0) + timedelta(days=8)
+        created = []
+        for offset in (2, 0, 1, 0, 0):
+            response = self.session.post(f"{BASE_URL}/activities", headers=admin_headers, json={
+                "title": f"游标分页活动{offset}",
+                "startTime": (start + timedelta(days=offset)).isoformat() + 'Z',
+                "location": "教学楼",
+                "club_id": 1,
+                "tags": [tag]
+            })
+            self.assertEqual(response.status_code, 201)
+            created.append((offset, response.json()['data']['activity_id']))
+        pages = walk("/activities", "activities", 2, tag=tag)
+        ids = [item['activity_id'] for page in pages for item in page]
+        self.assertEqual(ids, [activity_id for _, activity_id in sorted(created)])
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        response = self.session.get(f"{BASE_URL}/activities",
+                                    params={"tag": tag, "cursor": "", "limit": 2, "include_total": 1})
+        self.assertEqual(response.json()['data']['total'], 5)
+        print("   ✅ 活动列表逐页翻完，顺序与条数正确")
+        
+        # 社团：按 (创建时间, id) 倒序，与页码分页的结果一致
+        response = self.session.get(f"{BASE_URL}/clubs", params={"limit": 100})
+        expected = {club['club_id'] for club in response.json()['data']['clubs']}
+        ids = [club['club_id'] for page in walk("/clubs", "clubs", 1) for club in page]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), expected)
+        print("   ✅ 社团列表逐页翻完，无重复、无遗漏")
+        
+        # 关注的社团：按关注时间倒序
+        response = self.session.post(f"{BASE_URL}/auth/register", json={
+            "username": f"cursor_{timestamp}",
+            "password": "password123",
+            "student_id": 56000000 + timestamp % 1000000
+        })
+        headers = {"Authorization": f"Bearer {response.json()['data']['token']}"}
+        for club_id in (2, 3, 1):
+            self.assertEqual(self.session.post(f"{BASE_URL}/clubs/{club_id}/follow", headers=headers).status_code, 200)
+        pages = walk("/user/followed-clubs", "clubs", 2, headers=headers)
+        self.assertEqual([club['club_id'] for page in pages for club in page], [1, 3, 2])
+        self.assertTrue(all(club['is_followed'] for page in pages for club in page))
+        print("   ✅ 关注的社团按关注时间倒序翻页")
+        
+        # 无效的游标与超出范围的分页大小返回400
+        forged = base64.urlsafe_b64encode(json.dumps([start.isoformat(), {"id": 1}]).encode()).decode()
+        for path, request_headers in (("/activities", None), ("/clubs", None), ("/user/followed-clubs", headers)):
+            for params in ({"cursor": "not-a-cursor"}, {"cursor": "WzFd"}, {"cursor": forged},
+                           {"cursor": "", "limit": 0}, {"cursor": "", "limit": 101}):
+                response = self.session.get(f"{BASE_URL}{path}", headers=request_headers, params=params)
+                self.assertEqual(response.status_code, 400, (path, params, response.text))
+        print("   ✅ 无效游标与超出范围的limit返回400")
+    
+    def test_34_tag_index(self):
+        """测试34: 标签计数随活动发布、修改、删除增量维护，与全量重建一致（内存数据库，离线）"""
+        print("\n🏷️ 测试34: 标签分面计数")
+        from types import SimpleNamespace
+        from flask import Flask
+        from models import db, User, Club, Activity, TagDayCount
+        from utils import tag_index
+        
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://')
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            user = User(username='tag_owner', student_id=55000000)
+            user.set_password('password123')
+            db.session.add(user)
+            db.session.flush()
+            club = Club(name='标签社', manager_id=user.id)
+            db.session.add(club)
+            db.session.commit()
+            day = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0) + timedelta(days=3)
+            
+            def counts():
+                return {(row.tag, row.day): row.count for row in TagDayCount.query if row.count}
+            
+            # 同一天同标签的多个活动在一次 flush 中写入同一计数行
+            activities = [Activity(title=f'标签活动{i}', club_id=club.id, creator_id=user.id, start_time=day,
+                                   location='校园', tags=tags)
+                          for i, tags in enumerate(['篮球,比赛', '篮球', '摄影'])]
+            db.session.add_all(activities)
+            db.session.commit()
+            self.assertEqual(counts(), {('篮球', day.date()): 2, ('比赛', day.date()): 1, ('摄影', day.date()): 1})
+            
+            activities[1].tags = '篮球,摄影'
+            activities[2].status = 'draft'
+            db.session.commit()
+            activities[0].start_time = day + timedelta(days=1)
+            db.session.commit()
+            db.session.delete(activities[1])
+            db.session.commit()
+            incremental = counts()
+            self.assertEqual(incremental, {('篮球', (day + timedelta(days=1)).date()): 1,
+                                           ('比赛', (day + timedelta(days=1)).date()): 1})
+            tag_index.rebuild()
+            self.assertEqual(counts(), incremental)
+            print("   ✅ 增量计数与全量重建一致")
+            
+            # 不支持 upsert 的数据库逐行先更新、未命中再插入
+            connection = db.session.connection()
+            other = SimpleNamespace(dialect=SimpleNamespace(name='mysql'), execute=connection.execute)
+            tag_index._apply_counts(other, {('篮球', day.date()), ('比赛', (day + timedelta(days=1)).date())}, 1)
+            self.assertEqual(counts(), {('篮球', day.date()): 1, ('篮球', (day + timedelta(days=1)).date()): 1,
+                                        ('比赛', (day + timedelta(days=1)).date()): 2})
+            db.session.rollback()
+            print("   ✅ 其他数据库的逐行更新路径计数正确")
+            db.session.remove()
+    
+    def test_35_registration_counters(self):
+        """测试35: 报名、取消、审核后计数列与报名记录一致，recount-registrations 命令修复漂移的计数（离线）"""
+        print("\n🔢 测试35: 报名计数")
+        import subprocess
+        import tempfile
+        from flask import Flask
+        from models import db, User, Activity, Registration
+        from controllers.registration_controller import registration_bp
+        from middleware.auth import generate_token
+        
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        os.remove(path)
+        
+        def recount(*args):
+            # 与命令行一致：flask --app app recount-registrations，首次运行同时建表并写入默认数据
+            result = subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'recount-registrations', *args],
+                                    cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True,
+                                    env=dict(os.environ, DATABASE_URL=f'sqlite:///{path}'), timeout=120)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            return result.stdout
+        
+        recount()
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI=f'sqlite:///{path}')
+        db.init_app(app)
+        app.register_blueprint(registration_bp, url_prefix='/v1')
+        client = app.test_client()
+        
+        def actual(activity_id):
+            rows = db.session.query(Registration.status, db.func.count(Registration.id)) \
+                .filter_by(activity_id=activity_id).group_by(Registration.status)
+            counts = dict(rows)
+            return {status: counts.get(status, 0) for status in Activity.COUNTED_STATUSES}
+        
+        def counters(activity_id):
+            db.session.expire_all()
+            activity = db.session.get(Activity, activity_id)
+            return {status: getattr(activity, f'{status}_count') for status in Activity.COUNTED_STATUSES}
+        
+        def headers(user_id):
+            return {"Authorization": f"Bearer {generate_token(user_id)}"}
+        
+        try:
+            with app.app_context():
+                admin = User.query.filter_by(role='admin').first()
+                users = [User(username=f'counter_{i}', student_id=56000000 + i) for i in range(4)]
+                for user in users:
+                    user.set_password('password123')
+                db.session.add_all(users)
+                db.session.flush()
+                activity = Activity(title='计数测试活动', club_id=1, creator_id=admin.id, location='校园',
+                                    start_time=datetime.utcnow() + timedelta(days=3), max_participants=2)
+                db.session.add(activity)
+                db.session.commit()
+                activity_id, user_ids = activity.id, [user.id for user in users]
+                
+                # 两人报名成功，后两人进入候补
+                for user_id in user_ids:
+                    response = client.post(f'/v1/activities/{activity_id}/register', headers=headers(user_id),
+                                           json={})
+                    self.assertEqual(response.status_code, 200)
+                self.assertEqual(counters(activity_id), {'approved': 2, 'pending': 0, 'waitlisted': 2})
+                self.assertEqual(counters(activity_id), actual(activity_id))
+                
+                # 候补取消报名；拒绝已通过的报名空出名额由候补递补，满员时不能改回通过
+                response = client.delete(f'/v1/activities/{activity_id}/register', headers=headers(user_ids[3]))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(counters(activity_id), {'approved': 2, 'pending': 0, 'waitlisted': 1})
+                self.assertEqual(counters(activity_id), actual(activity_id))
+                
+                def review(user_id, status):
+                    return client.put(f'/v1/activities/{activity_id}/participants/{user_id}',
+                                      headers=headers(admin.id), json={"status": status}).status_code
+                
+                self.assertEqual(review(user_ids[0], 'rejected'), 200)
+                self.assertEqual(counters(activity_id), {'approved': 2, 'pending': 0, 'waitlisted': 0})
+                self.assertEqual(counters(activity_id), actual(activity_id))
+                self.assertEqual(review(user_ids[0], 'approved'), 400)
+                self.assertEqual(counters(activity_id), actual(activity_id))
+                
+                # 再拒绝一人空出名额后，已拒绝的报名可以重新通过
+                self.assertEqual(review(user_ids[1], 'rejected'), 200)
+                self.assertEqual(counters(activity_id), {'approved': 1, 'pending': 0, 'waitlisted': 0})
+                self.assertEqual(review(user_ids[0], 'approved'), 200)
+                self.assertEqual(counters(activity_id), {'approved': 2, 'pending': 0, 'waitlisted': 0})
+                self.assertEqual(counters(activity_id), actual(activity_id))
+                print("   ✅ 报名、取消、审核后计数与报名记录一致")
+                
+                # 人为制造漂移：--activity-id 只修复指定活动，不带参数修复全部
+                activity_ids = [row[0] for row in db.session.query(Activity.id)]
+                drifted = {'approved_count': 7, 'pending_count': 3, 'waitlisted_count': 5}
+                Activity.query.update(drifted, synchronize_session=False)
+                db.session.commit()
+                db.session.remove()
+                
+                self.assertIn('1 个活动', recount('--activity-id', str(activity_id)))
+                self.assertEqual(counters(activity_id), actual(activity_id))
+                others = [other_id for other_id in activity_ids if other_id != activity_id]
+                for other_id in others:
+                    self.assertEqual(counters(other_id), {'approved': 7, 'pending': 3, 'waitlisted': 5})
+                db.session.remove()
+                
+                self.assertIn(f'{len(activity_ids)} 个活动', recount())
+                for other_id in activity_ids:
+                    self.assertEqual(counters(other_id), actual(other_id))
+                print("   ✅ recount-registrations 修复了漂移的计数")
+                db.session.remove()
+        finally:
+            os.remove(path)
+    
+    def test_36_activity_serialization(self):
+        """测试36: 活动批量序列化与逐条序列化（原实现）输出一致且查询次数固定（内存数据库，离线）"""
+        print("\n🧾 测试36: 活动批量序列化")
+        from flask import Flask
+        from sqlalchemy import event
+        from models import db, User, Club, Activity, Registration
+        from utils.fieldsets import FieldSet
+        from utils.tags import split_tags
+        
+        def iso(value):
+            return value.isoformat() + 'Z' if value else None
+        
+        def reference(activity, with_club_info=True, user_id=None):
+            """逐条查询的原实现，作为批量版本的对照"""
+            approved = Registration.query.filter_by(activity_id=activity.id, status='approved').count()
+            data = {
+                'activity_id': activity.id,
+                'activityId': f"act_{activity.id:03d}",
+                'title': activity.title,
+                'description': activity.description or '',
+                'startTime': iso(activity.start_time),
+                'endTime': iso(activity.end_time),
+                'location': activity.location,
+                'maxParticipants': activity.max_participants,
+                'currentParticipants': approved,
+                'status': activity.status,
+                'registration_end_time': iso(activity.registration_end_time),
+                'contact_info': activity.contact_info or '',
+                'tags': split_tags(activity.tags),
+                'created_at': iso(activity.created_at)
+            }
+            if with_club_info and activity.club:
+                data['clubInfo'] = {'clubId': f"club_{activity.club.id:03d}", 'club_id': activity.club.id,
+                                    'name': activity.club.name}
+            if user_id:
+                registration = Registration.query.filter_by(user_id=user_id, activity_id=activity.id).first()
+                data['isRegistered'] = registration is not None
+                data['registrationStatus'] = registration.status if registration else 'none'
+                data['canRegister'] = (approved < activity.max_participants) if activity.max_participants > 0 else True
+            return data
+        
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://')
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            users = [User(username=f'serialize_{i}', student_id=57000000 + i) for i in range(4)]
+            for user in users:
+                user.set_password('password123')
+            db.session.add_all(users)
+            db.session.flush()
+            viewer = users[1]
+            clubs = [Club(name=f'序列化社团{i}', manager_id=users[0].id) for i in range(2)]
+            db.session.add_all(clubs)
+            db.session.flush()
+            
+            start = datetime(2030, 5, 1, 9, 0)
+            activities = [
+                Activity(title=f'序列化活动{i}', club_id=clubs[i % 2].id, creator_id=users[0].id,
+                         start_time=start + timedelta(days=i), location='校园',
+                         end_time=start + timedelta(days=i, hours=2) if i % 2 else None,
+                         description='活动介绍' if i % 3 else None, max_participants=(0, 2, 3)[i % 3],
+                         registration_end_time=start if i == 4 else None, contact_info='13800000000' if i == 2 else None,
+                         tags=(None, '篮球,比赛', ' 摄影 ,, 摄影')[i % 3], status='draft' if i == 5 else 'published')
+                for i in range(6)
+            ]
+            db.session.add_all(activities)
+            db.session.flush()
+            registrations = [(viewer, 0, 'approved'), (viewer, 1, 'pending'), (viewer, 2, 'waitlisted'),
+                             (viewer, 3, 'rejected'), (users[2], 1, 'approved'), (users[3], 1, 'approved'),
+                             (users[2], 4, 'approved')]
+            db.session.add_all(Registration(user_id=user.id, activity_id=activities[index].id, status=status)
+                               for user, index, status in registrations)
+            db.session.commit()
+            Activity.recount_registrations()
+            
+            activities = Activity.query.order_by(Activity.id).all()
+            for user_id in (None, viewer.id):
+                for with_club_info in (True, False):
+                    batch = Activity.to_dict_list(activities, with_club_info=with_club_info, user_id=user_id)
+                    self.assertEqual(batch, [reference(activity, with_club_info, user_id) for activity in activities])
+                    self.assertEqual(batch, [activity.to_dict(with_club_info=with_club_info, user_id=user_id)
+                                             for activity in activities])
+            print("   ✅ 批量输出与逐条查询的原实现一致")
+            
+            # 稀疏字段集只是按字段裁剪完整输出
+            for fields in (FieldSet(['title', 'clubInfo', 'isRegistered']), FieldSet(exclude=['clubInfo', 'canRegister'])):
+                batch = Activity.to_dict_list(activities, user_id=viewer.id, fields=fields)
+                self.assertEqual(batch, [{name: value for name, value in reference(activity, True, viewer.id).items()
+                                          if fields.wants(name)} for activity in activities])
+            
+            # 查询次数与活动数量无关：社团与当前用户的报名各一次
+            statements = []
+            
+            def record(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+            
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                Activity.to_dict_list(activities, user_id=viewer.id)
+                self.assertEqual(len(statements), 2)
+                statements.clear()
+                Activity.to_dict_list(activities, with_club_info=False, fields=FieldSet(['title']))
+                self.assertEqual(statements, [])
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+            print("   ✅ 整页只需固定次数的查询，未请求的字段不触发查询")
+            db.session.remove()
+    
+    def test_37_club_serialization(self):
+        """测试37: 社团批量序列化与逐条序列化（原实现）输出一致且查询次数固定（内存数据库，离线）"""
+        print("\n🧾 测试37: 社团批量序列化")
+        from flask import Flask
+        from sqlalchemy import event
+        from models import db, User, Club, Activity, Registration, Follow
+        from utils.fieldsets import FieldSet
+        from utils.tags import split_tags
+        
+        def iso(value):
+            return value.isoformat() + 'Z' if value else None
+        
+        def reference(club, with_recent_activities=False, user_id=None):
+            """逐条查询的原实现，作为批量版本的对照"""
+            data = {
+                'club_id': club.id,
+                'name': club.name,
+                'description': club.description or '',
+                'type': club.type,
+                'contact': club.contact or '',
+                'logo': club.logo or '',
+                'manager_id': club.manager_id,
+                'created_at': iso(club.created_at),
+                'member_count': Follow.query.filter_by(club_id=club.id).count(),
+                'activity_count': club.activities.count()
+            }
+            if user_id:
+                data['is_followed'] = Follow.query.filter_by(user_id=user_id, club_id=club.id).first() is not None
+            if with_recent_activities:
+                data['recent_activities'] = [
+                    {
+                        'activity_id': activity.id,
+                        'title': activity.title,
+                        'start_time': iso(activity.start_time),
+                        'end_time': iso(activity.end_time),
+                        'tag': next(iter(split_tags(activity.tags)), ''),
+                        'participant_count': Registration.query.filter_by(activity_id=activity.id,
+                                                                          status='approved').count(),
+                        'max_participants': activity.max_participants
+                    }
+                    for activity in club.activities.order_by(Activity.start_time.desc()).limit(5)
+                ]
+            return data
+        
+        app = Flask(__name__)
+        app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://')
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            users = [User(username=f'club_serialize_{i}', student_id=58000000 + i) for i in range(5)]
+            for user in users:
+                user.set_password('password123')
+            db.session.add_all(users)
+            db.session.flush()
+            viewer = users[1]
+            clubs = [Club(name=f'序列化社团{i}', manager_id=users[0].id, description='社团介绍' if i % 2 else None,
+                          contact='13900000000' if i == 1 else None, logo='logo.png' if i == 2 else None)
+                     for i in range(4)]
+            db.session.add_all(clubs)
+            db.session.flush()
+            
+            # 第一个社团的活动多于近期活动的条数，最后一个社团没有活动
+            start = datetime(2030, 6, 1, 9, 0)
+            activities = [
+                Activity(title=f'社团活动{i}', club_id=clubs[club_index].id, creator_id=users[0].id,
+                         start_time=start + timedelta(days=(i * 5) % 11, hours=i), location='校园',
+                         end_time=start + timedelta(days=i) if i % 2 else None, max_participants=i % 4,
+                         tags=(None, '篮球,比赛', ' ,摄影')[i % 3])
+                for i, club_index in enumerate([0] * 7 + [1] * 2 + [2])
+            ]
+            db.session.add_all(activities)
+            db.session.flush()
+            db.session.add_all(Registration(user_id=user.id, activity_id=activity.id,
+                                            status=('approved', 'pending')[(user.id + activity.id) % 2])
+                               for user in users for activity in activities[::2])
+            db.session.add_all(Follow(user_id=user.id, club_id=club.id)
+                               for user, club in [(viewer, clubs[0]), (viewer, clubs[3]), (users[2], clubs[0]),
+                                                  (users[3], clubs[1])])
+            db.session.commit()
+            Activity.recount_registrations()
+            
+            clubs = Club.query.order_by(Club.id).all()
+            for user_id in (None, viewer.id):
+                for with_recent_activities in (True, False):
+                    batch = Club.to_dict_list(clubs, with_recent_activities=with_recent_activities, user_id=user_id)
+                    self.assertEqual(batch, [reference(club, with_recent_activities, user_id) for club in clubs])
+                    self.assertEqual(batch, [club.to_dict(with_recent_activities=with_recent_activities,
+                                                          user_id=user_id) for club in clubs])
+            self.assertEqual([len(data['recent_activities']) for data in Club.to_dict_list(clubs, True)], [5, 2, 1, 0])
+            print("   ✅ 批量输出与逐条查询的原实现一致")
+            
+            # 稀疏字段集只是按字段裁剪完整输出
+            for fields in (FieldSet(['name', 'member_count', 'is_followed']), FieldSet(exclude=['recent_activities'])):
+                batch = Club.to_dict_list(clubs, with_recent_activities=True, user_id=viewer.id, fields=fields)
+                self.assertEqual(batch, [{name: value for name, value in reference(club, True, viewer.id).items()
+                                          if fields.wants(name)} for club in clubs])
+            
+            # 查询次数与社团数量无关：计数、关注状态、近期活动各一次
+            statements = []
+            
+            def record(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+            
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                Club.to_dict_list(clubs, with_recent_activities=True, user_id=viewer.id)
+                self.assertEqual(len(statements), 3)
+                statements.clear()
+                Club.to_dict_list(clubs, with_recent_activities=True, user_id=viewer.id,
+                                  fields=FieldSet(['club_id', 'name']))
+                self.assertEqual(statements, [])
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+            print("   ✅ 整页只需固定次数的查询，未请求的字段不触发查询")
+            db.session.remove()
 
 
 def run_comprehensive_tests():
@@ -820,7 +2621,31 @@ def run_comprehensive_tests():
         'test_10_activity_management_admin',
         'test_11_error_handling_and_validation',
         'test_12_comprehensive_workflow',
-        'test_13_performance_and_load_testing'
+        'test_13_performance_and_load_testing',
+        'test_14_concurrent_registration_no_overbooking',
+        'test_15_conditional_get',
+        'test_16_batch_requests',
+        'test_17_user_feed',
+        'test_18_calendar_feed',
+        'test_19_extraction_jobs',
+        'test_20_article_fetcher_offline',
+        'test_21_webdriver_pool',
+        'test_22_extraction_cache',
+        'test_23_llm_client_limits',
+        'test_24_reminder_dispatcher',
+        'test_25_club_similarity',
+        'test_26_recommendations',
+        'test_27_response_compression',
+        'test_28_waitlist_promotion',
+        'test_29_search_index',
+        'test_30_search_api',
+        'test_31_principal_cache',
+        'test_32_response_cache',
+        'test_33_cursor_pagination',
+        'test_34_tag_index',
+        'test_35_registration_counters',
+        'test_36_activity_serialization',
+        'test_37_club_serialization'
     ]
     
     for method in test_methods:
@@ -863,14 +2688,22 @@ def run_comprehensive_tests():
     # 功能覆盖率统计
     print(f"\n📋 功能覆盖统计:")
     categories = {
-        "用户认证": ["test_02_user_registration", "test_03_user_login"],
-        "用户管理": ["test_04_user_profile_management"],
-        "社团管理": ["test_05_club_list_and_search", "test_06_club_detail_and_follow"],
+        "用户认证": ["test_02_user_registration", "test_03_user_login", "test_31_principal_cache"],
+        "用户管理": ["test_04_user_profile_management", "test_18_calendar_feed"],
+        "社团管理": ["test_05_club_list_and_search", "test_06_club_detail_and_follow", "test_17_user_feed",
+                 "test_25_club_similarity", "test_37_club_serialization"],
         "活动管理": ["test_07_latest_activities", "test_08_activity_list_with_filters", 
-                   "test_09_activity_detail_and_registration", "test_10_activity_management_admin"],
+                   "test_09_activity_detail_and_registration", "test_10_activity_management_admin",
+                   "test_26_recommendations", "test_29_search_index", "test_30_search_api",
+                   "test_34_tag_index", "test_35_registration_counters", "test_36_activity_serialization"],
         "错误处理": ["test_11_error_handling_and_validation"],
-        "业务流程": ["test_12_comprehensive_workflow"],
-        "性能测试": ["test_13_performance_and_load_testing"]
+        "文章提取": ["test_19_extraction_jobs", "test_20_article_fetcher_offline", "test_21_webdriver_pool",
+                 "test_22_extraction_cache", "test_23_llm_client_limits"],
+        "业务流程": ["test_12_comprehensive_workflow", "test_16_batch_requests", "test_24_reminder_dispatcher",
+                 "test_28_waitlist_promotion"],
+        "性能测试": ["test_13_performance_and_load_testing", "test_14_concurrent_registration_no_overbooking",
+                   "test_15_conditional_get", "test_27_response_compression", "test_32_response_cache",
+                   "test_33_cursor_pagination"]
     }
     
     passed_categories = 0
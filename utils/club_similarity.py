@@ -0,0 +1,206 @@
+import math
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Follow, ClubCoFollow, ClubSimilarity
+
+
+def init_app(app):
+    """首次启用时根据已有关注关系计算共同关注矩阵"""
+    with app.app_context():
+        initialized = db.session.query(ClubCoFollow.club_id).first() is not None
+        has_follows = db.session.query(Follow.id).first() is not None
+        if not initialized and has_follows:
+            try:
+                rebuild()
+                print("✅ 已计算社团共同关注矩阵")
+            except ImportError:
+                print("⚠️ 未安装numpy，相似社团需运行 flask rebuild-club-similarity 初始化")
+
+
+def rebuild(chunk_size=5000):
+    """用矩阵运算重建共同关注矩阵 C = XᵀX（X 为用户×社团关注矩阵）及所有 top-N 列表，返回社团数"""
+    import numpy as np  # 可选依赖，仅全量重建需要
+
+    follows = db.session.query(Follow.user_id, Follow.club_id).order_by(Follow.user_id).all()
+    club_ids = sorted({club_id for _, club_id in follows})
+    club_index = {club_id: i for i, club_id in enumerate(club_ids)}
+    user_index = {}
+    users = np.array([user_index.setdefault(user_id, len(user_index)) for user_id, _ in follows], dtype=np.int64)
+    clubs = np.array([club_index[club_id] for _, club_id in follows], dtype=np.int64)
+
+    # 按用户分块累加 XᵀX，内存只与 分块大小 × 社团数 有关
+    co = np.zeros((len(club_ids), len(club_ids)), dtype=np.int64)
+    for start in range(0, len(user_index), chunk_size):
+        lo, hi = np.searchsorted(users, [start, start + chunk_size])
+        block = np.zeros((chunk_size, len(club_ids)), dtype=np.float32)
+        block[users[lo:hi] - start, clubs[lo:hi]] = 1
+        co += np.rint(block.T @ block).astype(np.int64)
+
+    connection = db.session.connection()
+    connection.execute(ClubCoFollow.__table__.delete())
+    rows, columns = np.nonzero(co)
+    if len(rows):
+        connection.execute(ClubCoFollow.__table__.insert(), [
+            {'club_id': club_ids[i], 'other_club_id': club_ids[j], 'count': int(co[i, j])}
+            for i, j in zip(rows, columns)
+        ])
+
+    # 余弦相似度：C[i, j] / sqrt(C[i, i] * C[j, j])
+    top_n = current_app.config.get('SIMILAR_CLUBS_TOP_N', 10)
+    followers = np.sqrt(np.diag(co).astype(np.float64))
+    similarity = co / np.maximum(np.outer(followers, followers), 1)
+    np.fill_diagonal(similarity, 0)
+    rankings = {}
+    for i, club_id in enumerate(club_ids):
+        candidates = np.nonzero(similarity[i] > 0)[0]
+        best = candidates[np.argsort(-similarity[i, candidates], kind='stable')[:top_n]]
+        rankings[club_id] = [(club_ids[j], float(similarity[i, j]), int(co[i, j])) for j in best]
+
+    connection.execute(ClubSimilarity.__table__.delete())
+    _store(connection, rankings)
+    db.session.commit()
+    return len(club_ids)
+
+
+def _store(connection, rankings):
+    """写入 {club_id: [(similar_club_id, score, common_followers)]}（调用方负责先删除旧列表）"""
+    records = [
+        {'club_id': club_id, 'rank': rank, 'similar_club_id': other_id, 'score': score, 'common_followers': common}
+        for club_id, ranking in rankings.items()
+        for rank, (other_id, score, common) in enumerate(ranking)
+    ]
+    if records:
+        connection.execute(ClubSimilarity.__table__.insert(), records)
+
+
+def _apply(connection, user_id, club_id, delta):
+    """用户关注/取消关注一个社团后，调整该社团与用户所关注各社团的共同关注数"""
+    follows = Follow.__table__
+    others = [row[0] for row in connection.execute(
+        db.select(follows.c.club_id).where(follows.c.user_id == user_id, follows.c.club_id != club_id)
+    )]
+
+    pairs = [(club_id, club_id)] + [(club_id, other) for other in others] + [(other, club_id) for other in others]
+    table = ClubCoFollow.__table__
+    _increment(connection, pairs, delta)
+    if delta < 0:
+        connection.execute(table.delete().where(table.c.count <= 0))
+
+    _refresh(connection, club_id, others)
+
+
+def _increment(connection, pairs, delta):
+    """共同关注数加 delta，不存在的行新插入：SQLite/PostgreSQL 用一条 upsert，其他数据库逐行先更新、未命中再插入"""
+    table = ClubCoFollow.__table__
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+        statement = insert(table).values([
+            {'club_id': a, 'other_club_id': b, 'count': delta} for a, b in pairs
+        ])
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=['club_id', 'other_club_id'],
+            set_={'count': table.c.count + statement.excluded.count}
+        ))
+        return
+
+    for a, b in pairs:
+        updated = connection.execute(
+            table.update()
+            .where(table.c.club_id == a, table.c.other_club_id == b)
+            .values(count=table.c.count + delta)
+        ).rowcount
+        if not updated:
+            connection.execute(table.insert().values(club_id=a, other_club_id=b, count=delta))
+
+
+def _refresh(connection, club_id, others):
+    """关注人数变化后更新受影响的 top-N 列表，工作量只与该社团的共同关注社团数 × N 有关
+
+    该社团的关注人数变了，它自己的列表整体重算（只读它自己的一行共同关注数）；
+    其他社团的列表中只有与该社团的那一项变化，在已存的列表上调整这一项。
+    只有该社团在某个列表中下降到可能被列表外的社团超过、或离开已满的列表时，才整体重算那一个社团。
+    others 为本次共同关注数发生变化的社团（可能已降为0，不再出现在共同关注矩阵中）。
+    """
+    top_n = current_app.config.get('SIMILAR_CLUBS_TOP_N', 10)
+    own = _rankings(connection, [club_id])[club_id]
+    # 相似度对称：该社团在其他社团列表中的新分数
+    changed = {target: (club_id, score, common) for target, score, common in own}
+
+    similarities = ClubSimilarity.__table__
+    neighbours = set(changed) | set(others)
+    current = {neighbour: [] for neighbour in neighbours}
+    for row in connection.execute(
+        db.select(similarities.c.club_id, similarities.c.similar_club_id, similarities.c.score,
+                  similarities.c.common_followers)
+        .where(similarities.c.club_id.in_(neighbours))
+        .order_by(similarities.c.club_id, similarities.c.rank)
+    ):
+        current[row[0]].append(tuple(row[1:]))
+
+    rankings = {club_id: own[:top_n]}
+    recompute = []
+    for neighbour, entries in current.items():
+        entry = changed.get(neighbour)
+        rest = [item for item in entries if item[0] != club_id]
+        was_listed = len(rest) < len(entries)
+        if len(entries) < top_n:
+            # 列表未满说明已包含全部共同关注社团，直接调整这一项
+            if entry is not None or was_listed:
+                rankings[neighbour] = sorted(rest + ([entry] if entry else []), key=_rank_key)
+        elif was_listed:
+            old = next(item for item in entries if item[0] == club_id)
+            # 列表外的社团都排在原列表末位之后：分数没有下降或仍排在其余各项之前时，不会被超过
+            if entry is not None and (_rank_key(entry) <= _rank_key(old)
+                                      or (rest and _rank_key(entry) < _rank_key(rest[-1]))):
+                rankings[neighbour] = sorted(rest + [entry], key=_rank_key)
+            else:
+                recompute.append(neighbour)
+        elif entry is not None and _rank_key(entry) < _rank_key(entries[-1]):
+            rankings[neighbour] = sorted(entries + [entry], key=_rank_key)[:top_n]
+
+    if recompute:
+        for neighbour, ranking in _rankings(connection, recompute).items():
+            rankings[neighbour] = ranking[:top_n]
+
+    connection.execute(similarities.delete().where(similarities.c.club_id.in_(rankings)))
+    _store(connection, rankings)
+
+
+def _rank_key(item):
+    """列表排序：分数降序，分数相同按社团 id 升序"""
+    return -item[1], item[0]
+
+
+def _rankings(connection, club_ids):
+    """按共同关注矩阵计算这些社团与所有共同关注社团的相似度，返回 {club_id: [(other_id, score, common)]}（已排序）"""
+    table = ClubCoFollow.__table__
+    own = table.alias('own')
+    other = table.alias('other')
+    rows = connection.execute(
+        db.select(table.c.club_id, table.c.other_club_id, table.c.count, own.c.count, other.c.count)
+        .join(own, db.and_(own.c.club_id == table.c.club_id, own.c.other_club_id == table.c.club_id))
+        .join(other, db.and_(other.c.club_id == table.c.other_club_id,
+                             other.c.other_club_id == table.c.other_club_id))
+        .where(table.c.club_id.in_(club_ids), table.c.other_club_id != table.c.club_id)
+    )
+
+    rankings = {club_id: [] for club_id in club_ids}
+    for source, target, common, source_followers, target_followers in rows:
+        score = common / math.sqrt(source_followers * target_followers)
+        rankings[source].append((target, score, common))
+    for ranking in rankings.values():
+        ranking.sort(key=_rank_key)
+    return rankings
+
+
+@event.listens_for(Follow, 'after_insert')
+def _follow_inserted(mapper, connection, target):
+    _apply(connection, target.user_id, target.club_id, 1)
+
+
+@event.listens_for(Follow, 'after_delete')
+def _follow_deleted(mapper, connection, target):
+    _apply(connection, target.user_id, target.club_id, -1)
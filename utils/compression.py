@@ -0,0 +1,137 @@
+import gzip
+import time
+import zlib
+from flask import request
+
+try:
+    import brotli  # 可选依赖，未安装时只提供 gzip
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/csv', 'text/calendar', 'text/plain', 'text/html')
+
+# 压缩后的表示与原文不同，强 ETag 需按编码区分
+ETAG_SUFFIXES = {'gzip': '-gzip', 'br': '-br'}
+
+
+def available_encodings():
+    """服务端支持的编码，按优先级排列"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def choose_encoding(accept_encoding):
+    """按 Accept-Encoding 协商编码，没有可用编码时返回 None"""
+    for encoding in available_encodings():
+        if accept_encoding[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding, level):
+    """一次性压缩完整响应体"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_stream(chunks, encoding, level, flush_size=64 * 1024):
+    """流式压缩：逐块压缩，每累计 flush_size 字节输入刷新一次输出，不把完整响应读入内存"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=min(level, 11))
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    pending = 0
+    for chunk in chunks:
+        chunk = _to_bytes(chunk)
+        data = process(chunk)
+        pending += len(chunk)
+        if pending >= flush_size:
+            data += flush()
+            pending = 0
+        if data:
+            yield data
+    yield finish()
+
+
+def _to_bytes(chunk):
+    return chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+
+def _match_encoded_etag(response):
+    """304 响应回显客户端持有的带编码后缀的 ETag"""
+    etag, weak = response.get_etag()
+    if not etag:
+        return
+    for suffix in ETAG_SUFFIXES.values():
+        if request.if_none_match.contains_weak(etag + suffix):
+            response.set_etag(etag + suffix, weak)
+            return
+
+
+def init_app(app):
+    """注册 after_request 钩子，对大于阈值的文本响应做协商压缩"""
+    if not app.config.get('COMPRESS_ENABLED', True):
+        return
+
+    level = app.config.get('COMPRESS_LEVEL', 6)
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+
+    @app.after_request
+    def compress_response(response):
+        response.vary.add('Accept-Encoding')
+
+        if response.status_code == 304:
+            _match_encoded_etag(response)
+            return response
+
+        if response.status_code < 200 or response.status_code == 204 \
+                or 'Content-Encoding' in response.headers \
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding, level)
+            response.direct_passthrough = False
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+            response.set_data(compress(data, encoding, level))
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(etag + ETAG_SUFFIXES[encoding], weak)
+        return response
+
+
+def benchmark(client, paths, headers=None, repeat=20, level=6):
+    """测量各接口压缩前后的传输字节数与每次压缩的 CPU 耗时（毫秒）"""
+    rows = []
+    for path in paths:
+        response = client.get(path, headers=dict(headers or {}, **{'Accept-Encoding': 'identity'}))
+        data = response.get_data()
+        for encoding in available_encodings():
+            start = time.process_time()
+            for _ in range(repeat):
+                compressed = compress(data, encoding, level)
+            cpu_ms = (time.process_time() - start) * 1000 / repeat
+            rows.append({
+                'path': path,
+                'status': response.status_code,
+                'encoding': encoding,
+                'raw_bytes': len(data),
+                'wire_bytes': len(compressed),
+                'ratio': round(len(compressed) / len(data), 3) if data else 1.0,
+                'cpu_ms': round(cpu_ms, 3)
+            })
+    return rows
@@ -0,0 +1,58 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import current_app, request, make_response
+from utils.compression import ETAG_SUFFIXES
+
+
+def compute_etag(parts):
+    """由版本信息计算强 ETag 值（不含引号）"""
+    raw = '|'.join(value.isoformat() if isinstance(value, datetime) else str(value) for value in parts)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def conditional_response(validator):
+    """条件请求装饰器：支持 If-None-Match / If-Modified-Since，命中时直接返回 304
+
+    validator 接收视图参数，只做聚合查询（max(updated_at)、行数等），
+    返回 (last_modified, parts)；返回 None 表示资源不存在，交给视图处理。
+    last_modified 为 None 时只发送 ETag（删除行等无法由时间戳反映的变化）。
+    需放在 token_required 之后，使 304 也经过认证。
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            version = validator(**kwargs)
+            if version is None:
+                return f(*args, **kwargs)
+
+            last_modified, parts = version
+            etag = compute_etag(parts)
+            if last_modified is not None:
+                last_modified = last_modified.replace(microsecond=0)
+
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return decorated
+    return decorator
+
+
+def _not_modified(etag, last_modified):
+    """按 RFC 7232：有 If-None-Match 时忽略 If-Modified-Since"""
+    if request.if_none_match:
+        # 压缩响应的 ETag 带有编码后缀，同样视为同一版本
+        candidates = [etag] + [etag + suffix for suffix in ETAG_SUFFIXES.values()]
+        return any(request.if_none_match.contains_weak(candidate) for candidate in candidates)
+    if last_modified is not None and request.if_modified_since:
+        return last_modified <= request.if_modified_since.replace(tzinfo=None)
+    return False
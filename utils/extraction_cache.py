@@ -0,0 +1,153 @@
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from flask import current_app
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, ArticleCache, ExtractionResultCache
+
+logger = logging.getLogger(__name__)
+
+WECHAT_HOST = 'mp.weixin.qq.com'
+# 长链接中唯一确定一篇公众号文章的参数
+WECHAT_ARTICLE_PARAMS = ('__biz', 'mid', 'idx', 'sn')
+# 分享、阅读会话附带的参数，不影响文章内容
+TRACKING_PARAMS = {
+    'chksm', 'scene', 'subscene', 'ascene', 'sessionid', 'clicktime', 'enterid', 'devicetype', 'version',
+    'nettype', 'lang', 'abtest_cookie', 'exportkey', 'pass_ticket', 'key', 'uin', 'wx_header', 'from',
+    'isappinstalled', 'share_source_id', 'sharer_sharetime', 'sharer_shareid', 'sharer_username',
+    'sharer_shareinfo', 'sharer_shareinfo_first', 'poc_token', 'acctmode', 'forceh5', 'fasttmpl_type',
+    'fasttmpl_fullversion', 'spm', 'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
+}
+
+
+def normalize_url(url):
+    """规范化文章 URL，同一篇文章的不同分享链接得到相同的结果
+
+    统一小写域名、去掉默认端口与锚点、参数排序；公众号长链接只保留 __biz/mid/idx/sn，
+    其他链接（含 /s/<token> 短链接）只去掉跟踪参数。
+    """
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or 'https').lower()
+    netloc = parts.netloc.lower()
+    if (scheme, netloc.rpartition(':')[2]) in (('http', '80'), ('https', '443')):
+        netloc = netloc.rpartition(':')[0]
+    path = parts.path.rstrip('/') or '/'
+    params = parse_qsl(parts.query, keep_blank_values=True)
+
+    if netloc == WECHAT_HOST:
+        scheme = 'https'
+        identity = [(k, v) for k, v in params if k in WECHAT_ARTICLE_PARAMS]
+        if {k for k, _ in identity} == set(WECHAT_ARTICLE_PARAMS):
+            params = identity
+    params = [(k, v) for k, v in params if k not in TRACKING_PARAMS]
+    return urlunsplit((scheme, netloc, path, urlencode(sorted(params)), ''))
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def get_article(url):
+    """一级缓存：返回该文章抓取过的正文，未命中或已过期时返回 None"""
+    entry = _get(ArticleCache, content_hash(normalize_url(url)), 'EXTRACT_CACHE_ARTICLE_TTL')
+    return entry.content if entry else None
+
+
+def put_article(url, content):
+    normalized = normalize_url(url)
+    _put(ArticleCache, ArticleCache.url_hash, 'EXTRACT_CACHE_ARTICLE_TTL', {
+        'url_hash': content_hash(normalized),
+        'url': normalized[:1000],
+        'content': content,
+        'content_hash': content_hash(content),
+    })
+
+
+def get_result(content, prompt_version):
+    """二级缓存：返回同一正文在同一提示词版本下的大模型结果，未命中或已过期时返回 None"""
+    entry = _get(ExtractionResultCache, _result_key(content, prompt_version), 'EXTRACT_CACHE_RESULT_TTL')
+    return entry.result if entry else None
+
+
+def put_result(content, prompt_version, result):
+    _put(ExtractionResultCache, ExtractionResultCache.cache_key, 'EXTRACT_CACHE_RESULT_TTL', {
+        'cache_key': _result_key(content, prompt_version),
+        'content_hash': content_hash(content),
+        'prompt_version': prompt_version,
+        'result': result,
+    })
+
+
+def clear():
+    """清空两级缓存，返回删除的条数"""
+    deleted = ArticleCache.query.delete() + ExtractionResultCache.query.delete()
+    db.session.commit()
+    return deleted
+
+
+def _result_key(content, prompt_version):
+    return content_hash(f'{prompt_version}\n{content_hash(content)}')
+
+
+def _get(model, key, ttl_name):
+    entry = db.session.get(model, key)
+    if entry is None:
+        return None
+    now = datetime.utcnow()
+    if entry.created_at < now - timedelta(seconds=current_app.config.get(ttl_name, 0)):
+        db.session.delete(entry)
+        db.session.commit()
+        return None
+    entry.accessed_at = now
+    db.session.commit()
+    return entry
+
+
+def _put(model, key_column, ttl_name, values):
+    """写入（已存在则覆盖并重新计时），再淘汰过期与超出条数上限的条目
+
+    写缓存失败只记录日志：正文与提取结果已经拿到，不能因为缓存让请求失败
+    """
+    now = datetime.utcnow()
+    values = dict(values, created_at=now, accessed_at=now)
+    try:
+        _upsert(model.__table__, key_column.name, values)
+        _evict(model, key_column, ttl_name)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logger.warning("写入提取缓存失败: %s", model.__tablename__, exc_info=True)
+
+
+def _upsert(table, key, values):
+    """SQLite/PostgreSQL 用 INSERT ... ON CONFLICT，其他数据库先按主键更新、未命中再插入"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+        statement = insert(table).values(values)
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[key],
+            set_={name: statement.excluded[name] for name in values if name != key}
+        ))
+        return
+
+    updated = db.session.execute(
+        table.update().where(table.c[key] == values[key])
+        .values({name: value for name, value in values.items() if name != key})
+    ).rowcount
+    if not updated:
+        db.session.execute(table.insert().values(values))
+
+
+def _evict(model, key_column, ttl_name):
+    config = current_app.config
+    expired = datetime.utcnow() - timedelta(seconds=config.get(ttl_name, 0))
+    model.query.filter(model.created_at < expired).delete(synchronize_session=False)
+
+    excess = db.session.query(db.func.count(key_column)).scalar() - config.get('EXTRACT_CACHE_MAX_ENTRIES', 1000)
+    if excess > 0:
+        # accessed_at 上有索引，最久未访问的条目直接按索引顺序取出
+        oldest = db.select(key_column).order_by(model.accessed_at).limit(excess)
+        model.query.filter(key_column.in_(oldest)).delete(synchronize_session=False)
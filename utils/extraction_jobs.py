@@ -0,0 +1,119 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, ExtractionJob
+from extractor import pipeline
+
+_executor = None
+_lock = threading.Lock()
+_last_sweep = 0.0
+
+
+class QueueFullError(Exception):
+    """未完成的任务数已达上限"""
+
+
+def ensure_started(sweep=False):
+    """首次使用时创建本进程的工作线程池并提交排队中的任务；之后每隔 EXTRACT_RECOVER_INTERVAL 秒
+    （sweep=True 时立即）找回执行超时的任务，进程重启或崩溃后中断的任务不会一直停在执行中"""
+    global _executor, _last_sweep
+    app = current_app._get_current_object()
+    with _lock:
+        started = _executor is None
+        if started:
+            _executor = ThreadPoolExecutor(max_workers=app.config.get('EXTRACT_MAX_WORKERS', 2),
+                                           thread_name_prefix='extract')
+        now = time.monotonic()
+        due = started or sweep or now - _last_sweep >= app.config.get('EXTRACT_RECOVER_INTERVAL', 30)
+        if due:
+            _last_sweep = now
+    if due:
+        _recover(app, submit_queued=started)
+    return _executor
+
+
+def create(article_url, user_id=None, force_refresh=False):
+    """创建提取任务并提交到线程池，返回任务记录"""
+    # 先找回超时任务，避免它们一直占用未完成任务的名额
+    executor = ensure_started(sweep=True)
+    unfinished = db.session.query(db.func.count(ExtractionJob.id)) \
+        .filter(ExtractionJob.status.notin_(ExtractionJob.FINISHED_STATUSES)).scalar()
+    if unfinished >= current_app.config.get('EXTRACT_QUEUE_LIMIT', 50):
+        raise QueueFullError()
+
+    job = ExtractionJob(id=uuid.uuid4().hex, article_url=article_url, user_id=user_id,
+                        force_refresh=bool(force_refresh))
+    db.session.add(job)
+    db.session.commit()
+    executor.submit(_run, current_app._get_current_object(), job.id)
+    return job
+
+
+def _recover(app, submit_queued=False):
+    """执行超时的任务视为原进程已退出：未超过重试次数的重新排队并提交，否则标记失败；
+    submit_queued 为 True（本进程刚启动）时再提交所有排队中的任务"""
+    stale = datetime.utcnow() - timedelta(seconds=app.config.get('EXTRACT_JOB_TIMEOUT', 300))
+    max_attempts = app.config.get('EXTRACT_MAX_ATTEMPTS', 3)
+    interrupted = ExtractionJob.query.filter(
+        ExtractionJob.status.in_(ExtractionJob.RUNNING_STATUSES),
+        ExtractionJob.updated_at < stale
+    )
+    interrupted.filter(ExtractionJob.attempts >= max_attempts).update({
+        ExtractionJob.status: 'failed',
+        ExtractionJob.error: '任务多次中断，已放弃',
+        ExtractionJob.finished_at: datetime.utcnow()
+    }, synchronize_session=False)
+    requeued = [job_id for (job_id,) in interrupted.with_entities(ExtractionJob.id)]
+    if requeued:
+        # 带上原条件再更新，期间被其他进程找回或完成的任务不受影响
+        interrupted.filter(ExtractionJob.id.in_(requeued)) \
+            .update({ExtractionJob.status: 'queued', ExtractionJob.progress: 0}, synchronize_session=False)
+    db.session.commit()
+
+    if submit_queued:
+        queued = [job_id for (job_id,) in db.session.query(ExtractionJob.id)
+                  .filter(ExtractionJob.status == 'queued').order_by(ExtractionJob.created_at)]
+    else:
+        queued = requeued
+    # 重复提交无害：_run 通过条件更新认领，只有一个会执行
+    for job_id in queued:
+        _executor.submit(_run, app, job_id)
+
+
+def _update(job_id, **values):
+    ExtractionJob.query.filter_by(id=job_id).update(values, synchronize_session=False)
+    db.session.commit()
+
+
+def _run(app, job_id):
+    """工作线程：认领任务后依次抓取正文、调用大模型，每一步都写回状态与进度"""
+    with app.app_context():
+        try:
+            # 条件更新认领，多个进程恢复同一任务时只有一个会执行
+            claimed = ExtractionJob.query.filter_by(id=job_id, status='queued').update({
+                ExtractionJob.status: 'fetching',
+                ExtractionJob.progress: 10,
+                ExtractionJob.attempts: ExtractionJob.attempts + 1,
+                ExtractionJob.started_at: datetime.utcnow()
+            }, synchronize_session=False)
+            db.session.commit()
+            if not claimed:
+                return
+
+            article_url, force_refresh = db.session.query(ExtractionJob.article_url, ExtractionJob.force_refresh) \
+                .filter_by(id=job_id).one()
+            try:
+                content = pipeline.fetch_article(article_url, force_refresh)
+                _update(job_id, status='extracting', progress=50)
+                activity_info = pipeline.extract_activity_info(content, force_refresh)
+            except Exception as e:
+                db.session.rollback()
+                _update(job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+                return
+
+            _update(job_id, status='succeeded', progress=100, result=activity_info, finished_at=datetime.utcnow())
+        finally:
+            db.session.remove()
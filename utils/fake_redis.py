@@ -0,0 +1,58 @@
+"""进程内的 Redis 替身，实现响应缓存用到的 get/set/mget/incr，用于测试与没有 Redis 的本地开发
+
+    from utils.fake_redis import FakeRedis
+    response_cache.init_app(app, redis_client=FakeRedis())
+"""
+import threading
+import time
+
+
+class FakeRedis:
+    """与 redis-py 的返回值一致：取出的值为 bytes，不存在或已过期为 None；set 支持 ex（秒）
+
+    clock 可替换为可控的时钟，用于测试过期。
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            return self._get(name)
+
+    def mget(self, keys):
+        with self._lock:
+            return [self._get(key) for key in keys]
+
+    def set(self, name, value, ex=None):
+        with self._lock:
+            self._data[name] = (_encode(value), self._clock() + ex if ex else None)
+        return True
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            value = int(self._get(name) or 0) + amount
+            expires_at = self._data[name][1] if name in self._data else None
+            self._data[name] = (_encode(value), expires_at)
+            return value
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+        return True
+
+    def _get(self, name):
+        item = self._data.get(name)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= self._clock():
+            del self._data[name]
+            return None
+        return value
+
+
+def _encode(value):
+    return value if isinstance(value, bytes) else str(value).encode('utf-8')
@@ -0,0 +1,137 @@
+from flask import current_app
+from sqlalchemy import event, inspect, literal, union
+from models import db, Activity, Club, Follow, FeedEntry
+from utils.pagination import paginate_keyset
+
+
+def page(user_id, cursor=None, limit=10):
+    """读取用户动态，按发布时间倒序游标分页，返回 (activities, next_cursor)
+
+    普通社团的活动已写入用户时间线，只需一次 (user_id, created_at, activity_id) 索引范围扫描；
+    关注了读扩散社团时，再与这些社团的活动合并去重。
+    """
+    pull_clubs = db.select(Follow.club_id) \
+        .join(Club, Club.id == Follow.club_id) \
+        .where(Follow.user_id == user_id, Club.fanout_on_read.is_(True))
+    has_pull_clubs = db.session.execute(pull_clubs.limit(1)).first() is not None
+
+    if has_pull_clubs:
+        timeline = union(
+            db.select(FeedEntry.activity_id, FeedEntry.created_at).where(FeedEntry.user_id == user_id),
+            db.select(Activity.id.label('activity_id'), Activity.created_at)
+            .where(Activity.club_id.in_(pull_clubs), Activity.status == 'published')
+        ).subquery()
+        query = Activity.query.join(timeline, timeline.c.activity_id == Activity.id)
+        columns = [timeline.c.created_at, timeline.c.activity_id]
+    else:
+        query = Activity.query.join(FeedEntry, FeedEntry.activity_id == Activity.id) \
+            .filter(FeedEntry.user_id == user_id)
+        columns = [FeedEntry.created_at, FeedEntry.activity_id]
+
+    query = query.filter(Activity.status == 'published')
+    return paginate_keyset(query, columns, cursor, limit, descending=True,
+                           key=lambda activity: [activity.created_at, activity.id])
+
+
+def init_app(app):
+    """首次启用时为已有的关注关系回填时间线"""
+    with app.app_context():
+        initialized = db.session.query(FeedEntry.user_id).first() is not None
+        has_follows = db.session.query(Follow.id).first() is not None
+        if not initialized and has_follows:
+            rebuild()
+            print("✅ 已回填用户动态时间线")
+
+
+def rebuild():
+    """按当前关注关系重建所有时间线，返回写入的条目数"""
+    connection = db.session.connection()
+    connection.execute(FeedEntry.__table__.delete())
+    connection.execute(Club.__table__.update().values(fanout_on_read=False))
+
+    total = 0
+    for (club_id,) in db.session.query(Club.id):
+        if _mark_pull_if_large(connection, club_id):
+            continue
+        for (activity_id, created_at) in db.session.query(Activity.id, Activity.created_at) \
+                .filter(Activity.club_id == club_id, Activity.status == 'published'):
+            total += _fan_out(connection, club_id, activity_id, created_at)
+    db.session.commit()
+    return total
+
+
+def _mark_pull_if_large(connection, club_id):
+    """关注人数超过阈值时把社团标记为读扩散，返回是否为读扩散社团"""
+    clubs = Club.__table__
+    if connection.execute(db.select(clubs.c.fanout_on_read).where(clubs.c.id == club_id)).scalar():
+        return True
+
+    follows = Follow.__table__
+    followers = connection.execute(
+        db.select(db.func.count()).select_from(follows).where(follows.c.club_id == club_id)
+    ).scalar()
+    if followers <= current_app.config.get('FEED_FANOUT_LIMIT', 5000):
+        return False
+
+    connection.execute(clubs.update().where(clubs.c.id == club_id).values(fanout_on_read=True))
+    return True
+
+
+def _fan_out(connection, club_id, activity_id, created_at):
+    """把一个活动写入社团所有关注者的时间线，返回写入条数"""
+    follows = Follow.__table__
+    result = connection.execute(
+        FeedEntry.__table__.insert().prefix_with('OR IGNORE', dialect='sqlite').from_select(
+            ['user_id', 'activity_id', 'club_id', 'created_at'],
+            db.select(follows.c.user_id, literal(activity_id), literal(club_id), literal(created_at))
+            .where(follows.c.club_id == club_id)
+        )
+    )
+    return result.rowcount
+
+
+def _backfill(connection, user_id, club_id):
+    """新关注社团时，把该社团最近发布的活动写入用户时间线"""
+    activities = Activity.__table__
+    connection.execute(
+        FeedEntry.__table__.insert().prefix_with('OR IGNORE', dialect='sqlite').from_select(
+            ['user_id', 'activity_id', 'club_id', 'created_at'],
+            db.select(literal(user_id), activities.c.id, activities.c.club_id, activities.c.created_at)
+            .where(activities.c.club_id == club_id, activities.c.status == 'published')
+            .order_by(activities.c.created_at.desc())
+            .limit(current_app.config.get('FEED_BACKFILL_LIMIT', 50))
+        )
+    )
+
+
+@event.listens_for(Activity, 'after_insert')
+def _activity_inserted(mapper, connection, target):
+    if target.status == 'published' and not _mark_pull_if_large(connection, target.club_id):
+        _fan_out(connection, target.club_id, target.id, target.created_at)
+
+
+@event.listens_for(Activity, 'after_update')
+def _activity_updated(mapper, connection, target):
+    # 草稿发布时补发；下架的活动在读取时按状态过滤
+    history = inspect(target).attrs.status.history
+    if history.has_changes() and target.status == 'published' \
+            and not _mark_pull_if_large(connection, target.club_id):
+        _fan_out(connection, target.club_id, target.id, target.created_at)
+
+
+@event.listens_for(Activity, 'before_delete')
+def _activity_deleted(mapper, connection, target):
+    table = FeedEntry.__table__
+    connection.execute(table.delete().where(table.c.activity_id == target.id))
+
+
+@event.listens_for(Follow, 'after_insert')
+def _follow_inserted(mapper, connection, target):
+    if not _mark_pull_if_large(connection, target.club_id):
+        _backfill(connection, target.user_id, target.club_id)
+
+
+@event.listens_for(Follow, 'after_delete')
+def _follow_deleted(mapper, connection, target):
+    table = FeedEntry.__table__
+    connection.execute(table.delete().where(table.c.user_id == target.user_id, table.c.club_id == target.club_id))
@@ -0,0 +1,34 @@
+from flask import request
+
+
+class FieldSet:
+    """稀疏字段集：fields 为需要返回的字段（None 或空表示全部），exclude 为排除的字段
+
+    序列化方法据此跳过未请求字段的计算与查询，而不是算完再删除。
+    """
+
+    def __init__(self, fields=None, exclude=None):
+        # ?fields= 为空时按未指定处理，而不是返回空对象
+        self.fields = set(fields) if fields else None
+        self.exclude = set(exclude or ())
+
+    @classmethod
+    def from_request(cls):
+        """从查询参数 fields= / exclude=（逗号分隔）解析"""
+        return cls(_split(request.args.get('fields')), _split(request.args.get('exclude')))
+
+    def wants(self, *names):
+        """任一字段需要返回时为 True"""
+        return any(
+            (self.fields is None or name in self.fields) and name not in self.exclude
+            for name in names
+        )
+
+
+ALL_FIELDS = FieldSet()
+
+
+def _split(value):
+    if value is None:
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
@@ -0,0 +1,85 @@
+from datetime import datetime, timezone
+
+# RFC 5545：内容行以 CRLF 结尾，超过 75 字节需折行
+LINE_LIMIT = 75
+PRODID = '-//BoWanYaQu//Club Activities//CN'
+
+
+def escape(text):
+    """转义 TEXT 类型属性值中的特殊字符"""
+    return str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,') \
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def fold(line):
+    """按 UTF-8 字节数折行，续行以一个空格开头，不拆分多字节字符"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= LINE_LIMIT:
+        return line + '\r\n'
+    parts, current, size, limit = [], [], 0, LINE_LIMIT
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > limit:
+            parts.append(''.join(current))
+            current, size, limit = [], 0, LINE_LIMIT - 1
+        current.append(char)
+        size += width
+    parts.append(''.join(current))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_datetime(value):
+    """UTC 时间格式化为 19970714T173000Z"""
+    return value.strftime('%Y%m%dT%H%M%SZ')
+
+
+def calendar_header(name, sync_token=None):
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape(name)}',
+        'X-PUBLISHED-TTL:PT15M',
+        'REFRESH-INTERVAL;VALUE=DURATION:PT15M'
+    ]
+    if sync_token:
+        lines.append(f'X-SYNC-TOKEN:{sync_token}')
+    return ''.join(fold(line) for line in lines)
+
+
+def calendar_footer():
+    return 'END:VCALENDAR\r\n'
+
+
+def event(uid, summary, start, end=None, description=None, location=None, status='CONFIRMED',
+          last_modified=None, alarm=None):
+    """生成一个 VEVENT；alarm 为提醒的绝对时间，status 为 CANCELLED 时客户端会移除该日程"""
+    stamp = format_datetime(last_modified or datetime.now(timezone.utc))
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{stamp}',
+        f'DTSTART:{format_datetime(start)}'
+    ]
+    if end:
+        lines.append(f'DTEND:{format_datetime(end)}')
+    lines.append(f'SUMMARY:{escape(summary)}')
+    if description:
+        lines.append(f'DESCRIPTION:{escape(description)}')
+    if location:
+        lines.append(f'LOCATION:{escape(location)}')
+    lines.append(f'STATUS:{status}')
+    if last_modified:
+        lines.append(f'LAST-MODIFIED:{stamp}')
+    if alarm and status != 'CANCELLED':
+        lines += [
+            'BEGIN:VALARM',
+            'ACTION:DISPLAY',
+            f'DESCRIPTION:{escape(summary)}',
+            f'TRIGGER;VALUE=DATE-TIME:{format_datetime(alarm)}',
+            'END:VALARM'
+        ]
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
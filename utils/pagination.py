@@ -0,0 +1,85 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import DateTime, tuple_
+
+
+# 游标分页单页最多返回的条数
+MAX_LIMIT = 100
+
+
+class InvalidCursorError(ValueError):
+    """游标无法解析"""
+
+
+class InvalidLimitError(ValueError):
+    """分页大小不在 1..MAX_LIMIT 范围内"""
+
+
+def encode_cursor(values):
+    """把排序键编码为不透明游标"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """解析游标，按排序列的类型还原排序键"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise ValueError('cursor length mismatch')
+        return [_cursor_value(column, value) for column, value in zip(columns, payload)]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(str(e))
+
+
+def _cursor_value(column, value):
+    """还原单个排序键；游标由客户端传回，只接受标量，避免把对象、数组交给数据库驱动"""
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise TypeError(f'unsupported cursor value: {value!r}')
+    return value
+
+
+def paginate_keyset(query, columns, cursor, limit, descending=False, key=None):
+    """按 columns 做游标（keyset）分页，避免 OFFSET 随页数线性变慢
+
+    columns 必须构成全序（末尾带主键），并有对应的联合索引；
+    key 用于从结果行中取出排序键，默认按列名从行对象上读取。
+    返回 (rows, next_cursor)，没有下一页时 next_cursor 为 None；limit 超出 1..MAX_LIMIT 时抛出 InvalidLimitError。
+    """
+    if not 1 <= limit <= MAX_LIMIT:
+        raise InvalidLimitError(f'limit必须在1到{MAX_LIMIT}之间')
+
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        row_key = tuple_(*columns)
+        query = query.filter(row_key < tuple_(*values) if descending else row_key > tuple_(*values))
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if key is None:
+            key = lambda row: [getattr(row, column.key) for column in columns]
+        next_cursor = encode_cursor(key(rows[-1]))
+
+    return rows, next_cursor
+
+
+def cursor_page(name, items, next_cursor, limit, total=None):
+    """游标分页的返回数据，total 为 None 时不返回总数"""
+    data = {
+        name: items,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+        "limit": limit
+    }
+    if total is not None:
+        data["total"] = total
+    return data
@@ -0,0 +1,152 @@
+import time
+from datetime import datetime
+from models import db, Activity, ActivityTag, Registration, Follow, UserRecommendation
+
+# 历史行为权重：报名过的活动、关注社团的活动标签画像
+REGISTRATION_WEIGHT = 1.0
+FOLLOW_WEIGHT = 0.5
+HISTORY_STATUSES = ('approved', 'pending', 'waitlisted')
+
+
+def compute(top_k=20, chunk_size=2000, now=None):
+    """离线计算所有用户的 top-K 推荐并写入 user_recommendations，返回统计信息
+
+    活动按标签 TF-IDF 向量表示，用户画像为其报名活动与关注社团画像的加权和，
+    以余弦相似度为未开始活动打分；按用户分块做矩阵乘法，内存占用与用户总数无关。
+    """
+    import numpy as np  # 可选依赖，仅离线任务需要
+
+    started = time.monotonic()
+    now = now or datetime.utcnow()
+
+    # 活动-标签矩阵
+    activity_rows = db.session.query(Activity.id, Activity.club_id).order_by(Activity.id).all()
+    activity_index = {activity_id: i for i, (activity_id, _) in enumerate(activity_rows)}
+    vocabulary = {}
+    tag_pairs = [
+        (activity_index[activity_id], vocabulary.setdefault(tag, len(vocabulary)))
+        for activity_id, tag in db.session.query(ActivityTag.activity_id, ActivityTag.tag)
+        if activity_id in activity_index
+    ]
+    item_vectors = tag_vectors(np, len(activity_rows), len(vocabulary), tag_pairs)
+
+    # 社团画像：旗下活动向量之和
+    club_ids = sorted({club_id for _, club_id in activity_rows})
+    club_index = {club_id: i for i, club_id in enumerate(club_ids)}
+    club_profiles = np.zeros((len(club_ids), item_vectors.shape[1]), dtype=np.float32)
+    if activity_rows:
+        np.add.at(club_profiles, np.array([club_index[club_id] for _, club_id in activity_rows]), item_vectors)
+    normalize_rows(np, club_profiles)
+
+    # 候选：未开始的已发布活动
+    candidates = np.array([
+        activity_index[activity_id] for (activity_id,) in
+        db.session.query(Activity.id).filter(Activity.status == 'published', Activity.start_time > now)
+    ], dtype=np.int64)
+
+    # 用户历史
+    registrations = db.session.query(Registration.user_id, Registration.activity_id) \
+        .filter(Registration.status.in_(HISTORY_STATUSES)).all()
+    follows = db.session.query(Follow.user_id, Follow.club_id).all()
+    user_ids = sorted({user_id for user_id, _ in registrations} | {user_id for user_id, _ in follows})
+    user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+    history = (
+        np.array([user_index[user_id] for user_id, _ in registrations], dtype=np.int64),
+        np.array([activity_index[activity_id] for _, activity_id in registrations], dtype=np.int64),
+        np.array([user_index[user_id] for user_id, _ in follows], dtype=np.int64),
+        np.array([club_index.get(club_id, -1) for _, club_id in follows], dtype=np.int64)
+    )
+
+    db.session.query(UserRecommendation).delete()
+    table = UserRecommendation.__table__
+    activity_ids = np.array([activity_id for activity_id, _ in activity_rows], dtype=np.int64)
+    total = 0
+    for start, top, scores in score_top_k(np, item_vectors, club_profiles, candidates, len(user_ids),
+                                          history, top_k, chunk_size):
+        records = []
+        for row in range(top.shape[0]):
+            for rank, (column, score) in enumerate(zip(top[row], scores[row])):
+                if score <= 0:
+                    break  # 分数已降序排列
+                records.append({
+                    'user_id': user_ids[start + row],
+                    'rank': rank,
+                    'activity_id': int(activity_ids[candidates[column]]),
+                    'score': float(score),
+                    'computed_at': now
+                })
+        if records:
+            db.session.execute(table.insert(), records)
+            total += len(records)
+    db.session.commit()
+
+    return {
+        'users': len(user_ids),
+        'candidates': len(candidates),
+        'tags': len(vocabulary),
+        'rows': total,
+        'seconds': round(time.monotonic() - started, 2)
+    }
+
+
+def tag_vectors(np, n_items, n_tags, pairs):
+    """由 (活动下标, 标签下标) 构造按 IDF 加权并行归一化的稠密矩阵"""
+    vectors = np.zeros((n_items, n_tags), dtype=np.float32)
+    if pairs:
+        rows, columns = np.array(pairs, dtype=np.int64).T
+        document_frequency = np.bincount(columns, minlength=n_tags)
+        idf = np.log((1 + n_items) / (1 + document_frequency)) + 1
+        vectors[rows, columns] = idf[columns]
+    normalize_rows(np, vectors)
+    return vectors
+
+
+def normalize_rows(np, matrix):
+    """原地做行 L2 归一化（零向量保持为零）"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+
+
+def score_top_k(np, item_vectors, club_profiles, candidates, n_users, history, top_k=20, chunk_size=2000):
+    """按用户分块打分，逐块产出 (起始用户下标, top 候选列下标, 对应分数)
+
+    history 为 (报名用户下标, 报名活动下标, 关注用户下标, 关注社团下标) 四个数组；
+    已报名的候选活动不会被推荐，分数按降序排列。
+    """
+    reg_users, reg_items, follow_users, follow_clubs = history
+    order = np.argsort(reg_users, kind='stable')
+    reg_users, reg_items = reg_users[order], reg_items[order]
+    order = np.argsort(follow_users, kind='stable')
+    follow_users, follow_clubs = follow_users[order], follow_clubs[order]
+    valid = follow_clubs >= 0
+    follow_users, follow_clubs = follow_users[valid], follow_clubs[valid]
+
+    # 活动下标 -> 候选列下标（非候选为 -1）
+    candidate_column = np.full(item_vectors.shape[0], -1, dtype=np.int64)
+    candidate_column[candidates] = np.arange(len(candidates))
+    candidate_vectors = item_vectors[candidates].T.copy()
+    k = min(top_k, len(candidates))
+    if k == 0:
+        return
+
+    for start in range(0, n_users, chunk_size):
+        end = min(start + chunk_size, n_users)
+        size = end - start
+
+        # 用户画像：累加报名活动向量与关注社团画像（内存只与 分块大小 × 标签数 有关）
+        lo, hi = np.searchsorted(reg_users, [start, end])
+        f_lo, f_hi = np.searchsorted(follow_users, [start, end])
+        profiles = np.zeros((size, item_vectors.shape[1]), dtype=np.float32)
+        np.add.at(profiles, reg_users[lo:hi] - start, REGISTRATION_WEIGHT * item_vectors[reg_items[lo:hi]])
+        np.add.at(profiles, follow_users[f_lo:f_hi] - start, FOLLOW_WEIGHT * club_profiles[follow_clubs[f_lo:f_hi]])
+        normalize_rows(np, profiles)
+
+        scores = profiles @ candidate_vectors
+        registered = candidate_column[reg_items[lo:hi]]
+        mask = registered >= 0
+        scores[reg_users[lo:hi][mask] - start, registered[mask]] = -np.inf
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        yield start, np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
@@ -0,0 +1,244 @@
+import heapq
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from importlib import import_module
+from models import db, Activity, Registration
+
+logger = logging.getLogger(__name__)
+
+# 只给仍有效的报名发送提醒
+REMINDER_STATUSES = ('approved', 'pending')
+
+
+class Notifier(ABC):
+    """提醒发送接口：send 接收一条提醒数据，发送失败时抛出异常"""
+
+    @abstractmethod
+    def send(self, reminder):
+        ...
+
+
+class LogNotifier(Notifier):
+    """本地桩实现：追加写入 JSON Lines 文件，未配置路径时写日志，用于开发与测试"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, reminder):
+        line = json.dumps(reminder, ensure_ascii=False, default=str)
+        if not self.path:
+            logger.info("活动提醒 %s", line)
+            return
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+def load_notifier(app):
+    """按 REMINDER_NOTIFIER 创建发送器：'log' 为本地桩，其他值为 'module:Class'（无参构造）"""
+    name = app.config.get('REMINDER_NOTIFIER', 'log')
+    if name == 'log':
+        return LogNotifier(app.config.get('REMINDER_LOG_PATH'))
+    module_name, _, class_name = name.partition(':')
+    return getattr(import_module(module_name), class_name)()
+
+
+class ReminderDispatcher:
+    """活动提醒调度器
+
+    内存中的小顶堆只保存未来 window 内到期的提醒，由 reminder_time 部分索引按时间段加载；
+    新增、修改、取消通过 updated_at 索引增量同步，被删除或已拒绝的报名在认领时自然失效。
+    多个实例同时运行时，通过带租约的条件 UPDATE 认领提醒，租约过期前只有一个实例发送；
+    进程崩溃后租约到期，其他实例会重新认领（至少一次送达）。
+    """
+
+    # 增量同步时回看的时长，容忍事务提交晚于 updated_at 的情况
+    SYNC_OVERLAP = timedelta(seconds=30)
+
+    def __init__(self, notifier, owner=None, window=600, lease=120, sync_interval=5, grace=3600,
+                 batch_size=500):
+        self.notifier = notifier
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.window = timedelta(seconds=window)
+        self.lease = timedelta(seconds=lease)
+        self.sync_interval = timedelta(seconds=sync_interval)
+        self.grace = timedelta(seconds=grace)
+        self.batch_size = batch_size
+
+        self._heap = []  # (触发时间, registration_id)
+        self._scheduled = {}  # registration_id -> 触发时间，堆中时间不一致的条目视为已失效
+        self._horizon = None  # 已加载到的最晚提醒时间
+        self._synced_at = None  # 上次增量同步的时间
+
+    @classmethod
+    def from_app(cls, app, **kwargs):
+        options = {
+            'window': app.config.get('REMINDER_WINDOW', 600),
+            'lease': app.config.get('REMINDER_LEASE', 120),
+            'sync_interval': app.config.get('REMINDER_SYNC_INTERVAL', 5),
+            'grace': app.config.get('REMINDER_GRACE', 3600)
+        }
+        options.update(kwargs)
+        return cls(load_notifier(app), **options)
+
+    def pending(self):
+        """内存中等待触发的提醒数"""
+        return len(self._scheduled)
+
+    def run_once(self, now=None):
+        """执行一轮：必要时同步，再发送已到期的提醒，返回发送条数"""
+        now = now or datetime.utcnow()
+        if self._horizon is None:
+            self._load(now)
+        elif now - self._synced_at >= self.sync_interval:
+            self._sync(now)
+
+        sent = 0
+        due = self._pop_due(now)
+        for start in range(0, len(due), self.batch_size):
+            sent += self._dispatch(due[start:start + self.batch_size], now)
+        return sent
+
+    def run_forever(self, stop=None):
+        """常驻运行，睡眠到下一个提醒到期或下一次同步"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                db.session.rollback()
+                logger.exception("提醒调度出错")
+            stop.wait(self._idle_seconds(datetime.utcnow()))
+
+    def _idle_seconds(self, now):
+        wake = self._synced_at + self.sync_interval if self._synced_at else now
+        if self._heap:
+            wake = min(wake, self._heap[0][0])
+        return min(max((wake - now).total_seconds(), 0.05), self.sync_interval.total_seconds())
+
+    def _schedule(self, registration_id, fire_at):
+        if self._scheduled.get(registration_id) != fire_at:
+            self._scheduled[registration_id] = fire_at
+            heapq.heappush(self._heap, (fire_at, registration_id))
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, registration_id = heapq.heappop(self._heap)
+            if self._scheduled.get(registration_id) == fire_at:
+                del self._scheduled[registration_id]
+                due.append(registration_id)
+        return due
+
+    def _load(self, now):
+        """启动时加载 [now - grace, now + window] 内待发送的提醒"""
+        self._synced_at = now
+        self._horizon = now - self.grace
+        self._extend(now)
+
+    def _extend(self, now):
+        """把加载窗口推进到 now + window，只读取部分索引中新进入窗口的一段"""
+        horizon = now + self.window
+        rows = db.session.query(Registration.id, Registration.reminder_time).filter(
+            Registration.reminder_time.isnot(None),
+            Registration.reminder_sent_at.is_(None),
+            Registration.reminder_time > self._horizon,
+            Registration.reminder_time <= horizon
+        ).yield_per(self.batch_size)
+        for registration_id, reminder_time in rows:
+            self._schedule(registration_id, reminder_time)
+        self._horizon = horizon
+        db.session.commit()
+
+    def _sync(self, now):
+        """增量同步上次同步以来新增或修改的报名，并推进加载窗口"""
+        rows = db.session.query(Registration.id, Registration.reminder_time, Registration.reminder_sent_at) \
+            .filter(Registration.updated_at > self._synced_at - self.SYNC_OVERLAP) \
+            .yield_per(self.batch_size)
+        for registration_id, reminder_time, sent_at in rows:
+            if reminder_time is None or sent_at is not None or reminder_time > self._horizon \
+                    or reminder_time < now - self.grace:
+                # 已发送、已取消提醒、超出窗口（之后由 _extend 加载）或已过期
+                self._scheduled.pop(registration_id, None)
+            else:
+                self._schedule(registration_id, reminder_time)
+        self._synced_at = now
+        self._extend(now)
+
+    def _dispatch(self, registration_ids, now):
+        """认领并发送一批已到期的提醒，返回发送成功的条数"""
+        table = Registration.__table__
+        lease_until = now + self.lease
+        db.session.execute(
+            table.update()
+            .where(
+                table.c.id.in_(registration_ids),
+                table.c.reminder_sent_at.is_(None),
+                table.c.reminder_time <= now,
+                table.c.reminder_time >= now - self.grace,
+                table.c.status.in_(REMINDER_STATUSES),
+                db.or_(table.c.reminder_lease_until.is_(None), table.c.reminder_lease_until < now)
+            )
+            # 提醒状态不属于用户可见的报名内容，保持 updated_at 不变（详情 ETag 与日历增量同步依赖它）
+            .values(reminder_lease_owner=self.owner, reminder_lease_until=lease_until,
+                    updated_at=table.c.updated_at)
+        )
+        db.session.commit()
+
+        claimed = db.session.query(
+            Registration.id, Registration.user_id, Registration.activity_id, Registration.reminder_time,
+            Activity.title, Activity.start_time, Activity.location
+        ).join(Activity, Activity.id == Registration.activity_id).filter(
+            Registration.id.in_(registration_ids),
+            Registration.reminder_lease_owner == self.owner,
+            Registration.reminder_lease_until == lease_until,
+            Registration.reminder_sent_at.is_(None)
+        ).all()
+        self._defer_leased_elsewhere(set(registration_ids) - {row.id for row in claimed}, now)
+
+        sent = 0
+        for row in claimed:
+            try:
+                self.notifier.send({
+                    'registration_id': row.id,
+                    'user_id': row.user_id,
+                    'activity_id': row.activity_id,
+                    'title': row.title,
+                    'start_time': row.start_time.isoformat() + 'Z' if row.start_time else None,
+                    'location': row.location,
+                    'reminder_time': row.reminder_time.isoformat() + 'Z'
+                })
+            except Exception:
+                # 保留租约，到期后重试
+                logger.exception("提醒发送失败: registration %s", row.id)
+                self._schedule(row.id, lease_until)
+                continue
+
+            db.session.execute(
+                table.update()
+                .where(table.c.id == row.id, table.c.reminder_lease_owner == self.owner)
+                .values(reminder_sent_at=datetime.utcnow(), reminder_lease_owner=None, reminder_lease_until=None,
+                        updated_at=table.c.updated_at)
+            )
+            db.session.commit()
+            sent += 1
+        return sent
+
+    def _defer_leased_elsewhere(self, registration_ids, now):
+        """未认领到的提醒：仍被其他实例租用的，在租约到期后再检查一次（防止对方崩溃后丢失）"""
+        if not registration_ids:
+            return
+        rows = db.session.query(Registration.id, Registration.reminder_lease_until).filter(
+            Registration.id.in_(registration_ids),
+            Registration.reminder_sent_at.is_(None),
+            Registration.reminder_lease_until >= now
+        ).all()
+        for registration_id, lease_until in rows:
+            self._schedule(registration_id, lease_until)
+        db.session.commit()
@@ -0,0 +1,162 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, request, make_response, g
+
+
+class MemoryBackend:
+    """进程内 LRU 后端（默认）"""
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if not item:
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+
+class RedisBackend:
+    """Redis 后端，client 为任意兼容 redis-py 接口（get/set/mget/incr）的对象"""
+
+    def __init__(self, client, prefix='response_cache:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value, ensure_ascii=False), ex=ttl)
+
+    def get_versions(self, tags):
+        if not tags:
+            return []
+        values = self.client.mget([self.prefix + 'tag:' + tag for tag in tags])
+        return [int(value) if value else 0 for value in values]
+
+    def bump(self, tags):
+        for tag in tags:
+            self.client.incr(self.prefix + 'tag:' + tag)
+
+
+class ResponseCache:
+    """按路由与规范化查询参数缓存 GET 响应，按标签版本号失效，TTL 兜底"""
+
+    def __init__(self, backend, default_ttl=60):
+        self.backend = backend
+        self.default_ttl = default_ttl
+
+    def lookup(self, key):
+        """取出仍然有效的缓存项（所有标签版本未变）"""
+        entry = self.backend.get(key)
+        if not entry:
+            return None
+        tags = list(entry['tags'])
+        if self.backend.get_versions(tags) != [entry['tags'][tag] for tag in tags]:
+            return None
+        return entry
+
+    def versions(self, tags):
+        return dict(zip(tags, self.backend.get_versions(tags)))
+
+    def store(self, key, response, tag_versions, ttl=None):
+        self.backend.set(key, {
+            'status': response.status_code,
+            'mimetype': response.mimetype,
+            'body': response.get_data(as_text=True),
+            'tags': tag_versions
+        }, ttl or self.default_ttl)
+
+    def invalidate(self, *tags):
+        self.backend.bump(tags)
+
+
+def init_app(app, redis_client=None):
+    """按配置创建缓存后端；redis_client 可传入本地替身用于测试"""
+    backend_name = app.config.get('RESPONSE_CACHE_BACKEND', 'memory')
+    if backend_name == 'none':
+        return
+
+    if backend_name == 'redis' or redis_client is not None:
+        if redis_client is None:
+            import redis  # 可选依赖，仅在使用 Redis 后端时需要
+            redis_client = redis.Redis.from_url(app.config['RESPONSE_CACHE_REDIS_URL'])
+        backend = RedisBackend(redis_client)
+    else:
+        backend = MemoryBackend(app.config.get('RESPONSE_CACHE_SIZE', 1000))
+
+    app.extensions['response_cache'] = ResponseCache(backend, app.config.get('RESPONSE_CACHE_DEFAULT_TTL', 60))
+
+
+def invalidate(*tags):
+    """写操作提交后调用，使带有这些标签的缓存失效"""
+    cache = current_app.extensions.get('response_cache')
+    if cache is not None:
+        cache.invalidate(*tags)
+
+
+def cached_response(tags, ttl=None, vary_on_auth=False):
+    """读穿透缓存装饰器
+
+    tags 为标签列表，或接收视图参数返回标签列表的函数；
+    vary_on_auth 为 True 时带 Authorization 的请求不走缓存（响应因用户而异）。
+    已确定调用者身份（g.user_id，如批量请求的子请求）时一律不走缓存，缓存键不含用户，个性化字段不能写入公共缓存。
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            cache = current_app.extensions.get('response_cache')
+            if cache is None or g.get('user_id') is not None \
+                    or (vary_on_auth and request.headers.get('Authorization')):
+                return f(*args, **kwargs)
+
+            key = request.path + '?' + urlencode(sorted(request.args.items(multi=True)))
+            entry = cache.lookup(key)
+            if entry:
+                response = current_app.response_class(entry['body'], status=entry['status'],
+                                                      mimetype=entry['mimetype'])
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            # 先记录标签版本再计算响应，计算期间发生的写入会使该缓存项立即失效
+            entry_tags = tags(**kwargs) if callable(tags) else list(tags)
+            tag_versions = cache.versions(entry_tags)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                cache.store(key, response, tag_versions, ttl)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return decorated
+    return decorator
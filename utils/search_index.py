@@ -0,0 +1,228 @@
+import html
+import re
+from flask import current_app
+from sqlalchemy import and_, event, inspect, or_, text
+from sqlalchemy.exc import OperationalError
+from models import db, Activity, Club
+
+# 中日韩统一表意文字（含扩展A与兼容区）
+_CJK = '㐀-䶿一-鿿豈-﫿'
+_TOKEN_RE = re.compile(f'[{_CJK}]+|[^\\W_{_CJK}]+')
+_CJK_RE = re.compile(f'[{_CJK}]+')
+
+# 全文索引配置：FTS5 表名、索引列及对应的 BM25 权重
+INDEXES = {
+    'activity': {
+        'model': Activity,
+        'table': 'activities_fts',
+        'columns': ('title', 'description', 'tags'),
+        'weights': (10.0, 1.0, 5.0),
+    },
+    'club': {
+        'model': Club,
+        'table': 'clubs_fts',
+        'columns': ('name', 'description'),
+        'weights': (10.0, 1.0),
+    },
+}
+
+
+def index_tokens(value):
+    """把文本切成索引词：中文按二元组切分并补上末字，其他按单词小写"""
+    tokens = []
+    for run in _TOKEN_RE.findall(value or ''):
+        if _CJK_RE.fullmatch(run):
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])
+        else:
+            tokens.append(run.lower())
+    return tokens
+
+
+def build_match_query(keyword):
+    """把用户关键词转换为 FTS5 MATCH 表达式，没有可检索的词时返回 None
+
+    空白分隔的每个词转为一个短语，词与词之间为 AND；
+    单个汉字或英文单词按前缀匹配。引号等标点不是索引词，不会带入 FTS5 语法。
+    """
+    phrases = []
+    for term in (keyword or '').split():
+        tokens = []
+        runs = _TOKEN_RE.findall(term)
+        for position, run in enumerate(runs):
+            if _CJK_RE.fullmatch(run) and len(run) > 1:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+                # 索引中每段中文之后都有末字，后面还有其他词（如“测试123”）时带上末字才能连成短语
+                if position < len(runs) - 1:
+                    tokens.append(run[-1])
+            else:
+                tokens.append(run.lower())
+        if not tokens:
+            continue
+        phrase = '"' + ' '.join(token.replace('"', '""') for token in tokens) + '"'
+        if len(tokens) == 1:
+            phrase += '*'
+        phrases.append(phrase)
+    return ' '.join(phrases) or None
+
+
+def highlight(value, keyword, width=60):
+    """在原文中截取命中片段并用 <em> 标出关键词"""
+    value = value or ''
+    terms = [term for term in (keyword or '').split() if term]
+    if not value or not terms:
+        return html.escape(value[:width])
+
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    match = pattern.search(value)
+    start = max(0, match.start() - width // 3) if match else 0
+    fragment = value[start:start + width]
+
+    pieces, last = [], 0
+    for hit in pattern.finditer(fragment):
+        pieces.append(html.escape(fragment[last:hit.start()]))
+        pieces.append(f'<em>{html.escape(hit.group())}</em>')
+        last = hit.end()
+    pieces.append(html.escape(fragment[last:]))
+
+    prefix = '…' if start > 0 else ''
+    suffix = '…' if start + width < len(value) else ''
+    return prefix + ''.join(pieces) + suffix
+
+
+def is_enabled():
+    """当前应用是否启用了全文索引"""
+    return current_app.extensions.get('search_index', False)
+
+
+def init_app(app):
+    """创建 FTS5 索引表（仅 SQLite），新建时从业务表回填"""
+    enabled = False
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            try:
+                created = _create_tables()
+                enabled = True
+                if created:
+                    rebuild()
+                    print("✅ 已建立全文索引")
+            except OperationalError as e:
+                db.session.rollback()
+                print(f"⚠️ 当前SQLite不支持FTS5，关键词搜索退回LIKE: {e}")
+    app.extensions['search_index'] = enabled
+
+
+def _create_tables():
+    """创建缺失的 FTS5 表，返回是否有新建"""
+    existing = set(inspect(db.engine).get_table_names())
+    created = False
+    for config in INDEXES.values():
+        if config['table'] in existing:
+            continue
+        columns = ', '.join(config['columns'])
+        db.session.execute(text(
+            f"CREATE VIRTUAL TABLE {config['table']} USING fts5({columns}, tokenize='unicode61')"
+        ))
+        created = True
+    db.session.commit()
+    return created
+
+
+def rebuild(batch_size=500):
+    """根据业务表重建全部全文索引，返回写入的记录数"""
+    total = 0
+    for config in INDEXES.values():
+        db.session.execute(text(f"DELETE FROM {config['table']}"))
+        model = config['model']
+        for row in db.session.query(model).yield_per(batch_size):
+            _write(db.session.connection(), config, row)
+            total += 1
+    db.session.commit()
+    return total
+
+
+def match_clause(kind, keyword):
+    """关键词筛选条件，与原有的 LIKE 一样按子串匹配，空白分隔的多个词之间为 AND
+
+    启用全文索引时，含中文的词走 FTS5（中文按二元组索引，匹配结果即子串匹配）；
+    英文、数字在 FTS5 中只能按词前缀匹配（ball 匹配不到 basketball），这类词仍用 LIKE。
+    未启用全文索引时整个关键词退回 LIKE。
+    """
+    config = INDEXES[kind]
+    model = config['model']
+    if not is_enabled():
+        return _like(config, keyword)
+
+    cjk_terms = [term for term in keyword.split() if _CJK_RE.search(term)]
+    conditions = [_like(config, term) for term in keyword.split() if not _CJK_RE.search(term)]
+    query = build_match_query(' '.join(cjk_terms))
+    if query is not None:
+        matched = text(f"SELECT rowid FROM {config['table']} WHERE {config['table']} MATCH :query") \
+            .bindparams(query=query)
+        conditions.append(model.id.in_(matched))
+    return and_(*conditions) if conditions else _like(config, keyword)
+
+
+def _like(config, keyword):
+    model = config['model']
+    return or_(*[getattr(model, column).ilike(f'%{keyword}%') for column in config['columns']])
+
+
+def search(kind, keyword, limit=10, offset=0, where=''):
+    """按 BM25 相关度检索，返回 [(id, score)]（score 越小越相关）
+
+    与 match_clause 不同，英文、数字按词前缀匹配（ball 不匹配 basketball）。
+    """
+    config = INDEXES[kind]
+    query = build_match_query(keyword)
+    if query is None:
+        return []
+
+    table = config['table']
+    base = config['model'].__tablename__
+    weights = ', '.join(str(weight) for weight in config['weights'])
+    rows = db.session.execute(text(
+        f"SELECT {base}.id, bm25({table}, {weights}) AS score "
+        f"FROM {table} JOIN {base} ON {base}.id = {table}.rowid "
+        f"WHERE {table} MATCH :query {where} "
+        f"ORDER BY score LIMIT :limit OFFSET :offset"
+    ), {'query': query, 'limit': limit, 'offset': offset})
+    return [(row.id, row.score) for row in rows]
+
+
+def _write(connection, config, target):
+    """写入一条记录的索引（先删后插）"""
+    table = config['table']
+    connection.execute(text(f"DELETE FROM {table} WHERE rowid = :id"), {'id': target.id})
+    values = {column: ' '.join(index_tokens(getattr(target, column))) for column in config['columns']}
+    columns = ', '.join(config['columns'])
+    params = ', '.join(f':{column}' for column in config['columns'])
+    connection.execute(
+        text(f"INSERT INTO {table} (rowid, {columns}) VALUES (:id, {params})"),
+        dict(values, id=target.id)
+    )
+
+
+def _register_listeners(config):
+    """在业务表增删改的同一事务中维护索引"""
+    model = config['model']
+
+    @event.listens_for(model, 'after_insert')
+    def after_insert(mapper, connection, target):
+        if is_enabled():
+            _write(connection, config, target)
+
+    @event.listens_for(model, 'after_update')
+    def after_update(mapper, connection, target):
+        state = inspect(target)
+        if is_enabled() and any(state.attrs[column].history.has_changes() for column in config['columns']):
+            _write(connection, config, target)
+
+    @event.listens_for(model, 'after_delete')
+    def after_delete(mapper, connection, target):
+        if is_enabled():
+            connection.execute(text(f"DELETE FROM {config['table']} WHERE rowid = :id"), {'id': target.id})
+
+
+for _config in INDEXES.values():
+    _register_listeners(_config)
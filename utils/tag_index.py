@@ -0,0 +1,162 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+from sqlalchemy import event, func, inspect
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Activity, ActivityTag, TagDayCount
+from utils.tags import split_tags
+
+# 影响标签关联与分面计数的活动字段
+TRACKED_FIELDS = ('tags', 'status', 'start_time')
+
+
+def filter_clause(tags, match_all=False):
+    """按标签精确筛选活动：match_all 为 True 时需包含全部标签，否则包含任一标签"""
+    subquery = db.select(ActivityTag.activity_id).where(ActivityTag.tag.in_(tags))
+    if match_all:
+        subquery = subquery.group_by(ActivityTag.activity_id) \
+            .having(func.count(ActivityTag.tag) == len(set(tags)))
+    return Activity.id.in_(subquery)
+
+
+def upcoming_facets():
+    """未开始的已发布活动按标签计数，返回按数量倒序的 [(tag, count)]
+
+    明天及以后的部分直接累加按天维护的计数；今天的部分只统计尚未开始的活动。
+    """
+    now = datetime.utcnow()
+    today = now.date()
+    tomorrow = datetime.combine(today + timedelta(days=1), time.min)
+
+    counts = Counter(dict(
+        db.session.query(TagDayCount.tag, func.sum(TagDayCount.count))
+        .filter(TagDayCount.day > today)
+        .group_by(TagDayCount.tag)
+    ))
+
+    today_rows = db.session.query(ActivityTag.tag, func.count(ActivityTag.activity_id)) \
+        .join(Activity, Activity.id == ActivityTag.activity_id) \
+        .filter(Activity.status == 'published', Activity.start_time > now, Activity.start_time < tomorrow) \
+        .group_by(ActivityTag.tag)
+    counts.update(dict(today_rows))
+
+    return sorted(((tag, count) for tag, count in counts.items() if count > 0),
+                  key=lambda item: (-item[1], item[0]))
+
+
+def init_app(app):
+    """首次启用时从 Activity.tags 迁移已有数据"""
+    with app.app_context():
+        migrated = db.session.query(ActivityTag.activity_id).first() is not None
+        has_tags = Activity.query.filter(Activity.tags.isnot(None), Activity.tags != '').first() is not None
+        if not migrated and has_tags:
+            rebuild()
+            print("✅ 已迁移活动标签")
+
+
+def rebuild():
+    """根据 Activity.tags 重建标签关联表与分面计数，返回处理的活动数"""
+    db.session.query(ActivityTag).delete()
+    db.session.query(TagDayCount).delete()
+
+    day_counts = Counter()
+    total = 0
+    for activity in Activity.query.yield_per(500):
+        tags = split_tags(activity.tags)
+        db.session.add_all(ActivityTag(activity_id=activity.id, tag=tag) for tag in tags)
+        day_counts.update(_contribution(activity.status, activity.start_time, activity.tags))
+        total += 1
+
+    db.session.add_all(TagDayCount(tag=tag, day=day, count=count) for (tag, day), count in day_counts.items())
+    db.session.commit()
+    return total
+
+
+def _contribution(status, start_time, tags):
+    """一个活动在计数表中占用的 (tag, day) 集合"""
+    if status != 'published' or not start_time:
+        return set()
+    return {(tag, start_time.date()) for tag in split_tags(tags)}
+
+
+def _apply_counts(connection, keys, delta):
+    """对 (tag, day) 计数加减 delta
+
+    增加时不存在的行需新插入：SQLite/PostgreSQL 用一条 upsert，避免并发发布时重复插入同一主键；
+    其他数据库逐行先更新、未命中再插入。减少时对应行必然已存在，直接更新。
+    """
+    if not keys:
+        return
+    table = TagDayCount.__table__
+    dialect = connection.dialect.name
+    if delta > 0 and dialect in ('sqlite', 'postgresql'):
+        insert = sqlite_insert if dialect == 'sqlite' else postgresql_insert
+        statement = insert(table).values([{'tag': tag, 'day': day, 'count': delta} for tag, day in keys])
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=['tag', 'day'],
+            set_={'count': table.c.count + statement.excluded.count}
+        ))
+        return
+
+    for tag, day in keys:
+        updated = connection.execute(
+            table.update()
+            .where(table.c.tag == tag, table.c.day == day)
+            .values(count=table.c.count + delta)
+        ).rowcount
+        if not updated and delta > 0:
+            connection.execute(table.insert().values(tag=tag, day=day, count=delta))
+
+
+def _sync_tags(connection, activity_id, old_tags, new_tags):
+    """同步活动的标签关联行"""
+    table = ActivityTag.__table__
+    old, new = set(split_tags(old_tags)), set(split_tags(new_tags))
+    if old - new:
+        connection.execute(table.delete().where(table.c.activity_id == activity_id, table.c.tag.in_(old - new)))
+    if new - old:
+        connection.execute(table.insert(), [{'activity_id': activity_id, 'tag': tag} for tag in new - old])
+
+
+def _keep_previous(target, value, oldvalue, initiator):
+    """空监听器：以 active_history 注册，使已过期的字段在赋值前先加载旧值"""
+
+
+for _field in TRACKED_FIELDS:
+    # 提交后实例已过期，直接赋值时不会记录旧值，_previous 会把新值当作旧值
+    event.listen(getattr(Activity, _field), 'set', _keep_previous, active_history=True)
+
+
+def _previous(target, field):
+    """本次 flush 之前的字段值"""
+    history = inspect(target).attrs[field].history
+    return history.deleted[0] if history.deleted else getattr(target, field)
+
+
+@event.listens_for(Activity, 'after_insert')
+def _activity_inserted(mapper, connection, target):
+    _sync_tags(connection, target.id, None, target.tags)
+    _apply_counts(connection, _contribution(target.status, target.start_time, target.tags), 1)
+
+
+@event.listens_for(Activity, 'after_update')
+def _activity_updated(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[field].history.has_changes() for field in TRACKED_FIELDS):
+        return
+
+    old = {field: _previous(target, field) for field in TRACKED_FIELDS}
+    _sync_tags(connection, target.id, old['tags'], target.tags)
+
+    old_keys = _contribution(old['status'], old['start_time'], old['tags'])
+    new_keys = _contribution(target.status, target.start_time, target.tags)
+    _apply_counts(connection, old_keys - new_keys, -1)
+    _apply_counts(connection, new_keys - old_keys, 1)
+
+
+@event.listens_for(Activity, 'before_delete')
+def _activity_deleted(mapper, connection, target):
+    old = {field: _previous(target, field) for field in TRACKED_FIELDS}
+    table = ActivityTag.__table__
+    connection.execute(table.delete().where(table.c.activity_id == target.id))
+    _apply_counts(connection, _contribution(old['status'], old['start_time'], old['tags']), -1)
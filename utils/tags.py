@@ -0,0 +1,13 @@
+import re
+
+_SPLIT_RE = re.compile(r'[,，]')
+
+
+def split_tags(value):
+    """把逗号分隔的标签串拆成去重后的标签列表"""
+    tags = []
+    for tag in _SPLIT_RE.split(value or ''):
+        tag = tag.strip()[:50]
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags